@@ -1,11 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+from datetime import date
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import List
+from app.core.config import settings
 from app.core.database import get_db
-from app.api.deps import get_current_user
+from app.api.deps import get_current_user, get_current_company_id
 from app.models.core import User, Membership, Company, Role
 from app.schemas.company import CompanyOut
+from app.schemas.export import AccountantExportRequest
+from app.schemas.report import AccountantAgingOut
+from app.services.aging import aging_service, sum_buckets
+from app.services.jobs import job_tracker
 
 router = APIRouter()
 
@@ -29,6 +36,113 @@ async def list_accountant_companies(
     result = await db.execute(stmt)
     return result.scalars().all()
 
+@router.get("/aging", response_model=AccountantAgingOut)
+async def get_accountant_aging(
+    as_of: date = Query(None, description="Reference date, today by default"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Receivables aging of every company where the current user is ACCOUNTANT,
+    the companies being queried concurrently.
+    """
+    as_of = as_of or date.today()
+    result = await db.execute(
+        select(Company.id, Company.name)
+        .join(Membership)
+        .where(
+            Membership.user_id == current_user.id,
+            Membership.role == Role.ACCOUNTANT
+        )
+        .order_by(Company.name)
+    )
+    companies = result.all()
+    # Released before fanning out, the per-company queries use their own sessions
+    await db.close()
+
+    reports = await aging_service.for_companies([c.id for c in companies], as_of)
+    out = [
+        {"company_id": company.id, "company_name": company.name, **reports[company.id]}
+        for company in companies
+    ]
+    return {"as_of": as_of, "companies": out, "total": sum_buckets([report["total"] for report in out])}
+
+async def _accountant_company_ids(db: AsyncSession, user_id: int) -> List[int]:
+    result = await db.execute(
+        select(Membership.company_id)
+        .where(Membership.user_id == user_id, Membership.role == Role.ACCOUNTANT)
+        .order_by(Membership.company_id)
+    )
+    return list(result.scalars().all())
+
+async def _send_export(job_id: str, owner_company_id: int, params: dict):
+    from app.core.celery import celery_app
+
+    def send():
+        celery_app.send_task(
+            "export_accountant_companies",
+            args=[owner_company_id, params["company_ids"], params["period_start"], params["period_end"], params["formats"]],
+            task_id=job_id,
+        )
+
+    await asyncio.to_thread(send)
+
+@router.post("/exports", status_code=202)
+async def export_companies(
+    export_in: AccountantExportRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    company_id: int = Depends(get_current_company_id)
+):
+    """
+    Starts one job exporting the FEC and CSV files of many companies for a
+    period into a single ZIP. The job belongs to the accountant's current
+    company: progress, per-company state and the download link are served
+    by /api/jobs/{job_id}.
+    """
+    allowed = await _accountant_company_ids(db, current_user.id)
+    company_ids = list(dict.fromkeys(export_in.company_ids)) if export_in.company_ids is not None else allowed
+    if set(company_ids) - set(allowed):
+        raise HTTPException(status_code=403, detail="Not an accountant of every requested company")
+    if not company_ids:
+        raise HTTPException(status_code=400, detail="No company to export")
+    if len(company_ids) > settings.ACCOUNTANT_EXPORT_MAX_COMPANIES:
+        raise HTTPException(status_code=400, detail=f"At most {settings.ACCOUNTANT_EXPORT_MAX_COMPANIES} companies per export")
+
+    params = {
+        "company_ids": company_ids,
+        "period_start": export_in.period_start.isoformat(),
+        "period_end": export_in.period_end.isoformat(),
+        "formats": list(dict.fromkeys(export_in.formats)),
+    }
+    job_id = await asyncio.to_thread(job_tracker.create, company_id, "accountant_export", len(company_ids), params=params)
+    await _send_export(job_id, company_id, params)
+    return {"job_id": job_id, "status": "queued"}
+
+@router.post("/exports/{job_id}/resume", status_code=202)
+async def resume_export(
+    job_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    company_id: int = Depends(get_current_company_id)
+):
+    """
+    Restarts a failed export: the companies already exported are kept,
+    only the failed ones are read again before the ZIP is built.
+    """
+    job = await asyncio.to_thread(job_tracker.get, job_id, company_id)
+    if job is None or job["kind"] != "accountant_export":
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != "FAILURE":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    # Memberships may have changed since the job was created
+    if set(job["params"]["company_ids"]) - set(await _accountant_company_ids(db, current_user.id)):
+        raise HTTPException(status_code=403, detail="Not an accountant of every requested company")
+
+    await asyncio.to_thread(job_tracker.requeue, job_id)
+    await _send_export(job_id, company_id, job["params"])
+    return {"job_id": job_id, "status": "queued"}
+
 @router.post("/companies/{company_id}/lock")
 async def lock_period(
     company_id: int,
@@ -0,0 +1,147 @@
+import logging
+import math
+import time
+from typing import Dict, Optional, Tuple
+from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.redis import get_async_redis
+from app.api.deps import get_current_company_id
+from app.models.core import Company
+
+logger = logging.getLogger(__name__)
+
+# Refills and takes one token from every bucket in KEYS, or none if any is
+# empty. ARGV holds (rate, burst) pairs. Returns the wait in seconds as a
+# string (0 when admitted). Redis time keeps all API pods on one clock.
+TOKEN_BUCKET_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local wait = 0
+local tokens = {}
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i - 1])
+    local burst = tonumber(ARGV[2 * i])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local available = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    available = math.min(burst, available + math.max(0, now - ts) * rate)
+    if available < 1 then
+        wait = math.max(wait, (1 - available) / rate)
+    end
+    tokens[i] = available
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i - 1])
+    local burst = tonumber(ARGV[2 * i])
+    redis.call('HSET', key, 'tokens', tokens[i] - 1, 'ts', now)
+    redis.call('EXPIRE', key, math.ceil(burst / rate) + 1)
+end
+return '0'
+"""
+
+class AdmissionController:
+    """
+    Per-company admission control for tenant routes: a Redis token bucket per
+    company (sized by plan) and per configured route, plus an in-process cap on
+    concurrent requests to expensive routes (render, export). Rejections are
+    429 with Retry-After. Redis errors fail open.
+    """
+    def __init__(self):
+        self._inflight: Dict[Tuple[int, str], int] = {}
+        self._plans: Dict[int, Tuple[str, float]] = {}
+
+    async def plan_for(self, db: AsyncSession, company_id: int) -> str:
+        cached = self._plans.get(company_id)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+        result = await db.execute(select(Company.plan).where(Company.id == company_id))
+        plan = result.scalar_one_or_none() or settings.ADMISSION_DEFAULT_PLAN
+        self._plans[company_id] = (plan, time.monotonic() + settings.ADMISSION_PLAN_CACHE_SECONDS)
+        return plan
+
+    @staticmethod
+    def route_limits(route: str, plan: str) -> Optional[Dict[str, float]]:
+        limits = settings.ADMISSION_ROUTE_LIMITS.get(route)
+        if limits is None:
+            return None
+        return limits.get(plan, limits.get("default"))
+
+    async def take_tokens(self, company_id: int, route: str, plan: str, route_limits: Optional[Dict[str, float]]) -> float:
+        plan_limits = settings.ADMISSION_PLAN_LIMITS.get(plan, settings.ADMISSION_PLAN_LIMITS[settings.ADMISSION_DEFAULT_PLAN])
+        keys = [f"admission:{company_id}"]
+        args = [plan_limits["rate"], plan_limits["burst"]]
+        if route_limits and "rate" in route_limits:
+            keys.append(f"admission:{company_id}:{route}")
+            args += [route_limits["rate"], route_limits["burst"]]
+        try:
+            wait = await get_async_redis().eval(TOKEN_BUCKET_SCRIPT, len(keys), *keys, *args)
+        except Exception as e:
+            logger.warning(f"Admission control unavailable, admitting request: {e}")
+            return 0.0
+        return float(wait)
+
+    def acquire_slot(self, company_id: int, route: str, limit: int) -> bool:
+        key = (company_id, route)
+        if self._inflight.get(key, 0) >= limit:
+            return False
+        self._inflight[key] = self._inflight.get(key, 0) + 1
+        return True
+
+    def release_slot(self, company_id: int, route: str):
+        key = (company_id, route)
+        remaining = self._inflight.get(key, 1) - 1
+        if remaining > 0:
+            self._inflight[key] = remaining
+        else:
+            self._inflight.pop(key, None)
+
+admission_controller = AdmissionController()
+
+def _too_many_requests(retry_after: float, detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+async def admission_control(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    company_id: int = Depends(get_current_company_id)
+):
+    """
+    Router dependency rather than an ASGI middleware: it needs the resolved
+    company, and holding the concurrency slot across the handler is what a
+    yield dependency does. The slot covers the handler only: FastAPI runs
+    the exit code before the response is sent, so the body of a
+    StreamingResponse would be produced outside it. No admitted route
+    streams today; one that does needs its own limit around the body.
+    """
+    if not settings.ADMISSION_ENABLED:
+        yield
+        return
+
+    route = f"{request.method} {request.scope['route'].path}"
+    plan = await admission_controller.plan_for(db, company_id)
+    route_limits = admission_controller.route_limits(route, plan)
+
+    wait = await admission_controller.take_tokens(company_id, route, plan, route_limits)
+    if wait > 0:
+        raise _too_many_requests(wait, "Rate limit exceeded")
+
+    concurrency = int(route_limits["concurrency"]) if route_limits and "concurrency" in route_limits else None
+    if concurrency is None:
+        yield
+        return
+    if not admission_controller.acquire_slot(company_id, route, concurrency):
+        raise _too_many_requests(1, "Too many concurrent requests for this operation")
+    try:
+        yield
+    finally:
+        admission_controller.release_slot(company_id, route)
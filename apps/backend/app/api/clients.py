@@ -1,15 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, or_
 from typing import List
+import asyncio
+import uuid
+from app.core.config import settings
 from app.core.database import get_db
 from app.models.business import Client
 from app.schemas.client import ClientOut, ClientCreate, ClientUpdate
-from app.api.deps import get_current_company_id
+from app.api.deps import get_current_company_id, conditional_list
+from app.services.change_counters import change_counters
+from app.services.client_import import ClientImportError, detect_format
+from app.services.jobs import job_tracker
+from app.services.storage import storage_service
 
 router = APIRouter()
 
-@router.get("/", response_model=List[ClientOut])
+@router.get("/", response_model=List[ClientOut], dependencies=[Depends(conditional_list("clients"))])
 async def list_clients(
     search: str = Query(None),
     include_archived: bool = False,
@@ -41,8 +48,39 @@ async def create_client(
     db.add(client)
     await db.commit()
     await db.refresh(client)
+    await change_counters.bump(company_id, "clients")
     return client
 
+@router.post("/import", status_code=202)
+async def import_clients(
+    file: UploadFile = File(...),
+    company_id: int = Depends(get_current_company_id)
+):
+    """
+    Queues the import of a CSV or XLSX client file. The upload is streamed to
+    storage and processed by a worker; progress, counts and the per-row error
+    report are served by /api/jobs/{job_id}.
+    """
+    try:
+        fmt = detect_format(file.filename)
+    except ClientImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if file.size is not None and file.size > settings.CLIENT_IMPORT_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Import file is too large")
+    from app.core.celery import celery_app
+
+    def start() -> str:
+        job_id = str(uuid.uuid4())
+        object_name = f"imports/{company_id}/{job_id}.{fmt}"
+        # The upload is spooled to disk by the form parser, never held in memory
+        storage_service.upload_fileobj(file.file, object_name, file.content_type)
+        job_tracker.create(company_id, "client_import", file.size or 0, job_id=job_id)
+        celery_app.send_task("import_clients", args=[company_id, object_name, fmt], task_id=job_id)
+        return job_id
+
+    job_id = await asyncio.to_thread(start)
+    return {"job_id": job_id, "status": "queued"}
+
 @router.get("/{client_id}", response_model=ClientOut)
 async def get_client(
     client_id: int,
@@ -74,6 +112,7 @@ async def update_client(
     db.add(client)
     await db.commit()
     await db.refresh(client)
+    await change_counters.bump(company_id, "clients")
     return client
 
 @router.post("/{client_id}/archive", response_model=ClientOut)
@@ -91,4 +130,5 @@ async def archive_client(
     db.add(client)
     await db.commit()
     await db.refresh(client)
+    await change_counters.bump(company_id, "clients")
     return client
@@ -1,4 +1,6 @@
-from fastapi import Depends, HTTPException, status
+import time
+from typing import Optional
+from fastapi import Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -8,6 +10,7 @@ from app.core.database import get_db
 from app.core.security import ALGORITHM
 from app.models.core import User, Membership, Role
 from app.schemas.auth import TokenPayload
+from app.services.change_counters import change_counters
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
@@ -28,6 +31,16 @@ async def get_current_user(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    try:
+        payload = TokenPayload(**jwt.decode(token, settings.JWT_SECRET, algorithms=[ALGORITHM]))
+    except (JWTError, ValueError):
+        raise credentials_exception
+    # Only access tokens authenticate: refresh and profile tokens carry a type
+    if payload.type is not None or payload.sub is None:
+        raise credentials_exception
+    user = await db.get(User, payload.sub)
+    if user is None:
+        raise credentials_exception
     return user
 
 async def get_current_active_user(
@@ -67,3 +80,35 @@ def check_role(allowed_roles: list[Role]):
             )
         return role
     return role_checker
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # Weak comparison (RFC 9110 8.8.3.2)
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    return "*" in candidates or any(c.removeprefix("W/") == etag.removeprefix("W/") for c in candidates)
+
+def conditional_list(collection: str, max_age_bucket: Optional[int] = None):
+    """
+    Dependency for list endpoints: emits a weak ETag from the tenant's change
+    counter and answers If-None-Match with 304 before the handler queries the DB.
+    max_age_bucket rotates the ETag every N seconds for representations that
+    embed expiring data (presigned URLs).
+    """
+    async def dependency(
+        request: Request,
+        response: Response,
+        company_id: int = Depends(get_current_company_id)
+    ) -> Optional[str]:
+        variant = str(request.url.query)
+        if max_age_bucket:
+            variant += f"|{int(time.time() // max_age_bucket)}"
+        etag = await change_counters.etag(company_id, collection, variant)
+        if etag is None:
+            return None
+
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, etag):
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        response.headers.update(headers)
+        return etag
+    return dependency
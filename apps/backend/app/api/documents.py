@@ -1,20 +1,63 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status, BackgroundTasks
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List
-from app.api.deps import get_current_user, get_current_company_id, get_db
+from sqlalchemy import select, insert, union_all, literal, null, cast, Integer, JSON
+from sqlalchemy.orm.attributes import set_committed_value
+from typing import AsyncIterator, List, Tuple
+from app.core.config import settings
+from app.api.deps import get_current_user, get_current_company_id, get_db, conditional_list
 from app.models.core import User, Company
-from app.models.business import Document, DocStatus, DocumentVersion
-from app.schemas.document import DocumentOut, DocumentCreate, DocumentUpdate, DocumentVersionOut
+from app.models.business import Client, Document, DocStatus, DocumentVersion, Template
+from app.schemas.document import (
+    DocumentOut, DocumentCreate, DocumentUpdate, DocumentVersionOut, DocumentVersionDiff,
+    DocumentValidateRequest, DocumentValidationResult, DocumentBulkResult,
+    DocumentStatusBulkRequest, DocumentStatusOutcome
+)
+from app.schemas.export import DocumentExportRequest
+from app.schemas.job import MergePdfRequest
+from app.services.versioning import version_history
+from app.services.document_query import build_filters, DocumentFilterError
+from app.services.change_counters import change_counters
+from app.services.jobs import job_tracker
+from app.services.validation import document_validation
+from app.services.document_status import bulk_transition, OUTCOME_UPDATED
+from app.services.rollups import revenue_rollups, document_contribution
 
 router = APIRouter()
 
-@router.get("/", response_model=List[DocumentOut])
+async def _get_template(db: AsyncSession, template_id: int, company_id: int) -> Template:
+    result = await db.execute(
+        select(Template).where(Template.id == template_id, Template.company_id == company_id)
+    )
+    template = result.scalar_one_or_none()
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return template
+
+def _check_data(template: Template, data: dict, partial: bool):
+    # Drafts may be incomplete (partial), generation needs the full schema
+    errors = document_validation.validate(template, data, partial=partial)
+    if errors:
+        raise HTTPException(
+            status_code=422,
+            detail={"message": "Document data does not match the template schema", "errors": errors}
+        )
+
+@router.get("/", response_model=List[DocumentOut], dependencies=[Depends(conditional_list("documents"))])
 async def list_documents(
+    filter: List[str] = Query(None, description="<data|totals|meta>.<path>:<op>[:<value>], e.g. totals.total_ttc:gte:10000"),
     db: AsyncSession = Depends(get_db),
     company_id: int = Depends(get_current_company_id)
 ):
-    result = await db.execute(select(Document).where(Document.company_id == company_id))
+    query = select(Document).where(Document.company_id == company_id)
+    if filter:
+        try:
+            query = query.where(*build_filters(filter))
+        except DocumentFilterError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    result = await db.execute(query)
     return result.scalars().all()
 
 @router.post("/", response_model=DocumentOut)
@@ -24,6 +67,8 @@ async def create_document(
     current_user: User = Depends(get_current_user),
     company_id: int = Depends(get_current_company_id)
 ):
+    template = await _get_template(db, doc_in.template_id, company_id)
+    _check_data(template, doc_in.current_data, partial=True)
     doc = Document(
         **doc_in.model_dump(),
         company_id=company_id,
@@ -33,8 +78,138 @@ async def create_document(
     db.add(doc)
     await db.commit()
     await db.refresh(doc)
+    await change_counters.bump(company_id, "documents")
     return doc
 
+async def ndjson_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    """
+    Yields (line number, line) for the non-blank lines of an NDJSON body as
+    it is received.
+    """
+    # Pieces of the unterminated last line: only new chunks are split, so a
+    # line spread over many chunks is not rescanned for each of them
+    tail: List[bytes] = []
+    number = 0
+    async for chunk in chunks:
+        *lines, rest = chunk.split(b"\n")
+        if lines:
+            lines[0] = b"".join([*tail, lines[0]])
+            tail = []
+        if rest:
+            tail.append(rest)
+        for line in lines:
+            number += 1
+            if line.strip():
+                yield number, line
+    buffer = b"".join(tail)
+    if buffer.strip():
+        yield number + 1, buffer
+
+async def _insert_bulk_chunk(
+    db: AsyncSession,
+    chunk: List[Tuple[int, DocumentCreate]],
+    templates: dict,
+    company_id: int,
+    user_id: int,
+    partial: bool,
+) -> Tuple[List[int], List[dict]]:
+    """
+    Checks a chunk's client and template references in one query, validates
+    the data and inserts the valid documents in one multi-row INSERT.
+    Returns the created ids (in chunk order) and the rejected lines.
+    """
+    client_ids = {doc.client_id for _, doc in chunk}
+    template_ids = {doc.template_id for _, doc in chunk} - templates.keys()
+    refs = union_all(
+        select(
+            literal("client").label("kind"), Client.id.label("id"),
+            cast(null(), Integer).label("version"), cast(null(), JSON).label("schema_json")
+        ).where(Client.id.in_(client_ids), Client.company_id == company_id),
+        select(literal("template"), Template.id, Template.version, Template.schema_json)
+        .where(Template.id.in_(template_ids), Template.company_id == company_id),
+    )
+    known_clients = set()
+    for ref in (await db.execute(refs)).all():
+        if ref.kind == "client":
+            known_clients.add(ref.id)
+        else:
+            templates[ref.id] = ref # Has what the validator needs: id, version, schema_json
+
+    rows, lines, errors = [], [], []
+    for line, doc in chunk:
+        template = templates.get(doc.template_id)
+        if doc.client_id not in known_clients:
+            errors.append({"line": line, "error": "Client not found"})
+        elif template is None:
+            errors.append({"line": line, "error": "Template not found"})
+        elif problems := document_validation.validate(template, doc.current_data, partial=partial):
+            errors.append({"line": line, "error": f"Document data does not match the template schema: {problems[0]}"})
+        else:
+            rows.append({**doc.model_dump(), "company_id": company_id, "created_by": user_id, "status": DocStatus.DRAFT})
+            lines.append(line)
+    if not rows:
+        return [], errors
+    result = await db.execute(insert(Document).returning(Document.id, sort_by_parameter_order=True), rows)
+    return list(zip(lines, result.scalars().all())), errors
+
+@router.post("/bulk", response_model=DocumentBulkResult)
+async def create_documents_bulk(
+    request: Request,
+    generate: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    company_id: int = Depends(get_current_company_id)
+):
+    """
+    Creates draft documents from an NDJSON body, one DocumentCreate per line.
+    Lines are processed in chunks as the body arrives; rejected lines are
+    reported without failing the others, and everything is committed at once.
+    With generate=true the data must satisfy the full template schema and
+    the created documents are queued for generation in the batch lane.
+    """
+    ids = {}
+    errors = []
+    templates = {}
+    chunk = []
+    last_line = 0
+
+    async def flush():
+        created, rejected = await _insert_bulk_chunk(
+            db, chunk, templates, company_id, current_user.id, partial=not generate
+        )
+        ids.update(created)
+        errors.extend(rejected)
+        chunk.clear()
+
+    async for line, raw in ndjson_lines(request.stream()):
+        last_line = line
+        if len(ids) + len(errors) + len(chunk) >= settings.DOCUMENT_BULK_MAX_ITEMS:
+            raise HTTPException(status_code=413, detail=f"At most {settings.DOCUMENT_BULK_MAX_ITEMS} documents per request")
+        try:
+            chunk.append((line, DocumentCreate.model_validate_json(raw)))
+        except ValidationError as e:
+            err = e.errors()[0]
+            location = ".".join(str(p) for p in err["loc"])
+            errors.append({"line": line, "error": f"{location}: {err['msg']}" if location else err["msg"]})
+        if len(chunk) >= settings.DOCUMENT_BULK_CHUNK_SIZE:
+            await flush()
+    if chunk:
+        await flush()
+
+    await db.commit()
+    created = list(ids.values())
+    job_ids = []
+    if created:
+        await change_counters.bump(company_id, "documents")
+        if generate:
+            job_ids = await asyncio.to_thread(fair_scheduler.submit_many, company_id, created, current_user.id)
+    return {
+        "created": len(created),
+        "ids": [ids.get(line) for line in range(1, last_line + 1)],
+        "errors": sorted(errors, key=lambda e: e["line"]),
+        "job_ids": job_ids,
+    }
+
 @router.get("/{document_id}", response_model=DocumentOut)
 async def get_document(
     document_id: int,
@@ -73,11 +248,17 @@ async def update_document(
             raise HTTPException(status_code=403, detail="Document is in a locked period and cannot be edited")
     
     update_data = doc_in.model_dump(exclude_unset=True)
+    if update_data.get("current_data") is not None:
+        template = await _get_template(db, doc.template_id, company_id)
+        _check_data(template, update_data["current_data"], partial=True)
+    before = document_contribution(doc)
     for field, value in update_data.items():
         setattr(doc, field, value)
+    await revenue_rollups.record(db, before, document_contribution(doc))
     
     await db.commit()
     await db.refresh(doc)
+    await change_counters.bump(company_id, "documents")
     return doc
 
 @router.delete("/{document_id}")
@@ -98,9 +279,78 @@ async def delete_document(
     
     await db.delete(doc)
     await db.commit()
+    await change_counters.bump(company_id, "documents")
     return {"message": "Document deleted"}
 
-from app.tasks.documents import generate_document_version_task
+from app.services.scheduler import fair_scheduler
+
+@router.post("/validate", response_model=List[DocumentValidationResult])
+async def validate_documents(
+    validate_in: DocumentValidateRequest,
+    db: AsyncSession = Depends(get_db),
+    company_id: int = Depends(get_current_company_id)
+):
+    """
+    Checks documents against their template's full schema, e.g. before a batch generation.
+    """
+    result = await db.execute(
+        select(Document.id, Document.current_data, Document.template_id)
+        .where(Document.id.in_(validate_in.document_ids), Document.company_id == company_id)
+    )
+    docs = result.all()
+    result = await db.execute(
+        select(Template.id, Template.version, Template.schema_json)
+        .where(Template.id.in_({d.template_id for d in docs}))
+    )
+    templates = {t.id: t for t in result.all()}
+    outcomes = {}
+    for doc in docs:
+        errors = document_validation.validate(templates[doc.template_id], doc.current_data or {})
+        outcomes[doc.id] = DocumentValidationResult(document_id=doc.id, valid=not errors, errors=errors)
+    return [
+        outcomes.get(doc_id) or DocumentValidationResult(document_id=doc_id, valid=False, errors=["Document not found"])
+        for doc_id in validate_in.document_ids
+    ]
+
+@router.post("/status", response_model=List[DocumentStatusOutcome])
+async def transition_documents(
+    transition_in: DocumentStatusBulkRequest,
+    db: AsyncSession = Depends(get_db),
+    company_id: int = Depends(get_current_company_id)
+):
+    """
+    Moves a set of documents to a status (e.g. PAID after a bank run) in a
+    single statement, honouring the status state machine and the period lock.
+    Returns one outcome per requested id.
+    """
+    outcomes = await bulk_transition(db, company_id, transition_in.document_ids, transition_in.status)
+    await db.commit()
+    if any(o["outcome"] == OUTCOME_UPDATED for o in outcomes):
+        await change_counters.bump(company_id, "documents")
+    return outcomes
+
+@router.post("/merged-pdf", status_code=202)
+async def merge_document_pdfs(
+    merge_in: MergePdfRequest,
+    company_id: int = Depends(get_current_company_id)
+):
+    """
+    Starts a job merging the PDFs of the given versions into one file.
+    Progress and the download link are served by /api/jobs/{job_id}.
+    """
+    if len(merge_in.version_ids) > settings.MERGE_MAX_VERSIONS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.MERGE_MAX_VERSIONS} versions per merge")
+    from app.core.celery import celery_app
+
+    def start() -> str:
+        job_id = job_tracker.create(company_id, "merged_pdf", len(merge_in.version_ids))
+        celery_app.send_task(
+            "merge_document_pdfs", args=[company_id, merge_in.version_ids], task_id=job_id
+        )
+        return job_id
+
+    job_id = await asyncio.to_thread(start)
+    return {"job_id": job_id, "status": "queued"}
 
 @router.post("/{document_id}/generate")
 async def generate_document(
@@ -119,8 +369,17 @@ async def generate_document(
     if doc.status == DocStatus.GENERATED:
         raise HTTPException(status_code=400, detail="Document already generated")
 
-    # For dev, we might want to run it sync or use worker. 
-    # Let's use .delay() which requires a running worker.
+    # Invalid data would only fail in the worker, after a number was consumed
+    template = await _get_template(db, doc.template_id, company_id)
+    _check_data(template, doc.current_data, partial=False)
+
+    # Interactive generation goes through the scheduler's priority lane;
+    # completion is pushed to the client over /api/events.
+    job_id = await asyncio.to_thread(
+        fair_scheduler.submit, company_id, doc.id, current_user.id, interactive=True
+    )
+    return {"job_id": job_id, "status": "queued"}
+
 @router.get("/{document_id}/versions", response_model=List[DocumentVersionOut])
 async def list_document_versions(
     document_id: int,
@@ -135,9 +394,44 @@ async def list_document_versions(
         raise HTTPException(status_code=404, detail="Document not found")
         
     result = await db.execute(
-        select(DocumentVersion).where(DocumentVersion.document_id == document_id)
+        select(DocumentVersion)
+        .where(DocumentVersion.document_id == document_id)
+        .order_by(DocumentVersion.version_number)
     )
-    return result.scalars().all()
+    versions = result.scalars().all()
+
+    # Delta versions are rebuilt from the last full snapshot in one pass
+    snapshots = version_history.reconstruct(
+        document_id, [(v.version_number, v.snapshot_data, v.snapshot_delta) for v in versions]
+    )
+    for v in versions:
+        set_committed_value(v, "snapshot_data", snapshots[v.version_number])
+    return versions
+
+@router.get("/{document_id}/versions/diff", response_model=DocumentVersionDiff)
+async def diff_document_versions(
+    document_id: int,
+    from_version: int,
+    to_version: int,
+    db: AsyncSession = Depends(get_db),
+    company_id: int = Depends(get_current_company_id)
+):
+    result = await db.execute(
+        select(Document).where(Document.id == document_id, Document.company_id == company_id)
+    )
+    if not result.scalar_one_or_none():
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    source = await version_history.get_snapshot(db, document_id, from_version)
+    target = await version_history.get_snapshot(db, document_id, to_version)
+    if source is None or target is None:
+        raise HTTPException(status_code=404, detail="Version not found")
+
+    return {
+        "from_version": from_version,
+        "to_version": to_version,
+        "patch": version_history.diff(source, target)
+    }
 
 @router.get("/{document_id}/download/{version_id}")
 async def download_version_file(
@@ -162,44 +456,74 @@ async def download_version_file(
     
     # Generate presigned URL
     from app.services.storage import storage_service
-    url = await storage_service.generate_presigned_url(object_name)
+    url = storage_service.get_presigned_url(object_name)
     
     from fastapi.responses import RedirectResponse
     return RedirectResponse(url)
 
+async def _start_export(company_id: int, export_in: DocumentExportRequest) -> dict:
+    from app.core.celery import celery_app
+
+    # Same request, same data: the running or finished job is reused
+    counters = [await change_counters.current(company_id, c) for c in ("documents", "clients")]
+    request_key = None
+    if None not in counters:
+        request_key = ":".join([
+            "export", export_in.format, str(export_in.period_start), str(export_in.period_end),
+            str(export_in.since), *map(str, counters)
+        ])
+    args = [
+        company_id, export_in.format,
+        export_in.period_start.isoformat() if export_in.period_start else None,
+        export_in.period_end.isoformat() if export_in.period_end else None,
+        export_in.since.isoformat() if export_in.since else None,
+    ]
+
+    def start() -> dict:
+        job_id = job_tracker.create(company_id, f"export_{export_in.format}", 1)
+        if request_key is not None:
+            served_by, created = job_tracker.claim(company_id, request_key, job_id)
+            if not created:
+                job_tracker.discard(job_id)
+                job = job_tracker.get(served_by, company_id)
+                if job is not None:
+                    return job
+        celery_app.send_task("export_documents", args=args, task_id=job_id)
+        return {"job_id": job_id, "status": "queued"}
+
+    return await asyncio.to_thread(start)
+
+@router.post("/exports", status_code=202)
+async def export_documents(
+    export_in: DocumentExportRequest,
+    company_id: int = Depends(get_current_company_id)
+):
+    """
+    Starts an export job, written to storage as it is produced: accounting
+    CSV, FEC or both in a ZIP, or typed Parquet / Arrow tables for analytics,
+    incremental from the watermark of a previous one. Identical requests get the same job, and its
+    file until a document or client changes. Progress and the download link
+    are served by /api/jobs/{job_id}.
+    """
+    job = await _start_export(company_id, export_in)
+    return {"job_id": job["job_id"], "status": job["status"]}
+
 @router.get("/export/csv")
 async def export_documents_csv(
-    db: AsyncSession = Depends(get_db),
     company_id: int = Depends(get_current_company_id)
 ):
-    from app.services.exports import export_service
-    from sqlalchemy.orm import selectinload
-    
-    # Fetch all generated documents for the company
-    stmt = (
-        select(Document)
-        .where(Document.company_id == company_id, Document.status == DocStatus.GENERATED)
-    )
-    result = await db.execute(stmt)
-    docs = result.scalars().all()
-    
-    # Convert to dict for the service (could be specialized schemas too)
-    data = []
-    for d in docs:
-        data.append({
-            "id": d.id,
-            "updated_at": d.updated_at,
-            "type": d.type,
-            "doc_number": "DOC-" + str(d.id), # Fallback if doc_number not on draft
-            "current_totals": d.current_totals,
-            "status": d.status
-        })
-        
-    csv_content = export_service.generate_accounting_csv(data)
-    
-    from fastapi.responses import Response
-    return Response(
-        content=csv_content,
-        media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename=export_{company_id}.csv"}
-    )
+    """
+    CSV export for existing links: redirects to the file when an up to date
+    export exists, otherwise starts (or joins) its job like POST /exports.
+    """
+    from fastapi.responses import JSONResponse, RedirectResponse
+    from app.services.storage import storage_service
+
+    job = await _start_export(company_id, DocumentExportRequest(format="csv"))
+    if job["status"] == "SUCCESS":
+        result = job["result"]
+        url = await asyncio.to_thread(
+            storage_service.get_presigned_url, result["object_name"], filename=result.get("filename")
+        )
+        return RedirectResponse(url)
+    return JSONResponse({"job_id": job["job_id"], "status": job["status"]}, status_code=202)
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, Header
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app.api.deps import get_current_company_id, get_db
+from app.services.events import event_broker
+
+router = APIRouter()
+
+@router.get("")
+async def stream_events(
+    last_event_id: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    company_id: int = Depends(get_current_company_id)
+):
+    """
+    Server-sent events stream of job-state changes for the current company.
+    Reconnecting clients send Last-Event-ID and receive what they missed.
+    """
+    # Auth is resolved; give the connection back to the pool instead of
+    # holding it for the lifetime of the stream.
+    await db.close()
+
+    resume_from = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    return StreamingResponse(
+        event_broker.stream(company_id, resume_from),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
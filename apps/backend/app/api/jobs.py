@@ -0,0 +1,46 @@
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import RedirectResponse
+from app.api.deps import get_current_company_id
+from app.schemas.job import JobOut, QueueStats
+from app.services.jobs import job_tracker
+from app.services.scheduler import fair_scheduler
+from app.services.storage import storage_service
+
+router = APIRouter()
+
+@router.get("/queue-stats", response_model=QueueStats)
+async def get_queue_stats(
+    company_id: int = Depends(get_current_company_id)
+):
+    """
+    Generation queue depth and queue-wait times for the current company.
+    """
+    return await asyncio.to_thread(fair_scheduler.stats, company_id)
+
+@router.get("/{job_id}", response_model=JobOut)
+async def get_job(
+    job_id: str,
+    company_id: int = Depends(get_current_company_id)
+):
+    job = await asyncio.to_thread(job_tracker.get, job_id, company_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/{job_id}/download")
+async def download_job_result(
+    job_id: str,
+    company_id: int = Depends(get_current_company_id)
+):
+    job = await asyncio.to_thread(job_tracker.get, job_id, company_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != "SUCCESS":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    if not (job["result"] or {}).get("object_name"):
+        raise HTTPException(status_code=404, detail="Job has no file")
+    url = await asyncio.to_thread(
+        storage_service.get_presigned_url, job["result"]["object_name"], filename=job["result"].get("filename")
+    )
+    return RedirectResponse(url)
@@ -0,0 +1,55 @@
+import asyncio
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import RedirectResponse
+from app.api.deps import get_current_active_user
+from app.core.config import settings
+from app.core.profiling import PROFILE_HEADER, create_profile_token
+from app.models.core import User
+from app.schemas.profile import ProfileOut, ProfileTokenOut, ProfileTokenRequest
+from app.services.profiles import profile_store
+from app.services.storage import storage_service
+
+router = APIRouter()
+
+async def require_profiling_admin(current_user: User = Depends(get_current_active_user)) -> User:
+    # Profiles show code paths of every tenant: operators only, not company admins
+    if current_user.email not in settings.PROFILING_ADMIN_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="The user doesn't have enough privileges")
+    return current_user
+
+@router.post("/token", response_model=ProfileTokenOut)
+async def issue_profile_token(
+    request: ProfileTokenRequest,
+    current_user: User = Depends(require_profiling_admin)
+):
+    """
+    Signed X-Profile header value: requests sending it are profiled, and the
+    Celery tasks they start too, until it expires.
+    """
+    token, expires_at = create_profile_token(current_user.id, request.path_prefix, request.ttl_seconds)
+    return {"header": PROFILE_HEADER, "token": token, "expires_at": expires_at}
+
+@router.get("", response_model=List[ProfileOut])
+async def list_profiles(
+    limit: int = Query(50, ge=1, le=500),
+    current_user: User = Depends(require_profiling_admin)
+):
+    return await asyncio.to_thread(profile_store.recent, limit)
+
+@router.get("/{profile_id}")
+async def download_profile(
+    profile_id: str,
+    current_user: User = Depends(require_profiling_admin)
+):
+    """
+    Redirects to the profile's collapsed stacks, ready for a flame graph.
+    The id is returned in the X-Profile-Id header of profiled requests.
+    """
+    profile = await asyncio.to_thread(profile_store.get, profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    url = await asyncio.to_thread(
+        storage_service.get_presigned_url, profile["object_name"], filename=f"{profile_id}.collapsed.txt"
+    )
+    return RedirectResponse(url)
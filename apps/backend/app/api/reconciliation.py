@@ -0,0 +1,88 @@
+import asyncio
+import uuid
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.api.deps import get_current_company_id, get_db
+from app.models.business import PaymentMatch
+from app.schemas.reconciliation import PaymentMatchOut, PaymentMatchIds, PaymentMatchOutcome
+from app.services.change_counters import change_counters
+from app.services.jobs import job_tracker
+from app.services.reconciliation import (
+    ReconciliationError, detect_format, confirm_matches, reject_matches, MATCH_CONFIRMED
+)
+from app.services.storage import storage_service
+
+router = APIRouter()
+
+@router.post("/statements", status_code=202)
+async def upload_statement(
+    file: UploadFile = File(...),
+    company_id: int = Depends(get_current_company_id)
+):
+    """
+    Queues the matching of a bank statement (CSV or CAMT.053) against the
+    open invoices. The job id is the statement id of the resulting matches.
+    """
+    try:
+        fmt = detect_format(file.filename)
+    except ReconciliationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if file.size is not None and file.size > settings.RECONCILIATION_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Statement file is too large")
+    from app.core.celery import celery_app
+
+    def start() -> str:
+        job_id = str(uuid.uuid4())
+        object_name = f"statements/{company_id}/{job_id}"
+        storage_service.upload_fileobj(file.file, object_name, file.content_type)
+        job_tracker.create(company_id, "reconciliation", file.size or 0, job_id=job_id)
+        celery_app.send_task("reconcile_statement", args=[company_id, object_name, fmt], task_id=job_id)
+        return job_id
+
+    job_id = await asyncio.to_thread(start)
+    return {"job_id": job_id, "status": "queued"}
+
+@router.get("/statements/{statement_id}/matches", response_model=List[PaymentMatchOut])
+async def list_matches(
+    statement_id: str,
+    status: str = None,
+    limit: int = 500,
+    offset: int = 0,
+    db: AsyncSession = Depends(get_db),
+    company_id: int = Depends(get_current_company_id)
+):
+    query = select(PaymentMatch).where(
+        PaymentMatch.company_id == company_id, PaymentMatch.statement_id == statement_id
+    )
+    if status:
+        query = query.where(PaymentMatch.status == status)
+    result = await db.execute(query.order_by(PaymentMatch.line_number).limit(min(limit, 5000)).offset(offset))
+    return result.scalars().all()
+
+@router.post("/matches/confirm", response_model=List[PaymentMatchOutcome])
+async def confirm_payment_matches(
+    match_in: PaymentMatchIds,
+    db: AsyncSession = Depends(get_db),
+    company_id: int = Depends(get_current_company_id)
+):
+    """
+    Confirms proposed matches in bulk, marking their invoices as PAID.
+    """
+    outcomes = await confirm_matches(db, company_id, match_in.match_ids)
+    await db.commit()
+    if any(o["outcome"] == MATCH_CONFIRMED for o in outcomes):
+        await change_counters.bump(company_id, "documents")
+    return outcomes
+
+@router.post("/matches/reject", response_model=List[PaymentMatchOutcome])
+async def reject_payment_matches(
+    match_in: PaymentMatchIds,
+    db: AsyncSession = Depends(get_db),
+    company_id: int = Depends(get_current_company_id)
+):
+    outcomes = await reject_matches(db, company_id, match_in.match_ids)
+    await db.commit()
+    return outcomes
@@ -0,0 +1,96 @@
+from datetime import date
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.deps import get_current_company_id, get_db, conditional_list
+from app.models.business import DocType, DocStatus, RevenueRollup
+from app.schemas.report import AgingOut, SummaryOut
+from app.services.aging import aging_service
+
+router = APIRouter()
+
+GROUP_COLUMNS = {
+    "month": RevenueRollup.month,
+    "client": RevenueRollup.client_id,
+    "type": RevenueRollup.doc_type,
+    "status": RevenueRollup.status,
+}
+# Revenue: issued invoices that were not cancelled
+DEFAULT_STATUSES = [DocStatus.GENERATED, DocStatus.SENT, DocStatus.PAID]
+
+def _month(value: str, name: str) -> date:
+    try:
+        year, month = value.split("-")
+        return date(int(year), int(month), 1)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}, use YYYY-MM")
+
+# Rollups only change with documents, so the documents counter versions them
+@router.get("/summary", response_model=SummaryOut, dependencies=[Depends(conditional_list("documents"))])
+async def get_summary(
+    group_by: List[str] = Query(["month"], description="month, client, type and/or status"),
+    from_month: str = Query(None, alias="from", description="YYYY-MM, inclusive"),
+    to_month: str = Query(None, alias="to", description="YYYY-MM, inclusive"),
+    type: List[DocType] = Query([DocType.INVOICE]),
+    status: List[DocStatus] = Query(DEFAULT_STATUSES),
+    client_id: int = None,
+    db: AsyncSession = Depends(get_db),
+    company_id: int = Depends(get_current_company_id)
+):
+    """
+    Document counts and HT/TVA/TTC totals, grouped as requested. Answered
+    from the revenue rollups, never from the documents.
+    """
+    unknown = set(group_by) - GROUP_COLUMNS.keys()
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown grouping: {', '.join(sorted(unknown))}")
+    keys = list(dict.fromkeys(group_by))
+    columns = [GROUP_COLUMNS[k] for k in keys]
+
+    query = select(
+        *columns,
+        func.sum(RevenueRollup.documents).label("documents"),
+        func.sum(RevenueRollup.total_ht).label("total_ht"),
+        func.sum(RevenueRollup.total_tva).label("total_tva"),
+        func.sum(RevenueRollup.total_ttc).label("total_ttc"),
+    ).where(
+        RevenueRollup.company_id == company_id,
+        RevenueRollup.doc_type.in_([t.value for t in type]),
+        RevenueRollup.status.in_([s.value for s in status]),
+    )
+    if from_month:
+        query = query.where(RevenueRollup.month >= _month(from_month, "from"))
+    if to_month:
+        query = query.where(RevenueRollup.month <= _month(to_month, "to"))
+    if client_id is not None:
+        query = query.where(RevenueRollup.client_id == client_id)
+    if columns:
+        query = query.group_by(*columns).order_by(*columns)
+    result = await db.execute(query)
+
+    rows = []
+    total = {"documents": 0, "total_ht": 0, "total_tva": 0, "total_ttc": 0}
+    for row in result.all():
+        values = row._mapping
+        if not values["documents"]:
+            continue
+        rows.append({
+            **{column.key: values[column.key] for column in columns},
+            **{k: values[k] for k in total},
+        })
+        for k in total:
+            total[k] += values[k]
+    return {"rows": rows, "total": total}
+
+# No ETag: the buckets move with the date even when no document changes
+@router.get("/aging", response_model=AgingOut)
+async def get_aging(
+    as_of: date = Query(None, description="Reference date, today by default"),
+    db: AsyncSession = Depends(get_db),
+    company_id: int = Depends(get_current_company_id)
+):
+    """
+    Unpaid invoices per client, bucketed by days past their due date.
+    """
+    return await aging_service.by_client(db, company_id, as_of or date.today())
@@ -0,0 +1,96 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, literal_column
+from app.core.config import settings
+from app.core.database import get_db
+from app.api.deps import get_current_company_id
+from app.models.business import Client, Document, DocumentVersion
+from app.schemas.search import SearchResults
+
+router = APIRouter()
+
+HEADLINE_OPTIONS = "MaxFragments=2, MaxWords=20, MinWords=5, StartSel=<mark>, StopSel=</mark>"
+
+@router.get("", response_model=SearchResults)
+async def search_documents(
+    q: str = Query(..., min_length=1),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+    company_id: int = Depends(get_current_company_id)
+):
+    """
+    Ranked full-text search over document numbers, client names, document
+    data and version snapshots (French stemming, accent-insensitive).
+    Only the SEARCH_RANK_WINDOW most recently updated matches are ranked;
+    truncated tells when older matches were left out.
+    """
+    # Inlined so the planner sees a constant regconfig
+    config = literal_column(f"'{settings.SEARCH_CONFIG}'::regconfig")
+    tsquery = func.websearch_to_tsquery(config, q)
+
+    # Matching uses the (company_id, search_vector) GIN index; ranking is bounded
+    # to the most recent candidates so very common terms stay cheap. One more
+    # row than the window is read to tell whether matches were left out.
+    window = settings.SEARCH_RANK_WINDOW
+    recency = (Document.updated_at.desc(), Document.id.desc())
+    candidates = (
+        select(Document.id, Document.search_vector, func.row_number().over(order_by=recency).label("n"))
+        .where(Document.company_id == company_id, Document.search_vector.op("@@")(tsquery))
+        .order_by(*recency)
+        .limit(window + 1)
+        .subquery()
+    )
+    counted = select(candidates, func.count().over().label("matches")).subquery()
+    rank = func.ts_rank_cd(counted.c.search_vector, tsquery)
+    ranked = (
+        select(counted.c.id, rank.label("rank"), counted.c.matches)
+        .where(counted.c.n <= window)
+        .order_by(rank.desc(), counted.c.id.desc())
+        .offset((page - 1) * page_size)
+        .limit(page_size + 1)
+        .subquery()
+    )
+
+    # Headlines are the expensive part: only compute them for the page
+    doc_number = (
+        select(DocumentVersion.doc_number)
+        .where(DocumentVersion.document_id == Document.id)
+        .order_by(DocumentVersion.version_number.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    headline_text = func.concat_ws(" ", doc_number, Client.name, func.fz_jsonb_text(Document.current_data))
+    stmt = (
+        select(
+            Document.id, Document.type, Document.status, Document.client_id,
+            Client.name, doc_number, ranked.c.rank,
+            func.ts_headline(config, headline_text, tsquery, HEADLINE_OPTIONS), ranked.c.matches
+        )
+        .join(ranked, ranked.c.id == Document.id)
+        .outerjoin(Client, Client.id == Document.client_id)
+        .order_by(ranked.c.rank.desc(), Document.id.desc())
+    )
+    rows = (await db.execute(stmt)).all()
+    if rows:
+        matches = rows[0][8]
+    elif page > 1:
+        # Past the last page: still report whether the window was full
+        matches = (await db.execute(select(func.count()).select_from(candidates))).scalar_one()
+    else:
+        matches = 0
+
+    return {
+        "query": q,
+        "page": page,
+        "page_size": page_size,
+        "has_more": len(rows) > page_size,
+        "truncated": matches > window,
+        "results": [
+            {
+                "document_id": r[0], "type": r[1], "status": r[2], "client_id": r[3],
+                "client_name": r[4], "doc_number": r[5], "rank": r[6], "snippet": r[7]
+            }
+            for r in rows[:page_size]
+        ]
+    }
@@ -2,18 +2,23 @@ from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import List
-import uuid
+import hashlib
 
+from app.core.config import settings
 from app.core.database import get_db
 from app.models.business import Template, DocType, DocStatus
 from app.schemas.template import TemplateOut
-from app.api.deps import get_current_company_id
+from app.api.deps import get_current_company_id, conditional_list
 from app.services.storage import storage_service
 from app.services.templates import template_engine
+from app.services.change_counters import change_counters
 
 router = APIRouter()
 
-@router.get("/", response_model=List[TemplateOut])
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Listings embed presigned URLs (1h): rotate the ETag before they expire
+@router.get("/", response_model=List[TemplateOut], dependencies=[Depends(conditional_list("templates", max_age_bucket=1800))])
 async def list_templates(
     type: DocType = None,
     db: AsyncSession = Depends(get_db),
@@ -43,12 +48,18 @@ async def upload_template(
     if not file.filename.endswith(".docx"):
         raise HTTPException(status_code=400, detail="Only .docx files are allowed")
 
-    content = await file.read()
-    
-    # Extract variables
-    variables = template_engine.extract_variables(content)
-    schema = template_engine.generate_json_schema(variables)
-    
+    # Hash while reading so a known file can skip storage and parsing
+    digest = hashlib.sha256()
+    chunks = []
+    size = 0
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        size += len(chunk)
+        if size > settings.TEMPLATE_MAX_BYTES:
+            raise HTTPException(status_code=413, detail="Template file is too large")
+        digest.update(chunk)
+        chunks.append(chunk)
+    content_hash = digest.hexdigest()
+
     # Check for existing template to handle versioning
     result = await db.execute(
         select(Template)
@@ -57,6 +68,28 @@ async def upload_template(
         .limit(1)
     )
     latest_version = result.scalar_one_or_none()
+
+    # Re-uploading the current version is a no-op
+    if latest_version and latest_version.is_active and latest_version.content_hash == content_hash:
+        latest_version.docx_source_url = storage_service.get_presigned_url(latest_version.docx_source_url)
+        return latest_version
+
+    result = await db.execute(
+        select(Template.docx_source_url, Template.schema_json, Template.render_mode)
+        .where(Template.company_id == company_id, Template.content_hash == content_hash)
+        .limit(1)
+    )
+    known = result.first()
+    if known:
+        object_name, schema, render_mode = known
+    else:
+        content = b"".join(chunks)
+        shapes = template_engine.extract_variable_shapes(content)
+        schema = template_engine.generate_json_schema(set(shapes), shapes)
+        render_mode = template_engine.classify(content)
+        # Content-addressed, so identical files share one object
+        object_name = f"templates/{company_id}/{content_hash}.docx"
+        storage_service.upload_file(content, object_name, content_type=file.content_type)
     
     version = 1
     parent_id = None
@@ -67,11 +100,6 @@ async def upload_template(
         latest_version.is_active = False
         db.add(latest_version)
 
-    # Upload to storage
-    file_uuid = uuid.uuid4()
-    object_name = f"templates/{company_id}/{file_uuid}.docx"
-    storage_service.upload_file(content, object_name, content_type=file.content_type)
-    
     # Create template record
     template = Template(
         company_id=company_id,
@@ -79,6 +107,8 @@ async def upload_template(
         type=type,
         docx_source_url=object_name,
         schema_json=schema,
+        render_mode=render_mode,
+        content_hash=content_hash,
         version=version,
         parent_id=parent_id,
         is_active=True
@@ -87,13 +117,13 @@ async def upload_template(
     db.add(template)
     await db.commit()
     await db.refresh(template)
+    await change_counters.bump(company_id, "templates")
     
     # Return with signed URL
     template.docx_source_url = storage_service.get_presigned_url(template.docx_source_url)
     return template
 
 from fastapi.responses import Response
-import io
 
 @router.post("/{template_id}/test-render")
 async def test_render_template(
@@ -118,16 +148,10 @@ async def test_render_template(
         content = storage_service.get_file_content(template.docx_source_url)
         
         # Render
-        from docxtpl import DocxTemplate
-        doc = DocxTemplate(io.BytesIO(content))
-        doc.render(data)
-        
-        output = io.BytesIO()
-        doc.save(output)
-        output.seek(0)
+        rendered = await template_engine.render_document(content, data, template)
         
         return Response(
-            content=output.read(),
+            content=rendered,
             media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
             headers={"Content-Disposition": f"attachment; filename=preview_{template_id}.docx"}
         )
@@ -148,4 +172,5 @@ async def delete_template(
     template.is_active = False # Soft delete
     db.add(template)
     await db.commit()
+    await change_counters.bump(company_id, "templates")
     return {"status": "success"}
@@ -1,11 +1,12 @@
 from celery import Celery
 from app.core.config import settings
+from app.core import profiling, tracing
 
 celery_app = Celery(
     "facturezen",
     broker=settings.REDIS_URL,
     backend=settings.REDIS_URL,
-    include=["app.tasks.documents"]
+    include=["app.tasks.documents", "app.tasks.clients", "app.tasks.reconciliation", "app.tasks.reports", "app.tasks.exports"]
 )
 
 celery_app.conf.update(
@@ -14,5 +15,20 @@ celery_app.conf.update(
     result_serializer="json",
     timezone="Europe/Paris",
     enable_utc=True,
-    task_track_started=True
+    task_track_started=True,
+    beat_schedule={
+        # Safety net for the fair scheduler: dispatch also runs on submit and on job completion
+        "dispatch-generation": {
+            "task": "dispatch_generation",
+            "schedule": settings.FAIR_DISPATCH_INTERVAL_SECONDS,
+        },
+        # Repairs drift of the incrementally maintained revenue rollups
+        "reconcile-revenue-rollups": {
+            "task": "reconcile_revenue_rollups",
+            "schedule": settings.ROLLUP_RECONCILE_INTERVAL_SECONDS,
+        },
+    }
 )
+
+tracing.instrument_celery(celery_app)
+profiling.instrument_celery(celery_app)
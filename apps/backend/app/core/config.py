@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 import os
 
@@ -28,4 +28,114 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
 
+    # Server-sent events
+    SSE_HEARTBEAT_SECONDS: int = 15
+    SSE_RETRY_MS: int = 3000
+    SSE_QUEUE_MAXSIZE: int = 100 # Per connection, overflowing clients are dropped and resume
+    SSE_BACKLOG_SIZE: int = 500 # Events kept per tenant for Last-Event-ID replay
+    SSE_BACKLOG_TTL_SECONDS: int = 3600
+
+    # Document version history
+    VERSION_SNAPSHOT_INTERVAL: int = 10 # Full snapshot every N versions, JSON-patch deltas in between
+    VERSION_CACHE_SIZE: int = 1024 # Reconstructed versions kept in memory
+
+    # Template rendering
+    TEMPLATE_MAX_BYTES: int = 20 * 1024 * 1024
+    TEMPLATE_PLAN_CACHE_SIZE: int = 256 # Fast-path substitution plans kept in memory
+
+    # Document data validation
+    VALIDATOR_CACHE_SIZE: int = 512 # Compiled template schemas kept in memory
+
+    # Bulk document creation (NDJSON)
+    DOCUMENT_BULK_MAX_ITEMS: int = 10000
+    DOCUMENT_BULK_CHUNK_SIZE: int = 500 # Lines checked and inserted per round trip
+
+    # Full-text search
+    SEARCH_CONFIG: str = "fr_unaccent"
+    SEARCH_RANK_WINDOW: int = 5000 # Matches ranked per query, bounds cost on very common terms
+
+    # Tenant-fair generation scheduling
+    FAIR_GLOBAL_CONCURRENCY: int = 8 # Jobs handed to Celery at once, ~ total worker slots
+    FAIR_DEFAULT_WEIGHT: int = 1 # Jobs per round-robin turn
+    FAIR_DEFAULT_CONCURRENCY: int = 2 # Batch jobs running at once per company
+    FAIR_TENANT_LIMITS: Dict[int, Dict[str, int]] = {} # e.g. {"42": {"weight": 3, "concurrency": 4}}
+    FAIR_INFLIGHT_TIMEOUT_SECONDS: int = 900 # Slots of jobs lost with their worker are reclaimed after this
+    FAIR_DISPATCH_INTERVAL_SECONDS: float = 5.0
+
+    # Per-company admission control
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_DEFAULT_PLAN: str = "standard"
+    ADMISSION_PLAN_CACHE_SECONDS: int = 60
+    # Token bucket per company: sustained requests/second and burst size
+    ADMISSION_PLAN_LIMITS: Dict[str, Dict[str, float]] = {
+        "free": {"rate": 5, "burst": 20},
+        "standard": {"rate": 20, "burst": 60},
+        "premium": {"rate": 100, "burst": 300},
+    }
+    # "METHOD /route/template" -> plan (or "default") -> rate/burst and/or in-process concurrency
+    ADMISSION_ROUTE_LIMITS: Dict[str, Dict[str, Dict[str, Any]]] = {
+        "POST /api/templates/{template_id}/test-render": {
+            "default": {"rate": 1, "burst": 5, "concurrency": 2},
+            "premium": {"rate": 5, "burst": 20, "concurrency": 4},
+        },
+        # Exports run as jobs, identical requests share one
+        "GET /api/documents/export/csv": {
+            "default": {"rate": 0.2, "burst": 2},
+        },
+        "POST /api/documents/exports": {
+            "default": {"rate": 0.2, "burst": 2},
+        },
+    }
+
+    # SQL instrumentation
+    SQL_ECHO: bool = False # Logs every statement, local debugging only
+    SQL_SLOW_QUERY_MS: float = 200 # Slower statements are logged, normalized with their bind types
+    SQL_N_PLUS_ONE_THRESHOLD: int = 10 # Identical statements in one request reported as N+1
+    SQL_STATS_HEADERS: bool = False # Per-request query stats as response headers (development) instead of metrics
+
+    # Tracing (API, Celery tasks, generation stages, SQL, storage, Gotenberg)
+    TRACING_EXPORTER: str = "none" # none, jsonl, otlp or "package.module:Class"
+    TRACING_SAMPLE_RATE: float = 0.01 # Share of traces started here; a caller's traceparent decides otherwise
+    TRACING_SERVICE_NAME: str = "facturezen"
+    TRACING_JSONL_PATH: str = "traces.jsonl"
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
+    TRACING_MAX_QUEUE: int = 10000 # Spans buffered for the exporter, the oldest are dropped beyond
+
+    # On-demand profiling (X-Profile token or sampling)
+    PROFILING_ADMIN_EMAILS: List[str] = [] # Operators allowed to issue tokens and read profiles
+    PROFILING_TOKEN_SECRET: Optional[str] = None # Signs X-Profile tokens, derived from JWT_SECRET when unset
+    PROFILING_INTERVAL_MS: float = 5 # Stack sampling period
+    PROFILING_SAMPLE_RATE: float = 0.0 # Share of requests under PROFILING_SAMPLE_PATHS profiled without a token
+    PROFILING_SAMPLE_PATHS: List[str] = ["/api/templates/", "/api/documents/export"] # Prefixes, all paths when empty
+    PROFILING_TASK_SAMPLE_RATE: float = 0.0 # Share of Celery tasks profiled
+    PROFILING_KEEP: int = 200 # Profiles listed and kept in storage
+
+    # Factur-X e-invoicing
+    FACTURX_ENABLED: bool = True
+    FACTURX_PROFILE: str = "minimum" # minimum or basicwl
+    FACTURX_DEFAULT_COUNTRY: str = "FR"
+    FACTURX_DEFAULT_CURRENCY: str = "EUR"
+
+    # Background jobs (merges, exports)
+    JOB_TTL_SECONDS: int = 7 * 24 * 3600 # Job status kept this long after the last update
+    MERGE_MAX_VERSIONS: int = 5000
+    MERGE_FETCH_CONCURRENCY: int = 8 # Sources downloaded ahead of the merge, bounds memory too
+    CLIENT_IMPORT_MAX_BYTES: int = 100 * 1024 * 1024
+    CLIENT_IMPORT_CHUNK_SIZE: int = 5000 # Rows validated and COPYed at a time
+
+    # Revenue rollups behind /api/reports
+    ROLLUP_RECONCILE_INTERVAL_SECONDS: int = 3600
+    INVOICE_PAYMENT_TERMS_DAYS: int = 30 # Due date of invoices whose data sets no terms
+    AGING_COMPANY_CONCURRENCY: int = 4 # Companies queried at once by the accountant aging report
+
+    # Accountant exports (one ZIP for many companies)
+    ACCOUNTANT_EXPORT_MAX_COMPANIES: int = 500
+    ACCOUNTANT_EXPORT_CONCURRENCY: int = 4 # Companies read at once, each holding a DB connection
+    COLUMNAR_EXPORT_BATCH_SIZE: int = 10000 # Rows per cursor fetch and per record batch
+    EXPORT_WATERMARK_OVERLAP_SECONDS: int = 300 # Incremental exports re-read this much before the watermark
+
+    # Bank reconciliation
+    RECONCILIATION_MAX_BYTES: int = 50 * 1024 * 1024
+    RECONCILIATION_AMOUNT_TOLERANCE: float = 1.0 # Fallback match on amounts this close, from a known client
+
 settings = Settings()
@@ -1,12 +1,15 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 from app.core.config import settings
+from app.core import query_stats, tracing
 
 engine = create_async_engine(
     settings.DATABASE_URL,
-    echo=True,
+    echo=settings.SQL_ECHO,
     future=True
 )
+query_stats.instrument_engine(engine)
+tracing.instrument_engine(engine)
 
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
@@ -0,0 +1,218 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+from jose import JWTError, jwt
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+PROFILE_AUDIENCE = "profile"
+MAX_DEPTH = 128
+
+# Token of the profiled request, passed on to the tasks it publishes
+_token: ContextVar[Optional[str]] = ContextVar("profile_token", default=None)
+# One profile at a time per process: the sampler walks every thread
+_busy = threading.Lock()
+
+# Leaf frames of threads parked in a pool, left out of the profile
+_IDLE = {("threading.py", "wait"), ("thread.py", "_worker"), ("queue.py", "get")}
+
+def _token_key() -> str:
+    # Never the access token key: a profile token must not authenticate a
+    # user, nor an access token enable profiling
+    if settings.PROFILING_TOKEN_SECRET:
+        return settings.PROFILING_TOKEN_SECRET
+    return hmac.new(settings.JWT_SECRET.encode(), b"profile-token", hashlib.sha256).hexdigest()
+
+def create_profile_token(user_id: int, path_prefix: Optional[str] = None, ttl_seconds: int = 600) -> Tuple[str, datetime]:
+    """
+    Signed value of the X-Profile header: requests carrying it (under
+    path_prefix when given) are profiled until it expires.
+    """
+    expire = datetime.utcnow() + timedelta(seconds=ttl_seconds)
+    claims = {"exp": expire, "sub": str(user_id), "type": "profile", "aud": PROFILE_AUDIENCE}
+    if path_prefix:
+        claims["path"] = path_prefix
+    return jwt.encode(claims, _token_key(), algorithm=settings.ALGORITHM), expire
+
+def verify_profile_token(token: str, path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    try:
+        claims = jwt.decode(token, _token_key(), algorithms=[settings.ALGORITHM], audience=PROFILE_AUDIENCE)
+    except JWTError:
+        return None
+    if claims.get("type") != "profile":
+        return None
+    if path is not None and not path.startswith(claims.get("path", "")):
+        return None
+    return claims
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of every thread of the process every
+    interval seconds from a background thread, so the profiled code is not
+    slowed by tracing hooks. The API runs many requests on one event loop:
+    a request's profile also shows whatever ran next to it, stacks start
+    with the thread name to tell the loop from to_thread workers.
+    """
+    def __init__(self, interval: Optional[float] = None):
+        self.interval = interval or settings.PROFILING_INTERVAL_MS / 1000
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.duration_ms = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in _IDLE:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_DEPTH:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """
+        Collapsed stacks ("root;...;leaf count" per line), the input of
+        flamegraph.pl, speedscope and most flame graph viewers.
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+def _start() -> Optional[SamplingProfiler]:
+    if not _busy.acquire(blocking=False):
+        return None
+    profiler = SamplingProfiler()
+    profiler.start()
+    return profiler
+
+def _finish(profiler: SamplingProfiler, profile_id: str, kind: str, name: str, trigger: str):
+    profiler.stop()
+    _busy.release()
+    from app.services.profiles import profile_store
+    try:
+        profile_store.save(profile_id, profiler.collapsed(), {
+            "kind": kind, "name": name, "trigger": trigger,
+            "duration_ms": round(profiler.duration_ms, 1), "samples": profiler.samples,
+        })
+    except Exception as e:
+        logger.warning(f"Could not store profile {profile_id}: {e}")
+
+def _sampled(rate: float) -> bool:
+    return rate > 0 and random.random() < rate
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling the requests that carry a valid X-Profile
+    token or fall in the PROFILING_SAMPLE_RATE share of PROFILING_SAMPLE_PATHS.
+    Other requests only pay a header lookup.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = trigger = None
+        for key, value in scope.get("headers", ()):
+            if key == b"x-profile":
+                token = value.decode("latin-1")
+                break
+        if token is not None and verify_profile_token(token, scope["path"]) is not None:
+            trigger = "token"
+        elif _sampled(settings.PROFILING_SAMPLE_RATE) and (
+            not settings.PROFILING_SAMPLE_PATHS or scope["path"].startswith(tuple(settings.PROFILING_SAMPLE_PATHS))
+        ):
+            trigger, token = "sampled", None
+        profiler = _start() if trigger else None
+        if profiler is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+        context_token = _token.set(token)
+
+        async def send_profiled(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", ()), (b"x-profile-id", profile_id.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_profiled)
+        finally:
+            _token.reset(context_token)
+            route = scope.get("route")
+            name = f"{scope['method']} {route.path if route is not None else scope['path']}"
+            await asyncio.to_thread(_finish, profiler, profile_id, "request", name, trigger)
+
+def instrument_celery(celery_app):
+    """
+    Profiles the tasks published by a token-profiled request, and the
+    PROFILING_TASK_SAMPLE_RATE share of the others.
+    """
+    from celery import signals
+
+    task_profiles: Dict[str, tuple] = {}
+
+    @signals.before_task_publish.connect(weak=False)
+    def _inject(headers=None, **kwargs):
+        token = _token.get()
+        if token and headers is not None:
+            headers.setdefault(PROFILE_HEADER, token)
+
+    @signals.task_prerun.connect(weak=False)
+    def _begin(task_id=None, task=None, **kwargs):
+        request = task.request
+        token = getattr(request, PROFILE_HEADER, None) or (getattr(request, "headers", None) or {}).get(PROFILE_HEADER)
+        if token and verify_profile_token(token) is not None:
+            trigger = "token"
+        elif _sampled(settings.PROFILING_TASK_SAMPLE_RATE):
+            trigger = "sampled"
+        else:
+            return
+        profiler = _start()
+        if profiler is not None:
+            task_profiles[task_id] = (profiler, task.name, trigger)
+
+    @signals.task_postrun.connect(weak=False)
+    def _end(task_id=None, **kwargs):
+        entry = task_profiles.pop(task_id, None)
+        if entry is not None:
+            profiler, name, trigger = entry
+            _finish(profiler, uuid.uuid4().hex, "task", name, trigger)
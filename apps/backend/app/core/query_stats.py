@@ -0,0 +1,152 @@
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, List, Optional
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Statements and DB time of the current request. Tasks and threads started
+# by the request copy the context, so they add to the same stats.
+_current: ContextVar[Optional["QueryStats"]] = ContextVar("query_stats", default=None)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w$.])\d+(?:\.\d+)?\b")
+# asyncpg placeholders carry a cast, e.g. $1::INTEGER
+_PLACEHOLDER = re.compile(r"(?:\$\d+|%\(\w+\)s|%s|\?|__\[POSTCOMPILE_\w+\])(?:::\w+)?")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+def normalize_sql(statement: str) -> str:
+    """
+    Statement with its literals and placeholders replaced by ?, IN lists
+    collapsed and whitespace squeezed: equal for the same query whatever
+    its values, so it groups repeats and is safe to log.
+    """
+    statement = _STRING.sub("?", statement)
+    statement = _PLACEHOLDER.sub("?", statement)
+    statement = _NUMBER.sub("?", statement)
+    statement = _IN_LIST.sub("(?, ...)", statement)
+    return _SPACE.sub(" ", statement).strip()
+
+def bind_shape(parameters: Any, executemany: bool = False) -> Any:
+    """
+    Type names of the bound parameters, never their values.
+    """
+    if executemany:
+        rows = list(parameters or ())
+        return {"rows": len(rows), "shape": bind_shape(rows[0]) if rows else None}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+class QueryStats:
+    """
+    Query count, DB time and repeats of each normalized statement.
+    """
+    __slots__ = ("count", "total_ms", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.statements: Counter = Counter()
+
+    def record(self, statement: str, duration_ms: float):
+        self.count += 1
+        self.total_ms += duration_ms
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: Optional[int] = None) -> List[tuple]:
+        """
+        (statement, times) run at least threshold times: likely N+1 loops.
+        """
+        threshold = threshold or settings.SQL_N_PLUS_ONE_THRESHOLD
+        return [(statement, n) for statement, n in self.statements.most_common() if n >= threshold]
+
+def instrument_engine(engine):
+    """
+    Times every statement: adds it to the current request's stats and logs
+    it when slower than SQL_SLOW_QUERY_MS, wherever it runs (API or worker).
+    """
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_start")
+        if not starts:
+            return
+        duration_ms = (time.perf_counter() - starts.pop()) * 1000
+        stats = _current.get()
+        slow = duration_ms >= settings.SQL_SLOW_QUERY_MS
+        if stats is None and not slow:
+            return
+        normalized = normalize_sql(statement)
+        if stats is not None:
+            stats.record(normalized, duration_ms)
+        if slow:
+            logger.warning(json.dumps({
+                "event": "slow_query", "duration_ms": round(duration_ms, 1), "statement": normalized,
+                "binds": bind_shape(parameters, executemany),
+            }))
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        starts = exception_context.connection.info.get("query_start") if exception_context.connection else None
+        if starts:
+            starts.pop()
+
+class QueryStatsMiddleware:
+    """
+    ASGI middleware collecting the SQL stats of each HTTP request. They go
+    out as response headers when SQL_STATS_HEADERS is set (development),
+    as metric log lines otherwise; repeated statements are logged either way.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = QueryStats()
+        token = _current.set(stats)
+
+        async def send_stats(message):
+            if message["type"] == "http.response.start" and settings.SQL_STATS_HEADERS:
+                headers = list(message.get("headers", ()))
+                headers += [
+                    (b"x-db-query-count", str(stats.count).encode()),
+                    (b"x-db-time-ms", f"{stats.total_ms:.1f}".encode()),
+                    (b"server-timing", f"db;dur={stats.total_ms:.1f};desc=\"{stats.count} queries\"".encode()),
+                ]
+                repeated = stats.repeated()
+                if repeated:
+                    headers.append((b"x-db-n-plus-one", str(len(repeated)).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_stats)
+        finally:
+            _current.reset(token)
+            _report(scope, stats)
+
+def _report(scope, stats: QueryStats):
+    route = scope.get("route")
+    path = f"{scope['method']} {route.path if route is not None else scope['path']}"
+    for statement, times in stats.repeated():
+        logger.warning(json.dumps({"event": "n_plus_one", "route": path, "times": times, "statement": statement}))
+    if not settings.SQL_STATS_HEADERS and stats.count:
+        logger.info(json.dumps({"metric": "db_queries_per_request", "route": path, "value": stats.count}))
+        logger.info(json.dumps({"metric": "db_time_ms_per_request", "route": path, "value": round(stats.total_ms, 1)}))
@@ -0,0 +1,33 @@
+import redis
+import redis.asyncio as aioredis
+from typing import Optional
+from app.core.config import settings
+
+# Clients are created on first use and shared by the whole process:
+# redis-py pools connections internally.
+_sync_client: Optional[redis.Redis] = None
+_async_client: Optional[aioredis.Redis] = None
+
+def get_sync_redis() -> redis.Redis:
+    """
+    Redis client for synchronous code (Celery tasks, scripts).
+    """
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _sync_client
+
+def get_async_redis() -> aioredis.Redis:
+    """
+    Redis client for the API event loop.
+    """
+    global _async_client
+    if _async_client is None:
+        _async_client = aioredis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _async_client
+
+async def close_redis():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
@@ -0,0 +1,405 @@
+import atexit
+import contextvars
+import importlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Span of the unit of work running in this context (request, task, stage)
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("trace_span", default=None)
+
+OTLP_KINDS = {"internal": 1, "server": 2, "client": 3, "producer": 4, "consumer": 5}
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """
+    (trace id, parent span id, sampled) of a W3C traceparent header, or None.
+    """
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        flags = int(parts[3][:2], 16)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+class Span:
+    """
+    One timed operation. Entering it makes it the parent of the spans opened
+    inside; unsampled spans only carry the trace context downstream.
+    """
+    __slots__ = ("tracer", "trace_id", "span_id", "parent_id", "name", "kind", "sampled",
+                 "start_ns", "end_ns", "attributes", "error", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: Optional[str],
+                 sampled: bool = True, kind: str = "internal", attributes: Optional[Dict[str, Any]] = None):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.sampled = sampled
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes or {}
+        self.error = None
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def record_error(self, exc: BaseException):
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            if self.sampled:
+                self.tracer.export(self)
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.record_error(exc)
+        self.end()
+        _current.reset(self._token)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+            "name": self.name, "kind": self.kind, "start_ns": self.start_ns, "end_ns": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3), "attributes": self.attributes,
+            "error": self.error,
+        }
+
+class _NoopSpan:
+    """
+    Stands for every span outside a sampled trace: costs one context lookup.
+    """
+    sampled = False
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def record_error(self, exc: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+class JsonLinesExporter:
+    """
+    One JSON object per span appended to a local file, for offline analysis.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.TRACING_JSONL_PATH
+
+    def export(self, spans: List[Dict[str, Any]]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(span, default=str) + "\n" for span in spans)
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def otlp_payload(spans: List[Dict[str, Any]], service_name: str) -> Dict[str, Any]:
+    """
+    OTLP/HTTP JSON body for the spans (hex ids, nanosecond strings).
+    """
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+        "scopeSpans": [{
+            "scope": {"name": "app.core.tracing"},
+            "spans": [
+                {
+                    "traceId": span["trace_id"],
+                    "spanId": span["span_id"],
+                    **({"parentSpanId": span["parent_id"]} if span["parent_id"] else {}),
+                    "name": span["name"],
+                    "kind": OTLP_KINDS.get(span["kind"], 1),
+                    "startTimeUnixNano": str(span["start_ns"]),
+                    "endTimeUnixNano": str(span["end_ns"]),
+                    "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span["attributes"].items()],
+                    "status": {"code": 2, "message": span["error"]} if span["error"] else {"code": 1},
+                }
+                for span in spans
+            ],
+        }],
+    }]}
+
+class OtlpHttpExporter:
+    """
+    Sends spans to an OpenTelemetry collector over OTLP/HTTP with JSON.
+    """
+    def __init__(self, endpoint: Optional[str] = None):
+        self.endpoint = endpoint or settings.TRACING_OTLP_ENDPOINT
+        self._client = None
+
+    def export(self, spans: List[Dict[str, Any]]):
+        if self._client is None:
+            import httpx
+            self._client = httpx.Client(timeout=5.0)
+        response = self._client.post(self.endpoint, json=otlp_payload(spans, settings.TRACING_SERVICE_NAME))
+        response.raise_for_status()
+
+EXPORTERS = {"jsonl": JsonLinesExporter, "otlp": OtlpHttpExporter}
+
+def load_exporter(name: str):
+    """
+    Exporter by name, or any class with an export(spans) method given as
+    "package.module:Class".
+    """
+    if name in EXPORTERS:
+        return EXPORTERS[name]()
+    module, _, attribute = name.partition(":")
+    return getattr(importlib.import_module(module), attribute)()
+
+class _BatchProcessor:
+    """
+    Hands finished spans to the exporter from a background thread, in
+    batches, so the traced code never waits on I/O. When the exporter falls
+    behind, the oldest spans are dropped.
+    """
+    def __init__(self, exporter, max_queue: int, interval: float = 2.0, batch_size: int = 512):
+        self.exporter = exporter
+        self.interval = interval
+        self.batch_size = batch_size
+        self._queue = deque(maxlen=max_queue)
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def add(self, span: Span):
+        self._queue.append(span.to_dict())
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        with self._lock:
+            while self._queue:
+                batch = []
+                while self._queue and len(batch) < self.batch_size:
+                    batch.append(self._queue.popleft())
+                try:
+                    self.exporter.export(batch)
+                except Exception as e:
+                    logger.warning(f"Could not export {len(batch)} spans: {e}")
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+class Tracer:
+    """
+    Minimal tracer with W3C trace context propagation. Roots are started by
+    the API middleware and by Celery tasks, sampled at TRACING_SAMPLE_RATE
+    unless the caller's traceparent decides; spans are cheap no-ops outside
+    a sampled trace and nothing is installed when TRACING_EXPORTER is "none".
+    """
+    def __init__(self, exporter=None, sample_rate: Optional[float] = None):
+        self._exporter = exporter
+        self._sample_rate = sample_rate
+        self._processor = None
+        self._pid = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._exporter is not None or settings.TRACING_EXPORTER != "none"
+
+    @property
+    def sample_rate(self) -> float:
+        return settings.TRACING_SAMPLE_RATE if self._sample_rate is None else self._sample_rate
+
+    def start_trace(self, name: str, traceparent: Optional[str] = None, kind: str = "server", **attributes):
+        """
+        Root span of a unit of work, continuing the caller's trace when a
+        traceparent is given. Enter it to make it current.
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        parent = parse_traceparent(traceparent)
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id, parent_id, sampled = _new_id(128), None, random.random() < self.sample_rate
+        return Span(self, name, trace_id, parent_id, sampled, kind, attributes if sampled else None)
+
+    def span(self, name: str, kind: str = "internal", **attributes):
+        """
+        Child of the current span; a no-op outside a sampled trace.
+        Enter it to time a block, or call end() for spans timed by hooks.
+        """
+        parent = _current.get()
+        if parent is None or not parent.sampled:
+            return NOOP_SPAN
+        return Span(self, name, parent.trace_id, parent.span_id, True, kind, attributes)
+
+    def current_traceparent(self) -> Optional[str]:
+        span = _current.get()
+        return span.traceparent() if span is not None else None
+
+    def export(self, span: Span):
+        # Started per process: Celery forks its workers after import
+        if self._pid != os.getpid():
+            exporter = self._exporter or load_exporter(settings.TRACING_EXPORTER)
+            self._processor = _BatchProcessor(exporter, settings.TRACING_MAX_QUEUE)
+            self._pid = os.getpid()
+        self._processor.add(span)
+
+    def flush(self):
+        if self._processor is not None and self._pid == os.getpid():
+            self._processor.flush()
+
+tracer = Tracer()
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening the server span of each HTTP request, named
+    after the matched route once routing is done.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+        traceparent = None
+        for key, value in scope.get("headers", ()):
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        method = scope["method"]
+        span = tracer.start_trace(f"{method} {scope['path']}", traceparent, "server", **{
+            "http.method": method, "http.target": scope["path"],
+        })
+
+        async def send_traced(message):
+            if message["type"] == "http.response.start":
+                span.set_attribute("http.status_code", message["status"])
+            await send(message)
+
+        with span:
+            try:
+                await self.app(scope, receive, send_traced)
+            finally:
+                route = scope.get("route")
+                if route is not None and span.sampled:
+                    span.name = f"{method} {route.path}"
+
+def instrument_engine(engine):
+    """
+    One client span per SQL statement, timed around the cursor execution.
+    """
+    if not tracer.enabled:
+        return
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        span = tracer.span("db.query", "client")
+        if span.sampled:
+            span.set_attribute("db.system", "postgresql")
+            span.set_attribute("db.operation", statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "")
+            span.set_attribute("db.statement", statement[:2000])
+            if executemany:
+                span.set_attribute("db.executemany", True)
+        conn.info.setdefault("trace_spans", []).append(span)
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("trace_spans")
+        if spans:
+            spans.pop().end()
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        spans = exception_context.connection.info.get("trace_spans") if exception_context.connection else None
+        if spans:
+            span = spans.pop()
+            span.record_error(exception_context.original_exception)
+            span.end()
+
+def instrument_celery(celery_app):
+    """
+    Propagates the trace context in task message headers and opens a span
+    around each task, continuing the publisher's trace.
+    """
+    if not tracer.enabled:
+        return
+    from celery import signals
+
+    task_spans: Dict[str, Span] = {}
+
+    @signals.before_task_publish.connect(weak=False)
+    def _inject(headers=None, **kwargs):
+        traceparent = tracer.current_traceparent()
+        if traceparent and headers is not None:
+            # A traceparent set by the caller (queued jobs) wins
+            headers.setdefault("traceparent", traceparent)
+
+    @signals.task_prerun.connect(weak=False)
+    def _start(task_id=None, task=None, **kwargs):
+        request = task.request
+        traceparent = getattr(request, "traceparent", None) or (getattr(request, "headers", None) or {}).get("traceparent")
+        span = tracer.start_trace(f"task {task.name}", traceparent, "consumer", **{"celery.task_id": task_id})
+        span.__enter__()
+        task_spans[task_id] = span
+
+    @signals.task_failure.connect(weak=False)
+    def _failure(task_id=None, exception=None, **kwargs):
+        span = task_spans.get(task_id)
+        if span is not None and exception is not None:
+            span.record_error(exception)
+
+    @signals.task_postrun.connect(weak=False)
+    def _end(task_id=None, **kwargs):
+        span = task_spans.pop(task_id, None)
+        if span is not None:
+            span.__exit__(None, None, None)
+
+    @signals.worker_process_shutdown.connect(weak=False)
+    def _flush(**kwargs):
+        tracer.flush()
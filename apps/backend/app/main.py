@@ -1,11 +1,32 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.logging import setup_logging, LoggingMiddleware
-from app.api import auth, companies, clients, templates, documents, accountant
+from app.core.profiling import ProfilingMiddleware
+from app.core.query_stats import QueryStatsMiddleware
+from app.core.tracing import TracingMiddleware
+from app.core.redis import close_redis
+from app.services.events import event_broker
+from app.services.storage import storage_service
+from app.api import auth, companies, clients, templates, documents, accountant, events, search, jobs, reconciliation, reports, profiles
+from app.api.admission import admission_control
 
-app = FastAPI(title="FactureZen API", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Network-bound setup runs here rather than at import time, so test
+    # collection and Celery workers importing app modules never wait on it.
+    await asyncio.to_thread(storage_service.ensure_bucket)
+    yield
+    await event_broker.close()
+    await close_redis()
+
+app = FastAPI(title="FactureZen API", version="0.1.0", default_response_class=ORJSONResponse, lifespan=lifespan)
 setup_logging()
 app.add_middleware(LoggingMiddleware)
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(ProfilingMiddleware)
 
 # Configure CORS
 app.add_middleware(
@@ -15,14 +36,24 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so the request span covers the other middlewares
+app.add_middleware(TracingMiddleware)
 
 # Register routers
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
-app.include_router(companies.router, prefix="/api/companies", tags=["companies"])
-app.include_router(clients.router, prefix="/api/clients", tags=["clients"])
-app.include_router(templates.router, prefix="/api/templates", tags=["templates"])
-app.include_router(documents.router, prefix="/api/documents", tags=["documents"])
-app.include_router(accountant.router, prefix="/api/accountant", tags=["accountant"])
+# Tenant routes go through per-company admission control
+admitted = [Depends(admission_control)]
+app.include_router(companies.router, prefix="/api/companies", tags=["companies"], dependencies=admitted)
+app.include_router(clients.router, prefix="/api/clients", tags=["clients"], dependencies=admitted)
+app.include_router(templates.router, prefix="/api/templates", tags=["templates"], dependencies=admitted)
+app.include_router(documents.router, prefix="/api/documents", tags=["documents"], dependencies=admitted)
+app.include_router(accountant.router, prefix="/api/accountant", tags=["accountant"], dependencies=admitted)
+app.include_router(events.router, prefix="/api/events", tags=["events"])
+app.include_router(search.router, prefix="/api/search", tags=["search"], dependencies=admitted)
+app.include_router(jobs.router, prefix="/api/jobs", tags=["jobs"], dependencies=admitted)
+app.include_router(reports.router, prefix="/api/reports", tags=["reports"], dependencies=admitted)
+app.include_router(reconciliation.router, prefix="/api/reconciliation", tags=["reconciliation"], dependencies=admitted)
+app.include_router(profiles.router, prefix="/api/profiles", tags=["profiles"])
 
 @app.get("/health")
 async def health_check():
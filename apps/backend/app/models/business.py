@@ -1,7 +1,9 @@
-from datetime import datetime
+from datetime import date, datetime
+from decimal import Decimal
 from enum import Enum
 from typing import Optional, List
-from sqlalchemy import String, ForeignKey, JSON, Integer, Boolean, DateTime, UniqueConstraint, BigInteger
+from sqlalchemy import String, ForeignKey, JSON, Integer, Boolean, DateTime, UniqueConstraint, BigInteger, Index, Numeric, Date, Float, text
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.core.database import Base
 
@@ -17,6 +19,11 @@ class DocStatus(str, Enum):
     PAID = "PAID"
     CANCELLED = "CANCELLED"
 
+# SQL counterparts of normalize_vat_number / normalize_registration_number
+# (schemas.client), for clients stored before identifiers were normalized
+NORMALIZED_VAT_NUMBER = r"upper(regexp_replace({column}, '\s', '', 'g'))"
+NORMALIZED_REGISTRATION_NUMBER = r"regexp_replace({column}, '[\s.]', '', 'g')"
+
 class Client(Base):
     __tablename__ = "clients"
 
@@ -29,6 +36,17 @@ class Client(Base):
     registration_number: Mapped[Optional[str]] = mapped_column(String(50)) # SIRET
     is_archived: Mapped[bool] = mapped_column(default=False)
     created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Duplicate lookups of client imports; incremental exports
+    __table_args__ = (
+        Index(
+            "ix_clients_company_registration_number_norm", "company_id",
+            text(NORMALIZED_REGISTRATION_NUMBER.format(column="registration_number")),
+        ),
+        Index("ix_clients_company_vat_number_norm", "company_id", text(NORMALIZED_VAT_NUMBER.format(column="vat_number"))),
+        Index("ix_clients_company_updated_at", "company_id", "updated_at"),
+    )
 
 class Template(Base):
     __tablename__ = "templates"
@@ -38,11 +56,16 @@ class Template(Base):
     type: Mapped[DocType] = mapped_column(String(20))
     name: Mapped[str] = mapped_column(String(255))
     version: Mapped[int] = mapped_column(default=1)
+    parent_id: Mapped[Optional[int]] = mapped_column(ForeignKey("templates.id")) # First version of this template
     is_active: Mapped[bool] = mapped_column(default=True)
     docx_source_url: Mapped[str] = mapped_column(String(1000))
+    content_hash: Mapped[Optional[str]] = mapped_column(String(64)) # SHA-256 of the DOCX
     schema_json: Mapped[dict] = mapped_column(JSON) # Field definitions
+    render_mode: Mapped[str] = mapped_column(String(20), default="docxtpl", server_default="docxtpl") # "fast" for placeholder-only templates
     created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
 
+    __table_args__ = (Index("ix_templates_company_content_hash", "company_id", "content_hash"),)
+
 class Document(Base):
     __tablename__ = "documents"
 
@@ -53,9 +76,13 @@ class Document(Base):
     type: Mapped[DocType] = mapped_column(String(20))
     status: Mapped[DocStatus] = mapped_column(default=DocStatus.DRAFT)
     
-    current_data: Mapped[dict] = mapped_column(JSON) # Variable values
-    current_totals: Mapped[dict] = mapped_column(JSON) # Precomputed totals
-    extra_metadata: Mapped[Optional[dict]] = mapped_column(JSON) # Factur-X / Compliance tags
+    current_data: Mapped[dict] = mapped_column(JSONB) # Variable values
+    current_totals: Mapped[dict] = mapped_column(JSONB) # Precomputed totals
+    extra_metadata: Mapped[Optional[dict]] = mapped_column(JSONB) # Factur-X / Compliance tags
+    search_vector: Mapped[Optional[str]] = mapped_column(TSVECTOR, deferred=True) # Maintained by DB triggers
+    # Set at generation from the payment terms, for receivables aging
+    due_date: Mapped[Optional[date]] = mapped_column(Date)
+    amount_due: Mapped[Optional[Decimal]] = mapped_column(Numeric(16, 2))
     
     created_by: Mapped[int] = mapped_column(ForeignKey("users.id"))
     created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
@@ -63,6 +90,20 @@ class Document(Base):
 
     versions: Mapped[List["DocumentVersion"]] = relationship(back_populates="document")
 
+    # Containment (@>) and jsonpath (@?) filters; totals expression indexes live in the migration
+    __table_args__ = (
+        Index("ix_documents_current_data", "current_data", postgresql_using="gin", postgresql_ops={"current_data": "jsonb_path_ops"}),
+        Index("ix_documents_extra_metadata", "extra_metadata", postgresql_using="gin", postgresql_ops={"extra_metadata": "jsonb_path_ops"}),
+        # Incremental exports
+        Index("ix_documents_company_updated_at", "company_id", "updated_at"),
+        # Unpaid invoices only: aging reads it without touching the heap
+        Index(
+            "ix_documents_unpaid_due", "company_id", "client_id", "due_date",
+            postgresql_include=["amount_due"],
+            postgresql_where=text("type = 'INVOICE' AND status IN ('GENERATED', 'SENT')"),
+        ),
+    )
+
 class DocumentVersion(Base):
     __tablename__ = "document_versions"
 
@@ -71,16 +112,22 @@ class DocumentVersion(Base):
     version_number: Mapped[int] = mapped_column()
     doc_number: Mapped[str] = mapped_column(String(50)) # Final number like FAC-2026-0001
     
-    snapshot_data: Mapped[dict] = mapped_column(JSON)
+    snapshot_data: Mapped[Optional[dict]] = mapped_column(JSONB) # Full snapshot, every N versions
+    snapshot_delta: Mapped[Optional[list]] = mapped_column(JSONB) # JSON-patch from the previous version
     pdf_url: Mapped[str] = mapped_column(String(1000))
     docx_url: Mapped[str] = mapped_column(String(1000))
-    extra_metadata: Mapped[Optional[dict]] = mapped_column(JSON) # Snapshot of Factur-X tags
+    extra_metadata: Mapped[Optional[dict]] = mapped_column(JSONB) # Snapshot of Factur-X tags
     
     generated_by: Mapped[int] = mapped_column(ForeignKey("users.id"))
     generated_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
 
     document: Mapped["Document"] = relationship(back_populates="versions")
 
+    __table_args__ = (
+        UniqueConstraint("document_id", "version_number", name="uix_document_version"),
+        Index("ix_document_versions_generated_at", "generated_at"), # Incremental exports
+    )
+
 class NumberSequence(Base):
     __tablename__ = "number_sequences"
 
@@ -91,3 +138,46 @@ class NumberSequence(Base):
     last_value: Mapped[int] = mapped_column(default=0)
 
     __table_args__ = (UniqueConstraint("company_id", "doc_type", "year", name="uix_company_type_year"),)
+
+class PaymentMatch(Base):
+    """
+    A bank statement line and the open invoice it was matched to, if any.
+    Proposals become confirmed (invoice marked PAID) or rejected by the user.
+    """
+    __tablename__ = "payment_matches"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    company_id: Mapped[int] = mapped_column(ForeignKey("companies.id"))
+    statement_id: Mapped[str] = mapped_column(String(36)) # Id of the reconciliation job
+    line_number: Mapped[int] = mapped_column()
+    booking_date: Mapped[Optional[date]] = mapped_column(Date)
+    amount: Mapped[Decimal] = mapped_column(Numeric(14, 2))
+    currency: Mapped[Optional[str]] = mapped_column(String(3))
+    label: Mapped[Optional[str]] = mapped_column(String(500))
+    counterparty: Mapped[Optional[str]] = mapped_column(String(255))
+    document_id: Mapped[Optional[int]] = mapped_column(ForeignKey("documents.id"))
+    rule: Mapped[Optional[str]] = mapped_column(String(20)) # number, amount_client, amount, tolerance
+    score: Mapped[Optional[float]] = mapped_column(Float)
+    status: Mapped[str] = mapped_column(String(20)) # proposed, unmatched, confirmed, rejected
+    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_payment_matches_company_statement", "company_id", "statement_id", "line_number"),
+    )
+
+class RevenueRollup(Base):
+    """
+    Running totals of generated (non-draft) documents, maintained in the same
+    transaction as every status or totals change and repaired periodically.
+    """
+    __tablename__ = "revenue_rollups"
+
+    company_id: Mapped[int] = mapped_column(ForeignKey("companies.id"), primary_key=True)
+    month: Mapped[date] = mapped_column(Date, primary_key=True) # First day of the document's month
+    doc_type: Mapped[DocType] = mapped_column(String(20), primary_key=True)
+    status: Mapped[DocStatus] = mapped_column(String(20), primary_key=True)
+    client_id: Mapped[int] = mapped_column(ForeignKey("clients.id"), primary_key=True)
+    documents: Mapped[int] = mapped_column(default=0)
+    total_ht: Mapped[Decimal] = mapped_column(Numeric(16, 2), default=0)
+    total_tva: Mapped[Decimal] = mapped_column(Numeric(16, 2), default=0)
+    total_ttc: Mapped[Decimal] = mapped_column(Numeric(16, 2), default=0)
@@ -34,6 +34,7 @@ class Company(Base):
     vat_number: Mapped[Optional[str]] = mapped_column(String(50))
     registration_number: Mapped[Optional[str]] = mapped_column(String(50)) # SIRET
     period_locked_until: Mapped[Optional[datetime]] = mapped_column(DateTime) # For compliance
+    plan: Mapped[str] = mapped_column(String(50), default="standard", server_default="standard") # Admission limits
     created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
 
     memberships: Mapped[List["Membership"]] = relationship(back_populates="company")
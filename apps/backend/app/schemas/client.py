@@ -1,7 +1,28 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field, field_validator
 from typing import Optional
 from datetime import datetime
 
+# Identifiers are stored without spacing so duplicates can be found. The
+# import applies the same normalization in SQL to existing clients (see
+# NORMALIZED_VAT_NUMBER in models.business), which also covers
+# clients saved before it
+def normalize_vat_number(value: Optional[str]) -> Optional[str]:
+    return "".join(value.split()).upper() if value else value
+
+def normalize_registration_number(value: Optional[str]) -> Optional[str]:
+    return "".join(value.replace(".", " ").split()) if value else value
+
+class NormalizedIdentifiers(BaseModel):
+    @field_validator("vat_number", mode="after", check_fields=False)
+    @classmethod
+    def normalize_vat(cls, value):
+        return normalize_vat_number(value)
+
+    @field_validator("registration_number", mode="after", check_fields=False)
+    @classmethod
+    def normalize_registration(cls, value):
+        return normalize_registration_number(value)
+
 class ClientBase(BaseModel):
     name: str
     email: Optional[EmailStr] = None
@@ -10,10 +31,10 @@ class ClientBase(BaseModel):
     registration_number: Optional[str] = None
     is_archived: bool = False
 
-class ClientCreate(ClientBase):
+class ClientCreate(NormalizedIdentifiers, ClientBase):
     pass
 
-class ClientUpdate(BaseModel):
+class ClientUpdate(NormalizedIdentifiers):
     name: Optional[str] = None
     email: Optional[EmailStr] = None
     address: Optional[str] = None
@@ -28,3 +49,21 @@ class ClientOut(ClientBase):
 
     class Config:
         from_attributes = True
+
+class ClientImportRow(NormalizedIdentifiers):
+    """
+    One row of a client import. Bounds follow the column sizes so the COPY
+    into the staging table never rejects a validated row.
+    """
+    name: str = Field(min_length=1, max_length=255)
+    email: Optional[EmailStr] = Field(None, max_length=255)
+    address: Optional[str] = Field(None, max_length=500)
+    vat_number: Optional[str] = Field(None, max_length=50)
+    registration_number: Optional[str] = Field(None, max_length=50)
+
+    @field_validator("*", mode="before")
+    @classmethod
+    def empty_as_none(cls, value):
+        if isinstance(value, str):
+            value = value.strip()
+        return value or None
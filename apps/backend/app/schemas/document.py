@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import Optional, List, Dict, Any
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from app.models.business import DocType, DocStatus
 
 class DocumentBase(BaseModel):
@@ -40,3 +40,35 @@ class DocumentVersionOut(BaseModel):
 
     class Config:
         from_attributes = True
+
+class DocumentVersionDiff(BaseModel):
+    from_version: int
+    to_version: int
+    patch: List[Dict[str, Any]] # RFC 6902 operations turning from_version into to_version
+
+class DocumentValidateRequest(BaseModel):
+    document_ids: List[int] = Field(min_length=1, max_length=5000)
+
+class DocumentValidationResult(BaseModel):
+    document_id: int
+    valid: bool
+    errors: List[str] = []
+
+class DocumentBulkError(BaseModel):
+    line: int
+    error: str
+
+class DocumentBulkResult(BaseModel):
+    created: int
+    ids: List[Optional[int]] # One per input line, None for rejected lines
+    errors: List[DocumentBulkError] = []
+    job_ids: List[str] = [] # Generation jobs of the created documents, when requested
+
+class DocumentStatusBulkRequest(BaseModel):
+    document_ids: List[int] = Field(min_length=1, max_length=5000)
+    status: DocStatus
+
+class DocumentStatusOutcome(BaseModel):
+    document_id: int
+    outcome: str # updated, unchanged, not_found, locked or invalid_transition
+    status: Optional[DocStatus] = None # Status after the request
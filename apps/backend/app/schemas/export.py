@@ -0,0 +1,30 @@
+from datetime import date, datetime
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field, model_validator
+
+class DocumentExportRequest(BaseModel):
+    # bundle: csv and fec in a ZIP; parquet and arrow (IPC stream): one file per table in a ZIP
+    format: Literal["csv", "fec", "bundle", "parquet", "arrow"] = "csv"
+    period_start: Optional[date] = None
+    period_end: Optional[date] = None # Inclusive
+    since: Optional[datetime] = None # Watermark of the previous columnar export, only its changes are exported
+
+    @model_validator(mode="after")
+    def check_period(self):
+        if self.period_start and self.period_end and self.period_end < self.period_start:
+            raise ValueError("period_end is before period_start")
+        if self.since is not None and self.format not in ("parquet", "arrow"):
+            raise ValueError("since is only supported by parquet and arrow exports")
+        return self
+
+class AccountantExportRequest(BaseModel):
+    company_ids: Optional[List[int]] = None # All the accountant's companies when omitted
+    period_start: date
+    period_end: date # Inclusive
+    formats: List[Literal["fec", "csv"]] = Field(["fec", "csv"], min_length=1)
+
+    @model_validator(mode="after")
+    def check_period(self):
+        if self.period_end < self.period_start:
+            raise ValueError("period_end is before period_start")
+        return self
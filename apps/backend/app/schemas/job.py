@@ -0,0 +1,29 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+
+class QueueStats(BaseModel):
+    pending: int # Batch jobs waiting for this company
+    inflight: int
+    weight: int
+    concurrency: int
+    priority_jobs: int
+    priority_avg_wait_ms: Optional[int] = None
+    priority_max_wait_ms: Optional[int] = None
+    batch_jobs: int
+    batch_avg_wait_ms: Optional[int] = None
+    batch_max_wait_ms: Optional[int] = None
+
+class JobOut(BaseModel):
+    job_id: str
+    kind: str
+    status: str # PENDING, STARTED, SUCCESS or FAILURE
+    done: int
+    total: int
+    error: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    parts: Optional[Dict[str, Any]] = None # State of each part, for jobs made of parts
+    created_at: float
+    updated_at: float
+
+class MergePdfRequest(BaseModel):
+    version_ids: List[int] = Field(min_length=1) # Merge order
@@ -0,0 +1,21 @@
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel, Field
+
+class ProfileTokenRequest(BaseModel):
+    path_prefix: Optional[str] = None # Only requests under it are profiled, e.g. /api/templates/
+    ttl_seconds: int = Field(600, ge=1, le=3600)
+
+class ProfileTokenOut(BaseModel):
+    header: str # Request header to send the token in
+    token: str
+    expires_at: datetime
+
+class ProfileOut(BaseModel):
+    profile_id: str
+    kind: str # request or task
+    name: str # Route or task name
+    trigger: str # token or sampled
+    duration_ms: float
+    samples: int
+    created_at: float
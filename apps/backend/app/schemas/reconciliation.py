@@ -0,0 +1,28 @@
+from datetime import date, datetime
+from decimal import Decimal
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+class PaymentMatchOut(BaseModel):
+    id: int
+    statement_id: str
+    line_number: int
+    booking_date: Optional[date] = None
+    amount: Decimal
+    currency: Optional[str] = None
+    label: Optional[str] = None
+    counterparty: Optional[str] = None
+    document_id: Optional[int] = None
+    rule: Optional[str] = None # number, amount_client, amount or tolerance
+    score: Optional[float] = None
+    status: str # proposed, unmatched, confirmed or rejected
+
+    class Config:
+        from_attributes = True
+
+class PaymentMatchIds(BaseModel):
+    match_ids: List[int] = Field(min_length=1, max_length=5000)
+
+class PaymentMatchOutcome(BaseModel):
+    match_id: int
+    outcome: str # confirmed, rejected, not_found, or why the invoice could not be marked PAID
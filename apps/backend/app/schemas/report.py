@@ -0,0 +1,46 @@
+from datetime import date
+from decimal import Decimal
+from typing import List, Optional
+from pydantic import BaseModel
+from app.models.business import DocType, DocStatus
+
+class SummaryRow(BaseModel):
+    # Only the grouping keys of the request are set
+    month: Optional[date] = None
+    client_id: Optional[int] = None
+    doc_type: Optional[DocType] = None
+    status: Optional[DocStatus] = None
+    documents: int
+    total_ht: Decimal
+    total_tva: Decimal # VAT collected
+    total_ttc: Decimal
+
+class SummaryOut(BaseModel):
+    rows: List[SummaryRow]
+    total: SummaryRow
+
+class AgingRow(BaseModel):
+    # Unpaid amounts by days past the due date
+    client_id: Optional[int] = None # Not set on totals
+    client_name: Optional[str] = None
+    invoices: int
+    current: Decimal # Not due yet
+    days_0_30: Decimal
+    days_31_60: Decimal
+    days_61_90: Decimal
+    days_90_plus: Decimal
+    total: Decimal
+
+class AgingOut(BaseModel):
+    as_of: date
+    rows: List[AgingRow]
+    total: AgingRow
+
+class CompanyAgingOut(AgingOut):
+    company_id: int
+    company_name: str
+
+class AccountantAgingOut(BaseModel):
+    as_of: date
+    companies: List[CompanyAgingOut]
+    total: AgingRow
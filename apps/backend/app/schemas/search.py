@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+from typing import Optional, List
+from app.models.business import DocType, DocStatus
+
+class SearchHit(BaseModel):
+    document_id: int
+    type: DocType
+    status: DocStatus
+    client_id: int
+    client_name: Optional[str] = None
+    doc_number: Optional[str] = None
+    rank: float
+    snippet: str # Matches wrapped in <mark></mark>
+
+class SearchResults(BaseModel):
+    query: str
+    page: int
+    page_size: int
+    has_more: bool
+    truncated: bool # More matches than SEARCH_RANK_WINDOW: only the most recent were ranked
+    results: List[SearchHit]
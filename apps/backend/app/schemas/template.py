@@ -15,8 +15,10 @@ class TemplateOut(TemplateBase):
     id: int
     company_id: int
     version: int
+    parent_id: Optional[int] = None
     docx_source_url: str
     schema_json: dict
+    render_mode: str
     created_at: datetime
 
     class Config:
@@ -0,0 +1,130 @@
+import asyncio
+import re
+from datetime import date, datetime, timedelta
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Dict, List, Optional
+from sqlalchemy import Date, bindparam, func, literal_column, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.business import Client, Document, DocType, DocStatus
+
+# Invoices still waiting for their payment
+UNPAID_STATUSES = (DocStatus.GENERATED, DocStatus.SENT)
+
+# Bucket name and its bounds in days past the due date, inclusive
+BUCKETS = (
+    ("current", None, -1), # Not due yet
+    ("days_0_30", 0, 30),
+    ("days_31_60", 31, 60),
+    ("days_61_90", 61, 90),
+    ("days_90_plus", 91, None),
+)
+
+TERMS_KEYS = ("payment_terms_days", "payment_terms")
+CENT = Decimal("0.01")
+
+def _parse_date(value) -> Optional[date]:
+    if isinstance(value, date):
+        return value
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(str(value).strip(), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+def due_date_for(issued_at: datetime, data: Optional[dict], default_days: int) -> date:
+    """
+    Due date of a document issued at issued_at: an explicit due_date in its
+    data, else its payment terms in days ("30", "45 jours"), else the default.
+    """
+    data = data or {}
+    due = _parse_date(data.get("due_date")) if data.get("due_date") else None
+    if due is not None:
+        return due
+    days = default_days
+    for key in TERMS_KEYS:
+        value = data.get(key)
+        match = re.match(r"\s*(\d{1,3})\b", str(value)) if value is not None else None
+        if match:
+            days = int(match.group(1))
+            break
+    return issued_at.date() + timedelta(days=days)
+
+def amount_due_for(totals: Optional[dict]) -> Optional[Decimal]:
+    """
+    Amount the client owes: the totals' due (after deposits) or the TTC total.
+    """
+    totals = totals or {}
+    value = totals.get("due", totals.get("total_ttc"))
+    try:
+        # Half up like round() in SQL
+        return Decimal(str(value)).quantize(CENT, ROUND_HALF_UP) if value is not None else None
+    except InvalidOperation:
+        return None
+
+def _unpaid_invoices():
+    # Literals rather than parameters: the planner must see that the
+    # predicate implies the partial index's, whatever the plan cache does
+    return (
+        Document.type == literal_column(f"'{DocType.INVOICE.value}'"),
+        Document.status.in_([literal_column(f"'{s.value}'") for s in UNPAID_STATUSES]),
+    )
+
+def aging_query(company_id: int, as_of: date):
+    """
+    One grouped statement: per client, the unpaid amounts by bucket.
+    """
+    overdue = bindparam("as_of", as_of, type_=Date) - Document.due_date
+    buckets = []
+    for name, low, high in BUCKETS:
+        if low is None:
+            condition = overdue <= high
+        elif high is None:
+            condition = overdue >= low
+        else:
+            condition = overdue.between(low, high)
+        buckets.append(func.coalesce(func.sum(Document.amount_due).filter(condition), 0).label(name))
+    return (
+        select(
+            Document.client_id,
+            Client.name.label("client_name"),
+            func.count().label("invoices"),
+            *buckets,
+            func.coalesce(func.sum(Document.amount_due), 0).label("total"),
+        )
+        .join(Client, Client.id == Document.client_id)
+        .where(Document.company_id == company_id, *_unpaid_invoices())
+        .group_by(Document.client_id, Client.name)
+        .order_by(Client.name, Document.client_id)
+    )
+
+def sum_buckets(rows: List[dict]) -> dict:
+    total = {"invoices": 0, "total": Decimal(0), **{name: Decimal(0) for name, _, _ in BUCKETS}}
+    for row in rows:
+        for key in total:
+            total[key] += row[key]
+    return total
+
+class AgingService:
+    async def by_client(self, db: AsyncSession, company_id: int, as_of: date) -> dict:
+        result = await db.execute(aging_query(company_id, as_of))
+        rows = [dict(row._mapping) for row in result.all()]
+        return {"as_of": as_of, "rows": rows, "total": sum_buckets(rows)}
+
+    async def for_companies(self, company_ids: List[int], as_of: date) -> Dict[int, dict]:
+        """
+        Runs the per-company queries concurrently, each on its own session
+        since a session is not safe for concurrent use; bounded so one
+        accountant cannot take the whole connection pool.
+        """
+        semaphore = asyncio.Semaphore(settings.AGING_COMPANY_CONCURRENCY)
+
+        async def one(company_id: int):
+            async with semaphore, AsyncSessionLocal() as session:
+                return company_id, await self.by_client(session, company_id, as_of)
+
+        return dict(await asyncio.gather(*(one(company_id) for company_id in company_ids)))
+
+aging_service = AgingService()
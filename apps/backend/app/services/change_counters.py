@@ -0,0 +1,69 @@
+import hashlib
+import logging
+import time
+from typing import Optional
+from app.core.redis import get_async_redis, get_sync_redis
+
+logger = logging.getLogger(__name__)
+
+COLLECTIONS = ("documents", "clients", "templates")
+
+def _key(company_id: int, collection: str) -> str:
+    return f"changes:{company_id}:{collection}"
+
+def _epoch() -> int:
+    # A counter lost with Redis restarts from a fresh epoch, never from 0,
+    # so an ETag issued before the loss cannot match new data.
+    return time.time_ns() // 1000
+
+class ChangeCounterService:
+    """
+    Per-tenant, per-collection version counters. Handlers bump them after
+    commit; list endpoints derive weak ETags from them without touching the DB.
+    Counters are an optimization: on Redis errors we log and skip caching.
+    """
+    async def bump(self, company_id: int, collection: str):
+        try:
+            async with get_async_redis().pipeline(transaction=True) as pipe:
+                pipe.set(_key(company_id, collection), _epoch(), nx=True)
+                pipe.incr(_key(company_id, collection))
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Could not bump {collection} counter for company {company_id}: {e}")
+
+    def bump_sync(self, company_id: int, collection: str):
+        """
+        Same as bump, for Celery tasks.
+        """
+        try:
+            with get_sync_redis().pipeline(transaction=True) as pipe:
+                pipe.set(_key(company_id, collection), _epoch(), nx=True)
+                pipe.incr(_key(company_id, collection))
+                pipe.execute()
+        except Exception as e:
+            logger.warning(f"Could not bump {collection} counter for company {company_id}: {e}")
+
+    async def current(self, company_id: int, collection: str) -> Optional[int]:
+        try:
+            client = get_async_redis()
+            value = await client.get(_key(company_id, collection))
+            if value is None:
+                await client.set(_key(company_id, collection), _epoch(), nx=True)
+                value = await client.get(_key(company_id, collection))
+            return int(value)
+        except Exception as e:
+            logger.warning(f"Could not read {collection} counter for company {company_id}: {e}")
+            return None
+
+    async def etag(self, company_id: int, collection: str, variant: str = "") -> Optional[str]:
+        """
+        Weak ETag for a collection listing; variant distinguishes
+        representations of the same collection (query string, URL expiry...).
+        """
+        counter = await self.current(company_id, collection)
+        if counter is None:
+            return None
+        digest = hashlib.blake2s(f"{company_id}|{variant}".encode(), digest_size=8).hexdigest()
+        return f'W/"{collection}-{counter}-{digest}"'
+
+change_counters = ChangeCounterService()
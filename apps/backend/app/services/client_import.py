@@ -0,0 +1,286 @@
+import csv
+import io
+import itertools
+import zipfile
+from decimal import Decimal, InvalidOperation
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, TextIO, Tuple
+from xml.etree import ElementTree
+from pydantic import ValidationError
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from app.models.business import NORMALIZED_REGISTRATION_NUMBER, NORMALIZED_VAT_NUMBER
+from app.schemas.client import ClientImportRow
+
+# Streaming client import: rows are read from the file one at a time,
+# validated in chunks and COPYed into a temporary staging table, then
+# deduplicated and merged into clients with a few set-based statements.
+
+FORMAT_CSV = "csv"
+FORMAT_XLSX = "xlsx"
+
+COLUMNS = ("name", "email", "address", "vat_number", "registration_number")
+# Headers found in exports of other invoicing tools, matched case-insensitively
+HEADER_ALIASES = {
+    "nom": "name", "raison sociale": "name", "client": "name",
+    "e-mail": "email", "mail": "email", "courriel": "email",
+    "adresse": "address",
+    "tva": "vat_number", "n° tva": "vat_number", "numéro de tva": "vat_number", "tva intracommunautaire": "vat_number",
+    "siret": "registration_number", "siren": "registration_number",
+}
+
+STAGING_TABLE = "client_import"
+STAGING_COLUMNS = ("row_number",) + COLUMNS
+REPORT_HEADER = ("row", "field", "error")
+
+SHEET_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+OFFICE_REL_ID = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+
+class ClientImportError(Exception):
+    pass
+
+def detect_format(filename: Optional[str]) -> str:
+    extension = (filename or "").rsplit(".", 1)[-1].lower()
+    if extension not in (FORMAT_CSV, FORMAT_XLSX):
+        raise ClientImportError("Only .csv and .xlsx files can be imported")
+    return extension
+
+def _map_header(header: List[str]) -> Dict[int, str]:
+    mapping = {}
+    for index, title in enumerate(header):
+        key = (title or "").strip().lower()
+        column = key if key in COLUMNS else HEADER_ALIASES.get(key)
+        if column and column not in mapping.values():
+            mapping[index] = column
+    if "name" not in mapping.values():
+        raise ClientImportError("Missing column: name")
+    return mapping
+
+def _csv_rows(stream: TextIO) -> Iterator[Tuple[int, List[str]]]:
+    sample = stream.readline()
+    if not sample:
+        return
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    # The sniffed line is parsed again as the header
+    reader = csv.reader(itertools.chain([sample], stream), dialect)
+    for index, values in enumerate(reader, start=1):
+        yield index, values
+
+def _cell_value(cell: ElementTree.Element, strings: List[str]) -> str:
+    kind = cell.get("t")
+    if kind == "inlineStr":
+        return "".join(t.text or "" for t in cell.iter(f"{SHEET_NS}t"))
+    value = cell.findtext(f"{SHEET_NS}v") or ""
+    if kind == "s":
+        return strings[int(value)]
+    if kind in (None, "n") and value:
+        # Identifiers typed as numbers come back as floats ("1.2345678900012E13")
+        try:
+            number = Decimal(value)
+        except InvalidOperation:
+            return value
+        if number == number.to_integral_value():
+            return str(int(number))
+    return value
+
+def _column_index(reference: str) -> int:
+    index = 0
+    for char in reference:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - 64
+    return index - 1
+
+def _first_sheet(zf: zipfile.ZipFile) -> str:
+    workbook = ElementTree.fromstring(zf.read("xl/workbook.xml"))
+    sheet = workbook.find(f"{SHEET_NS}sheets/{SHEET_NS}sheet")
+    if sheet is None:
+        raise ClientImportError("The workbook has no sheet")
+    rels = ElementTree.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    for rel in rels.iter(f"{REL_NS}Relationship"):
+        if rel.get("Id") == sheet.get(OFFICE_REL_ID):
+            target = rel.get("Target")
+            return target[1:] if target.startswith("/") else f"xl/{target}"
+    raise ClientImportError("The workbook has no sheet")
+
+def _shared_strings(zf: zipfile.ZipFile) -> List[str]:
+    if "xl/sharedStrings.xml" not in zf.namelist():
+        return []
+    strings = []
+    with zf.open("xl/sharedStrings.xml") as f:
+        for _, elem in ElementTree.iterparse(f):
+            if elem.tag == f"{SHEET_NS}si":
+                # Plain text or rich text runs; phonetic runs (rPh) are not part of the text
+                strings.append("".join(
+                    (child.text or "") if child.tag == f"{SHEET_NS}t" else child.findtext(f"{SHEET_NS}t", "")
+                    for child in elem if child.tag in (f"{SHEET_NS}t", f"{SHEET_NS}r")
+                ))
+                elem.clear()
+    return strings
+
+def _xlsx_rows(fileobj: BinaryIO) -> Iterator[Tuple[int, List[str]]]:
+    try:
+        zf = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile:
+        raise ClientImportError("The file is not a valid .xlsx workbook")
+    with zf:
+        strings = _shared_strings(zf)
+        with zf.open(_first_sheet(zf)) as f:
+            for _, elem in ElementTree.iterparse(f):
+                if elem.tag != f"{SHEET_NS}row":
+                    continue
+                values: List[str] = []
+                for position, cell in enumerate(elem.iter(f"{SHEET_NS}c")):
+                    # Empty cells are omitted from the sheet, their references tell the column
+                    reference = cell.get("r")
+                    column = _column_index(reference) if reference else position
+                    values.extend([""] * (column - len(values)))
+                    values.append(_cell_value(cell, strings))
+                yield int(elem.get("r") or 0), values
+                elem.clear()
+
+def read_rows(fileobj: BinaryIO, fmt: str) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """
+    Yields (row number, {column: value}) for each non-empty data row. Row
+    numbers match what a spreadsheet shows, the header being row 1.
+    """
+    stream = None
+    if fmt == FORMAT_XLSX:
+        rows = _xlsx_rows(fileobj)
+    else:
+        stream = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+        rows = _csv_rows(stream)
+    try:
+        mapping = None
+        for number, values in rows:
+            if mapping is None:
+                mapping = _map_header(values)
+                continue
+            row = {column: values[index] for index, column in mapping.items() if index < len(values)}
+            if any(v.strip() for v in row.values()):
+                yield number, row
+    except UnicodeDecodeError:
+        raise ClientImportError("CSV files must be UTF-8 encoded")
+    finally:
+        if stream is not None:
+            stream.detach() # The caller owns the file
+    if mapping is None:
+        raise ClientImportError("The file is empty")
+
+def validate_chunk(chunk: List[Tuple[int, Dict[str, str]]]) -> Tuple[List[tuple], List[tuple]]:
+    """
+    Returns the staging records of the valid rows and (row, field, error)
+    for the others.
+    """
+    records, errors = [], []
+    for number, row in chunk:
+        try:
+            client = ClientImportRow.model_validate(row)
+        except ValidationError as e:
+            errors.extend(
+                (number, ".".join(str(p) for p in err["loc"]) or "row", err["msg"]) for err in e.errors()
+            )
+            continue
+        records.append((number,) + tuple(getattr(client, column) for column in COLUMNS))
+    return records, errors
+
+# Normalized like the staging rows, so clients saved before identifiers
+# were normalized still match; the expressions of the clients indexes
+_EXISTING_VAT = NORMALIZED_VAT_NUMBER.format(column="c.vat_number")
+_EXISTING_REGISTRATION = NORMALIZED_REGISTRATION_NUMBER.format(column="c.registration_number")
+
+# Rows matching an existing client of the company, through the
+# normalized (company_id, registration_number) and (company_id, vat_number) indexes
+REMOVE_EXISTING = f"""
+DELETE FROM {STAGING_TABLE} s
+WHERE EXISTS (SELECT 1 FROM clients c WHERE c.company_id = :company_id AND {_EXISTING_REGISTRATION} = s.registration_number)
+   OR EXISTS (SELECT 1 FROM clients c WHERE c.company_id = :company_id AND {_EXISTING_VAT} = s.vat_number)
+RETURNING s.row_number,
+    CASE WHEN EXISTS (SELECT 1 FROM clients c WHERE c.company_id = :company_id AND {_EXISTING_REGISTRATION} = s.registration_number)
+        THEN 'registration_number' ELSE 'vat_number' END
+"""
+
+# Repeated identifiers within the file: the first occurrence wins
+REMOVE_REPEATED = f"""
+WITH firsts AS (
+    SELECT row_number,
+        CASE WHEN registration_number IS NOT NULL
+            THEN min(row_number) OVER (PARTITION BY registration_number) END AS first_registration,
+        CASE WHEN vat_number IS NOT NULL
+            THEN min(row_number) OVER (PARTITION BY vat_number) END AS first_vat
+    FROM {STAGING_TABLE}
+)
+DELETE FROM {STAGING_TABLE} s USING firsts f
+WHERE s.row_number = f.row_number AND (f.first_registration < s.row_number OR f.first_vat < s.row_number)
+RETURNING s.row_number,
+    CASE WHEN f.first_registration < s.row_number THEN 'registration_number' ELSE 'vat_number' END,
+    CASE WHEN f.first_registration < s.row_number THEN f.first_registration ELSE f.first_vat END
+"""
+
+MERGE = f"""
+INSERT INTO clients (company_id, name, email, address, vat_number, registration_number, is_archived, created_at, updated_at)
+SELECT :company_id, name, email, address, vat_number, registration_number, false, timezone('utc', now()), timezone('utc', now())
+FROM {STAGING_TABLE} ORDER BY row_number
+"""
+
+async def import_clients(
+    conn: AsyncConnection,
+    company_id: int,
+    fileobj: BinaryIO,
+    fmt: str,
+    report: Any,
+    chunk_size: int,
+    on_chunk: Optional[Callable[[], None]] = None,
+) -> Dict[str, int]:
+    """
+    Imports the clients of an uploaded file inside the caller's transaction.
+    Per-row problems are written to the report (a csv writer); the import only
+    fails on unreadable files.
+    """
+    await conn.execute(text(
+        f"CREATE TEMPORARY TABLE {STAGING_TABLE} (row_number integer PRIMARY KEY,"
+        " name varchar(255), email varchar(255), address varchar(500),"
+        " vat_number varchar(50), registration_number varchar(50)) ON COMMIT DROP"
+    ))
+    copy = (await conn.get_raw_connection()).driver_connection.copy_records_to_table
+
+    rows = invalid = 0
+    chunk = []
+
+    async def flush():
+        nonlocal invalid
+        records, errors = validate_chunk(chunk)
+        if records:
+            await copy(STAGING_TABLE, records=records, columns=STAGING_COLUMNS)
+        report.writerows(errors)
+        invalid += len({number for number, _, _ in errors})
+        chunk.clear()
+        if on_chunk:
+            on_chunk()
+
+    for row in read_rows(fileobj, fmt):
+        chunk.append(row)
+        rows += 1
+        if len(chunk) >= chunk_size:
+            await flush()
+    await flush()
+
+    await conn.execute(text(f"ANALYZE {STAGING_TABLE}"))
+    # Concurrent imports of one company would not see each other's rows
+    await conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('client_import'), :company_id)"), {"company_id": company_id})
+
+    duplicates = 0
+    result = await conn.execute(text(REMOVE_EXISTING), {"company_id": company_id})
+    for number, field in result.all():
+        report.writerow((number, field, "A client with this identifier already exists"))
+        duplicates += 1
+    result = await conn.execute(text(REMOVE_REPEATED))
+    for number, field, first in result.all():
+        report.writerow((number, field, f"Same identifier as row {first}"))
+        duplicates += 1
+
+    result = await conn.execute(text(MERGE), {"company_id": company_id})
+    return {"rows": rows, "imported": result.rowcount, "invalid": invalid, "duplicates": duplicates}
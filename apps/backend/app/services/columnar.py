@@ -0,0 +1,172 @@
+import json
+import zipfile
+from datetime import date, datetime, timedelta
+from typing import Any, BinaryIO, Callable, Dict, Optional, Sequence
+from sqlalchemy import Numeric, String, case, cast, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.business import Client, Document, DocumentVersion
+
+# Columnar exports for analytics. pyarrow is imported on use: it is heavy
+# and only the export worker needs it.
+
+FORMATS = {"parquet": ".parquet", "arrow": ".arrows"} # Arrow IPC streaming format
+SCHEMA_VERSION = 1
+TOTALS = ("total_ht", "total_tva", "total_ttc")
+
+def _amount(column):
+    # Typed in SQL: non-numeric totals become nulls rather than guesses
+    value = Document.current_totals[column]
+    return case((func.jsonb_typeof(value) == "number", func.round(cast(value.astext, Numeric), 2))).label(column)
+
+def table_queries(company_id: int, since: Optional[datetime], period_start: Optional[date], period_end: Optional[date]):
+    """
+    (name, statement) of each exported table, columns in schema order.
+    since keeps the rows created or changed from that time on.
+    """
+    documents = select(
+        Document.id, Document.client_id, Document.template_id,
+        Document.type, cast(Document.status, String).label("status"),
+        Document.created_at, Document.updated_at, Document.due_date,
+        *(_amount(column) for column in TOTALS), Document.amount_due,
+    ).where(Document.company_id == company_id)
+    if period_start is not None:
+        documents = documents.where(Document.created_at >= datetime.combine(period_start, datetime.min.time()))
+    if period_end is not None:
+        documents = documents.where(Document.created_at < datetime.combine(period_end + timedelta(days=1), datetime.min.time()))
+
+    versions = (
+        select(
+            DocumentVersion.id, DocumentVersion.document_id, DocumentVersion.version_number,
+            DocumentVersion.doc_number, DocumentVersion.generated_by, DocumentVersion.generated_at,
+        )
+        .join(Document, Document.id == DocumentVersion.document_id)
+        .where(Document.company_id == company_id)
+    )
+    clients = select(
+        Client.id, Client.name, Client.email, Client.address, Client.vat_number,
+        Client.registration_number, Client.is_archived, Client.created_at, Client.updated_at,
+    ).where(Client.company_id == company_id)
+
+    if since is not None:
+        documents = documents.where(Document.updated_at >= since)
+        versions = versions.where(DocumentVersion.generated_at >= since)
+        clients = clients.where(Client.updated_at >= since)
+    return [
+        ("documents", documents.order_by(Document.id)),
+        ("versions", versions.order_by(DocumentVersion.id)),
+        ("clients", clients.order_by(Client.id)),
+    ]
+
+def table_schemas():
+    import pyarrow as pa
+
+    timestamp = pa.timestamp("us", tz="UTC") # Stored as naive UTC
+    amount = pa.decimal128(16, 2)
+    # Few distinct values: dictionary encoded, like enums
+    enum = pa.dictionary(pa.int8(), pa.string())
+    return {
+        "documents": pa.schema([
+            ("id", pa.int64()), ("client_id", pa.int64()), ("template_id", pa.int64()),
+            ("type", enum), ("status", enum),
+            ("created_at", timestamp), ("updated_at", timestamp), ("due_date", pa.date32()),
+            *((column, amount) for column in TOTALS), ("amount_due", amount),
+        ]),
+        "versions": pa.schema([
+            ("id", pa.int64()), ("document_id", pa.int64()), ("version_number", pa.int32()),
+            ("doc_number", pa.string()), ("generated_by", pa.int64()), ("generated_at", timestamp),
+        ]),
+        "clients": pa.schema([
+            ("id", pa.int64()), ("name", pa.string()), ("email", pa.string()), ("address", pa.string()),
+            ("vat_number", pa.string()), ("registration_number", pa.string()),
+            ("is_archived", pa.bool_()), ("created_at", timestamp), ("updated_at", timestamp),
+        ]),
+    }
+
+def record_batch(schema, rows: Sequence[Sequence[Any]]):
+    """
+    Column-wise conversion of result rows to a typed record batch.
+    """
+    import pyarrow as pa
+
+    columns = list(zip(*rows)) if rows else [()] * len(schema)
+    return pa.RecordBatch.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+    )
+
+class TableWriter:
+    """
+    Writes record batches of one table as Parquet or as an Arrow IPC stream
+    to a file object that only needs write and tell.
+    """
+    def __init__(self, fmt: str, sink: BinaryIO, schema):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.schema = schema
+        if fmt == "parquet":
+            self._writer = pq.ParquetWriter(sink, schema, compression="zstd")
+        elif fmt == "arrow":
+            self._writer = pa.ipc.new_stream(sink, schema)
+        else:
+            raise ValueError(f"Unknown columnar format: {fmt}")
+
+    def write_rows(self, rows: Sequence[Sequence[Any]]):
+        self._writer.write_batch(record_batch(self.schema, rows))
+
+    def close(self):
+        self._writer.close()
+
+async def export_tables(
+    session: AsyncSession,
+    company_id: int,
+    fmt: str,
+    out: BinaryIO,
+    run: Callable,
+    since: Optional[datetime] = None,
+    period_start: Optional[date] = None,
+    period_end: Optional[date] = None,
+    batch_size: int = 10000,
+    overlap: timedelta = timedelta(0),
+) -> Dict[str, Any]:
+    """
+    Streams the company's tables into a ZIP written to out (one file per
+    table and a manifest), reading each through a server-side cursor in
+    batches of batch_size rows. run(fn, *args) executes the blocking
+    conversions and writes, e.g. asyncio.to_thread.
+
+    All tables are read from one snapshot whose start is returned as the
+    watermark: passing it as since to the next export only moves the rows
+    changed in between. Rows are timestamped before they commit, so since
+    is widened by overlap and consumers should upsert on id.
+    """
+    # One consistent snapshot for every table and for the watermark
+    await session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    watermark = (await session.execute(text("SELECT timezone('utc', now())"))).scalar_one()
+    schemas = table_schemas()
+    counts: Dict[str, int] = {}
+
+    # Parquet is compressed already. On errors the ZIP is left unfinished,
+    # the caller aborts the upload
+    zf = zipfile.ZipFile(out, "w", zipfile.ZIP_STORED if fmt == "parquet" else zipfile.ZIP_DEFLATED)
+    for name, query in table_queries(company_id, since - overlap if since else None, period_start, period_end):
+        entry = zf.open(f"{name}{FORMATS[fmt]}", "w", force_zip64=True)
+        writer = await run(TableWriter, fmt, entry, schemas[name])
+        counts[name] = 0
+        result = await session.stream(query.execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            await run(writer.write_rows, rows)
+            counts[name] += len(rows)
+        await run(writer.close)
+        await run(entry.close)
+
+    manifest = {
+        "schema_version": SCHEMA_VERSION,
+        "format": fmt,
+        "company_id": company_id,
+        "since": since.isoformat() if since else None,
+        "watermark": watermark.isoformat(),
+        "rows": counts,
+    }
+    await run(zf.writestr, "manifest.json", json.dumps(manifest, indent=2))
+    await run(zf.close)
+    return {"watermark": watermark.isoformat(), "rows": counts}
@@ -0,0 +1,87 @@
+import json
+import re
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List
+from sqlalchemy import func, literal_column, not_, or_
+from sqlalchemy.sql.elements import ColumnElement
+from app.models.business import Document
+
+# Filter syntax: <root>.<path>:<op>[:<value>], e.g. data.po_number:eq:PO-1234
+# or totals.total_ttc:gte:10000
+FILTER_ROOTS = {
+    "data": Document.current_data,
+    "totals": Document.current_totals,
+    "meta": Document.extra_metadata,
+}
+COMPARISON_OPS = {"gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+FILTER_OPS = {"eq", "ne", "exists", "contains", *COMPARISON_OPS}
+SEGMENT_RE = re.compile(r"^[A-Za-z0-9_]+$")
+
+class DocumentFilterError(ValueError):
+    pass
+
+def _nest(path: List[str], value: Any) -> Dict[str, Any]:
+    for key in reversed(path):
+        value = {key: value}
+    return value
+
+def _json_value(raw: str) -> Any:
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        return raw
+    return value if isinstance(value, (int, float, bool)) or value is None else raw
+
+def _text_at(column, path: List[str]) -> ColumnElement:
+    # Path segments are validated, so they are inlined: an expression index
+    # only matches if the key is a literal, not a bind parameter.
+    if len(path) == 1:
+        return column.op("->>")(literal_column(f"'{path[0]}'"))
+    return column.op("#>>")(literal_column("'{" + ",".join(path) + "}'"))
+
+def parse_filter(expr: str) -> ColumnElement:
+    """
+    Translates one filter expression into an indexed operator:
+    eq/ne use containment (@>, GIN jsonb_path_ops), exists uses jsonpath (@?),
+    numeric comparisons go through fz_numeric(... ->> ...) which matches the
+    totals expression indexes.
+    """
+    parts = expr.split(":", 2)
+    if len(parts) < 2:
+        raise DocumentFilterError(f"Invalid filter '{expr}', expected <path>:<op>[:<value>]")
+    path_str, op = parts[0], parts[1]
+    raw_value = parts[2] if len(parts) == 3 else None
+
+    root, _, rest = path_str.partition(".")
+    column = FILTER_ROOTS.get(root)
+    path = rest.split(".") if rest else []
+    if column is None or not path or not all(SEGMENT_RE.match(s) for s in path):
+        raise DocumentFilterError(f"Invalid filter path '{path_str}'")
+    if op not in FILTER_OPS:
+        raise DocumentFilterError(f"Unknown filter operator '{op}'")
+
+    if op == "exists":
+        return column.op("@?")("$." + ".".join(path))
+    if raw_value is None:
+        raise DocumentFilterError(f"Filter '{expr}' needs a value")
+
+    if op in ("eq", "ne"):
+        value = _json_value(raw_value)
+        clause = column.contains(_nest(path, value))
+        if not isinstance(value, str):
+            # Numbers are often stored as strings in template data
+            clause = or_(clause, column.contains(_nest(path, raw_value)))
+        return clause if op == "eq" else not_(clause)
+
+    if op == "contains":
+        escaped = raw_value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return _text_at(column, path).ilike(f"%{escaped}%")
+
+    try:
+        number = Decimal(raw_value)
+    except InvalidOperation:
+        raise DocumentFilterError(f"Filter '{expr}' needs a numeric value")
+    return func.fz_numeric(_text_at(column, path)).op(COMPARISON_OPS[op])(number)
+
+def build_filters(exprs: List[str]) -> List[ColumnElement]:
+    return [parse_filter(e) for e in exprs]
@@ -0,0 +1,113 @@
+from datetime import datetime
+from typing import Dict, FrozenSet, List, Optional
+from sqlalchemy import Integer, any_, bindparam, or_, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.business import Document, DocStatus
+from app.models.core import Company
+from app.services.rollups import revenue_rollups, contribution
+
+# Manual status changes. GENERATED is only ever set by the generation task,
+# a PAID or CANCELLED document is final.
+TRANSITIONS: Dict[DocStatus, FrozenSet[DocStatus]] = {
+    DocStatus.DRAFT: frozenset({DocStatus.CANCELLED}),
+    DocStatus.GENERATED: frozenset({DocStatus.SENT, DocStatus.PAID, DocStatus.CANCELLED}),
+    DocStatus.SENT: frozenset({DocStatus.PAID, DocStatus.CANCELLED}),
+    DocStatus.PAID: frozenset(),
+    DocStatus.CANCELLED: frozenset(),
+}
+
+OUTCOME_UPDATED = "updated"
+OUTCOME_UNCHANGED = "unchanged" # Already in the target status
+OUTCOME_NOT_FOUND = "not_found"
+OUTCOME_LOCKED = "locked"
+OUTCOME_INVALID = "invalid_transition"
+
+def sources_for(target: DocStatus) -> List[DocStatus]:
+    """
+    Statuses a document may move to target from.
+    """
+    return [source for source, targets in TRANSITIONS.items() if target in targets]
+
+def explain(
+    status: Optional[DocStatus], created_at: Optional[datetime],
+    locked_until: Optional[datetime], target: DocStatus
+) -> str:
+    """
+    Outcome for a document the transition statement did not update.
+    """
+    if status is None:
+        return OUTCOME_NOT_FOUND
+    if status == target:
+        return OUTCOME_UNCHANGED
+    if target not in TRANSITIONS[status]:
+        return OUTCOME_INVALID
+    if locked_until is not None and created_at < locked_until:
+        return OUTCOME_LOCKED
+    # Allowed by now: its status changed between the two statements
+    return OUTCOME_INVALID
+
+async def bulk_transition(db: AsyncSession, company_id: int, document_ids: List[int], target: DocStatus) -> List[dict]:
+    """
+    Moves the documents to target in one UPDATE: only those of the company,
+    in an allowed source status and outside the locked period are changed.
+    Revenue rollups are adjusted in the same transaction.
+    Returns one outcome per requested id, in request order. The caller commits.
+    """
+    ids = bindparam("ids", list(dict.fromkeys(document_ids)), type_=ARRAY(Integer))
+    # Locked, in id order like concurrent bulk transitions, so the status
+    # read for the rollup deltas is the one the UPDATE replaces
+    previous = (
+        select(Document.id, Document.status.label("previous_status"))
+        .where(Document.id == any_(ids), Document.company_id == company_id)
+        .order_by(Document.id)
+        .with_for_update()
+        .subquery()
+    )
+    # Same rule as single edits: documents created before the lock date are frozen
+    stmt = (
+        update(Document)
+        .where(
+            Document.id == previous.c.id,
+            Document.status.in_(sources_for(target)),
+            Company.id == Document.company_id,
+            or_(Company.period_locked_until.is_(None), Document.created_at >= Company.period_locked_until),
+        )
+        .values(status=target)
+        .returning(
+            Document.id, previous.c.previous_status, Document.created_at, Document.type,
+            Document.client_id, Document.current_totals
+        )
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(stmt)
+    rows = result.all()
+    updated = {row.id for row in rows}
+    await revenue_rollups.apply(db, [
+        (
+            contribution(company_id, row.created_at, row.type, row.previous_status, row.client_id, row.current_totals),
+            contribution(company_id, row.created_at, row.type, target, row.client_id, row.current_totals),
+        )
+        for row in rows
+    ])
+
+    outcomes = {doc_id: {"document_id": doc_id, "outcome": OUTCOME_UPDATED, "status": target} for doc_id in updated}
+    missing = [doc_id for doc_id in document_ids if doc_id not in updated]
+    if missing:
+        result = await db.execute(
+            select(Document.id, Document.status, Document.created_at, Company.period_locked_until)
+            .join(Company, Company.id == Document.company_id)
+            .where(Document.id.in_(missing), Document.company_id == company_id)
+        )
+        found = {row.id: row for row in result.all()}
+        for doc_id in missing:
+            row = found.get(doc_id)
+            outcomes[doc_id] = {
+                "document_id": doc_id,
+                "outcome": explain(
+                    row.status if row else None, row.created_at if row else None,
+                    row.period_locked_until if row else None, target
+                ),
+                "status": row.status if row else None,
+            }
+    return [outcomes[doc_id] for doc_id in document_ids]
@@ -0,0 +1,237 @@
+import io
+import re
+import struct
+import zipfile
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+# Fast path for templates made only of plain {{ variable }} placeholders.
+# The placeholder clean-up mirrors docxtpl's patch_xml, so both renderers see
+# the same placeholders; everything docxtpl would treat specially (tags,
+# comments, expressions, images) sends the template to docxtpl instead.
+
+REL_OFFICE_DOCUMENT = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+REL_HEADER = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/header"
+REL_FOOTER = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/footer"
+
+# Same as docxtpl: "{<tags>{" -> "{{", then tags inside {{ ... }} are dropped
+SPLIT_DELIMITER_RE = re.compile(r"(?<={)(<[^>]*>)+(?=[\{%\#])|(?<=[%\}\#])(<[^>]*>)+(?=\})", re.DOTALL)
+JINJA_BLOCK_RE = re.compile(r"{%(?:(?!%}).)*|{#(?:(?!#}).)*|{{(?:(?!}}).)*", re.DOTALL)
+TAGS_IN_BLOCK_RE = re.compile(r"</w:t>.*?(<w:t>|<w:t [^>]*>)", re.DOTALL)
+# {{p ...}}, {{r ...}}, {{tr ...}}, {{tc ...}} replace their enclosing element
+STRUCTURAL_TAG_RE = re.compile(r"{{(?:p|r|tr|tc)\s")
+PRESERVE_SPACE_RE = re.compile(r"<w:t>((?:(?!<w:t>).)*)({{.*?}}|{%.*?%})", re.DOTALL)
+PLACEHOLDER_RE = re.compile(r"{{\s*([A-Za-z_][A-Za-z0-9_]*)\s*}}")
+W_T_OPEN_RE = re.compile(r"<w:t(?: [^>]*)?>$")
+# docxtpl expands tabs and line breaks found in any run text, not just values
+W_T_LISTING_RE = re.compile(r"<w:t(?: [^>]*)?>[^<]*[\t\n\a\f]")
+# Drawings renumber docPr ids in docxtpl, objects may embed templated parts
+UNSUPPORTED_MARKUP = ("<w:drawing", "<w:pict", "<w:object", "<wp:docPr", "<mc:AlternateContent")
+# docxtpl escapes for literal delimiters, undone after rendering
+LITERAL_DELIMITERS = (("{_{", "{{"), ("}_}", "}}"), ("{_%", "{%"), ("%_}", "%}"))
+# docxtpl turns these into tabs, paragraphs and page breaks with run properties
+UNSUPPORTED_VALUE_CHARS = ("\t", "\a", "\f")
+
+XML_DECL_RE = re.compile(rb'^<\?xml[^?]*encoding="([^"]+)"', re.I)
+REL_RE = re.compile(r"<Relationship\b[^>]*>")
+ATTR_RE = re.compile(r'(\w+)="([^"]*)"')
+
+def _unescape_literals(text: str) -> str:
+    for escaped, literal in LITERAL_DELIMITERS:
+        text = text.replace(escaped, literal)
+    return text
+
+def _relationships(xml: bytes) -> List[Dict[str, str]]:
+    return [dict(ATTR_RE.findall(m)) for m in REL_RE.findall(xml.decode("utf-8"))]
+
+def _resolve(base_dir: str, target: str) -> str:
+    if target.startswith("/"):
+        return target[1:]
+    parts = [p for p in base_dir.split("/") if p]
+    for segment in target.split("/"):
+        if segment == "..":
+            parts.pop()
+        elif segment and segment != ".":
+            parts.append(segment)
+    return "/".join(parts)
+
+def _templated_parts(zf: zipfile.ZipFile) -> List[str]:
+    """
+    The parts docxtpl renders: the main document and its headers and footers.
+    """
+    names = set(zf.namelist())
+    main = next(
+        (_resolve("", r["Target"]) for r in _relationships(zf.read("_rels/.rels")) if r.get("Type") == REL_OFFICE_DOCUMENT),
+        None
+    )
+    if main is None or main not in names:
+        return []
+    base_dir, _, filename = main.rpartition("/")
+    parts = [main]
+    rels_name = f"{base_dir}/_rels/{filename}.rels" if base_dir else f"_rels/{filename}.rels"
+    if rels_name in names:
+        for rel in _relationships(zf.read(rels_name)):
+            if rel.get("Type") in (REL_HEADER, REL_FOOTER) and rel.get("TargetMode") != "External":
+                part = _resolve(base_dir, rel["Target"])
+                if part in names and part not in parts:
+                    parts.append(part)
+    return parts
+
+def _compile_part(xml: str) -> Optional[List[str]]:
+    """
+    Splits a part into [static, variable, static, ..., static], or returns
+    None when the part needs the full Jinja renderer.
+    """
+    if any(marker in xml for marker in UNSUPPORTED_MARKUP) or W_T_LISTING_RE.search(xml):
+        return None
+    xml = SPLIT_DELIMITER_RE.sub("", xml)
+    xml = JINJA_BLOCK_RE.sub(lambda m: TAGS_IN_BLOCK_RE.sub("", m.group(0)), xml)
+    if STRUCTURAL_TAG_RE.search(xml):
+        return None
+    xml = PRESERVE_SPACE_RE.sub(r'<w:t xml:space="preserve">\1\2', xml)
+
+    segments: List[str] = []
+    position = 0
+    for m in PLACEHOLDER_RE.finditer(xml):
+        # Values are only supported as run text, where line breaks can be expanded
+        tag_start = xml.rfind("<", 0, m.start())
+        tag_end = xml.find(">", tag_start) + 1
+        if not W_T_OPEN_RE.match(xml, tag_start, tag_end) or not xml.startswith("</w:t>", xml.find("<", m.end())):
+            return None
+        segments.append(xml[position:m.start()])
+        segments.append(m.group(1))
+        position = m.end()
+    segments.append(xml[position:])
+
+    # Anything left that Jinja would interpret is beyond a plain placeholder
+    static = "".join(segments[::2])
+    if "{{" in static or "{%" in static or "{#" in static:
+        return None
+    return [_unescape_literals(s) if i % 2 == 0 else s for i, s in enumerate(segments)]
+
+class FastDocxPlan:
+    """
+    Precompiled substitution plan of a placeholder-only template.
+    Rendering joins the static XML with the escaped values and rebuilds the
+    archive, copying every other member's compressed bytes unchanged.
+    """
+    def __init__(self, parts: Dict[str, Tuple[List[bytes], List[str]]]):
+        self.parts = parts
+
+    @property
+    def variables(self) -> set:
+        return {name for _, names in self.parts.values() for name in names}
+
+    @staticmethod
+    def can_render(data: Dict[str, Any]) -> bool:
+        return not any(
+            isinstance(v, str) and any(c in v for c in UNSUPPORTED_VALUE_CHARS) for v in data.values()
+        )
+
+    @staticmethod
+    def _value(data: Dict[str, Any], name: str) -> bytes:
+        # Jinja semantics: missing renders empty, None renders "None"
+        if name not in data:
+            return b""
+        text = _unescape_literals(escape(str(data[name])))
+        return text.replace("\n", '</w:t><w:br/><w:t xml:space="preserve">').encode("utf-8")
+
+    def render(self, docx_content: bytes, data: Dict[str, Any]) -> bytes:
+        rendered = {}
+        for name, (statics, names) in self.parts.items():
+            chunks = [statics[0]]
+            for variable, static in zip(names, statics[1:]):
+                chunks.append(self._value(data, variable))
+                chunks.append(static)
+            rendered[name] = b"".join(chunks)
+        return rewrite_zip(docx_content, rendered)
+
+def build_plan(docx_content: bytes) -> Optional[FastDocxPlan]:
+    """
+    Returns the substitution plan, or None if the template needs docxtpl.
+    """
+    try:
+        zf = zipfile.ZipFile(io.BytesIO(docx_content))
+    except zipfile.BadZipFile:
+        return None
+    with zf:
+        names = set(zf.namelist())
+        # docxtpl also renders some core properties as templates
+        if "docProps/core.xml" in names:
+            core = zf.read("docProps/core.xml")
+            if b"{{" in core or b"{%" in core or b"{#" in core:
+                return None
+        templated = _templated_parts(zf)
+        if not templated:
+            return None
+        parts = {}
+        for name in templated:
+            raw = zf.read(name)
+            declared = XML_DECL_RE.match(raw)
+            if declared and declared.group(1).lower() not in (b"utf-8", b"utf8"):
+                return None
+            xml = raw.decode("utf-8")
+            segments = _compile_part(xml)
+            if segments is None:
+                return None
+            if segments == [xml]:
+                continue # Nothing to substitute, copied as is
+            parts[name] = ([s.encode("utf-8") for s in segments[::2]], segments[1::2])
+    return FastDocxPlan(parts)
+
+# Zip records, see APPNOTE.TXT 4.3
+LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+CENTRAL_HEADER = struct.Struct("<4s4B4HL2L5H2L")
+END_RECORD = struct.Struct("<4s4H2LH")
+DATA_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+
+def _dos_datetime(date_time) -> Tuple[int, int]:
+    year, month, day, hour, minute, second = date_time
+    return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+def rewrite_zip(source: bytes, replacements: Dict[str, bytes]) -> bytes:
+    """
+    Copies a zip archive, replacing some members. Untouched members are
+    copied as raw compressed bytes: no decompression, no recompression.
+    """
+    out = io.BytesIO()
+    central = []
+    with zipfile.ZipFile(io.BytesIO(source)) as zf:
+        for info in zf.infolist():
+            offset = out.tell()
+            name = info.filename.encode("utf-8" if info.flag_bits & 0x800 else "cp437")
+            data = replacements.get(info.filename)
+            if data is None:
+                # Local header, name, extra field, data and optional descriptor
+                start = info.header_offset
+                name_len, extra_len = struct.unpack_from("<2H", source, start + 26)
+                end = start + LOCAL_HEADER.size + name_len + extra_len + info.compress_size
+                if info.flag_bits & 0x08:
+                    end += 16 if source[end:end + 4] == DATA_DESCRIPTOR_SIGNATURE else 12
+                out.write(source[start:end])
+                flag_bits, compress_type = info.flag_bits, info.compress_type
+                crc, compress_size, file_size = info.CRC, info.compress_size, info.file_size
+            else:
+                compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+                compressed = compressor.compress(data) + compressor.flush()
+                flag_bits, compress_type = info.flag_bits & 0x800, zipfile.ZIP_DEFLATED
+                crc, compress_size, file_size = zlib.crc32(data), len(compressed), len(data)
+                dostime, dosdate = _dos_datetime(info.date_time)
+                out.write(LOCAL_HEADER.pack(
+                    b"PK\x03\x04", 20, 0, flag_bits, compress_type, dostime, dosdate,
+                    crc, compress_size, file_size, len(name), 0
+                ))
+                out.write(name)
+                out.write(compressed)
+            dostime, dosdate = _dos_datetime(info.date_time)
+            central.append(CENTRAL_HEADER.pack(
+                b"PK\x01\x02", info.create_version, info.create_system, info.extract_version, info.reserved,
+                flag_bits, compress_type, dostime, dosdate, crc, compress_size, file_size,
+                len(name), len(info.extra), len(info.comment), 0, info.internal_attr, info.external_attr, offset
+            ) + name + info.extra + info.comment)
+    directory_offset = out.tell()
+    directory = b"".join(central)
+    out.write(directory)
+    out.write(END_RECORD.pack(b"PK\x05\x06", 0, 0, len(central), len(central), len(directory), directory_offset, 0))
+    return out.getvalue()
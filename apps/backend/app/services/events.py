@@ -0,0 +1,193 @@
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+from app.core.config import settings
+from app.core.redis import get_async_redis, get_sync_redis
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PATTERN = "events:*"
+
+# Allocates the event id, appends to the replay backlog and publishes in one
+# atomic step so ids are strictly increasing in both the backlog and the channel.
+PUBLISH_SCRIPT = """
+local id = redis.call('INCR', KEYS[1])
+local message = cjson.encode({id = id, type = ARGV[1], data = cjson.decode(ARGV[2])})
+redis.call('RPUSH', KEYS[2], message)
+redis.call('LTRIM', KEYS[2], -tonumber(ARGV[3]), -1)
+redis.call('EXPIRE', KEYS[2], tonumber(ARGV[4]))
+redis.call('PUBLISH', KEYS[3], message)
+return id
+"""
+
+def _channel(company_id: int) -> str:
+    return f"events:{company_id}"
+
+def _seq_key(company_id: int) -> str:
+    return f"events-seq:{company_id}"
+
+def _backlog_key(company_id: int) -> str:
+    return f"events-backlog:{company_id}"
+
+def format_sse(event_id: int, event_type: str, data: Dict[str, Any]) -> str:
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+def _parse_message(message: str) -> Tuple[int, str]:
+    payload = json.loads(message)
+    return payload["id"], format_sse(payload["id"], payload["type"], payload["data"])
+
+def publish_event(company_id: int, event_type: str, data: Dict[str, Any]) -> Optional[int]:
+    """
+    Publishes a tenant event from synchronous code (Celery tasks).
+    Events are best effort: a Redis outage must never fail the job itself.
+    """
+    client = get_sync_redis()
+    try:
+        return client.eval(
+            PUBLISH_SCRIPT, 3,
+            _seq_key(company_id), _backlog_key(company_id), _channel(company_id),
+            event_type, json.dumps(data), settings.SSE_BACKLOG_SIZE, settings.SSE_BACKLOG_TTL_SECONDS
+        )
+    except Exception as e:
+        logger.warning(f"Could not publish event {event_type} for company {company_id}: {e}")
+        return None
+
+class Subscription:
+    """
+    One SSE connection. Frames are pre-formatted strings shared between all
+    subscribers of a tenant, so the per-connection cost is the bounded queue.
+    """
+    def __init__(self, company_id: int, maxsize: int):
+        self.company_id = company_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def push(self, frame: Optional[Tuple[int, str]]):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # Slow consumer: free its buffer and end the stream, the client
+            # reconnects with Last-Event-ID and catches up from the backlog.
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+class EventBroker:
+    """
+    Fans tenant events out to SSE connections.
+    A single Redis pub/sub listener per process feeds every connection, so idle
+    clients cost one queue each and never touch the database.
+    """
+    def __init__(self):
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    def subscribe(self, company_id: int) -> Subscription:
+        self._ensure_listener()
+        sub = Subscription(company_id, settings.SSE_QUEUE_MAXSIZE)
+        self._subscribers.setdefault(company_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        subs = self._subscribers.get(sub.company_id)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                del self._subscribers[sub.company_id]
+
+    def dispatch(self, company_id: int, message: str):
+        subs = self._subscribers.get(company_id)
+        if not subs:
+            return
+        frame = _parse_message(message)
+        for sub in list(subs):
+            sub.push(frame)
+
+    def _ensure_listener(self):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+
+    async def _listen(self):
+        backoff = 1
+        while True:
+            pubsub = get_async_redis().pubsub()
+            try:
+                await pubsub.psubscribe(CHANNEL_PATTERN)
+                backoff = 1
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None or message["type"] != "pmessage":
+                        continue
+                    company_id = int(message["channel"].rsplit(":", 1)[-1])
+                    self.dispatch(company_id, message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Event listener disconnected, retrying in {backoff}s: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                await pubsub.aclose()
+
+    async def replay(self, company_id: int, last_event_id: int) -> List[Tuple[int, str]]:
+        """
+        Returns the backlog frames newer than last_event_id. If the client
+        missed events the backlog no longer has (trimmed or expired), or is
+        ahead of the sequence (reset by a Redis restart or eviction), it gets
+        a resync event instead and should refetch its state. The resync
+        carries the current sequence as its id, the next Last-Event-ID.
+        """
+        async with get_async_redis().pipeline(transaction=True) as pipe:
+            pipe.lrange(_backlog_key(company_id), 0, -1)
+            pipe.get(_seq_key(company_id))
+            messages, seq = await pipe.execute()
+        current = int(seq or 0)
+        frames = sorted(_parse_message(m) for m in messages)
+        first = frames[0][0] if frames else current + 1
+        if last_event_id > current or (last_event_id < current and first > last_event_id + 1):
+            return [(current, format_sse(current, "resync", {}))]
+        return [f for f in frames if f[0] > last_event_id]
+
+    async def stream(self, company_id: int, last_event_id: Optional[int]) -> AsyncIterator[str]:
+        # Subscribe before replaying so nothing published in between is lost;
+        # frames already sent during replay are skipped by id.
+        sub = self.subscribe(company_id)
+        last_sent = last_event_id or 0
+        try:
+            yield f"retry: {settings.SSE_RETRY_MS}\n\n"
+            if last_event_id is not None:
+                # Ascending ids, except a resync after a sequence reset,
+                # which moves last_sent back to the current sequence
+                for event_id, frame in await self.replay(company_id, last_event_id):
+                    last_sent = event_id
+                    yield frame
+            while True:
+                try:
+                    item = await asyncio.wait_for(sub.queue.get(), timeout=settings.SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if item is None:
+                    break
+                event_id, frame = item
+                if event_id <= last_sent:
+                    continue
+                last_sent = event_id
+                yield frame
+        finally:
+            self.unsubscribe(sub)
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+event_broker = EventBroker()
@@ -1,9 +1,91 @@
 import csv
 import io
-from typing import List, Dict, Any
-from datetime import datetime
+import re
+from typing import List, Dict, Any, Optional
+from datetime import date, datetime
+
+CSV_HEADERS = ["Date", "Document", "Type", "Client", "HT", "TVA", "TTC", "Status"]
+
+# FEC Required Headers (Simplified version of DGFiP requirements)
+FEC_HEADERS = [
+    "JournalCode", "JournalLib", "EcritureNum", "EcritureDate",
+    "CompteNum", "CompteLib", "CompAuxNum", "CompAuxLib",
+    "PieceRef", "PieceDate", "EcritureLib", "Debit", "Credit",
+    "EcritureLet", "DateLet", "ValidDate", "Montantdevise", "Idevise"
+]
+
+def _date(doc: Dict[str, Any]):
+    # Issue date when the caller has it, last update otherwise
+    return doc.get("date") or doc.get("updated_at")
+
+def fec_filename(registration_number: Optional[str], company_id: int, period_end: date) -> str:
+    """
+    DGFiP naming: SIREN, "FEC" and the closing date of the period.
+    """
+    digits = re.sub(r"\D", "", registration_number or "")
+    siren = digits[:9] if len(digits) >= 9 else f"company{company_id}"
+    return f"{siren}FEC{period_end:%Y%m%d}.txt"
+
+def company_folder(company_id: int, name: str) -> str:
+    # Id first: names are not unique and may be empty
+    slug = re.sub(r"[^\w-]+", "_", name or "").strip("_")[:60]
+    return f"{company_id}-{slug}" if slug else str(company_id)
 
 class ExportService:
+    """
+    Row builders are separate from the file generators so large exports can
+    write documents as they are read instead of building the whole file.
+    """
+    @staticmethod
+    def accounting_csv_rows(doc: Dict[str, Any]) -> List[list]:
+        # Assuming current_totals has the computed amounts
+        totals = doc.get("current_totals", {})
+        date = _date(doc)
+        return [[
+            date.split("T")[0] if isinstance(date, str) else date.strftime("%Y-%m-%d"),
+            doc.get("doc_number", f"ID-{doc.get('id')}"),
+            doc.get("type"),
+            doc.get("client_name", "N/A"),
+            totals.get("total_ht", 0),
+            totals.get("total_tva", 0),
+            totals.get("total_ttc", 0),
+            doc.get("status")
+        ]]
+
+    @staticmethod
+    def fec_rows(doc: Dict[str, Any]) -> List[list]:
+        date_str = _date(doc).strftime("%Y%m%d") if hasattr(_date(doc), "strftime") else "20250101"
+        totals = doc.get("current_totals", {})
+
+        rows = [
+            # Entry 1: Income (Credit)
+            [
+                "VT", "VENTES", doc.get("id"), date_str,
+                "706000", "PRESTATIONS", "", "",
+                doc.get("doc_number"), date_str, f"Facture {doc.get('doc_number')}",
+                "0", str(totals.get("total_ht", 0)).replace(".", ","),
+                "", "", date_str, "", ""
+            ],
+            # Entry 2: Client Account (Debit)
+            [
+                "VT", "VENTES", doc.get("id"), date_str,
+                "411000", "CLIENT", "CLT-" + str(doc.get("client_id")), doc.get("client_name"),
+                doc.get("doc_number"), date_str, f"Facture {doc.get('doc_number')}",
+                str(totals.get("total_ttc", 0)).replace(".", ","), "0",
+                "", "", date_str, "", ""
+            ],
+        ]
+        # Entry 3: VAT (Credit)
+        if totals.get("total_tva", 0) > 0:
+            rows.append([
+                "VT", "VENTES", doc.get("id"), date_str,
+                "445710", "TVA COLLECTEE", "", "",
+                doc.get("doc_number"), date_str, f"TVA sur {doc.get('doc_number')}",
+                "0", str(totals.get("total_tva", 0)).replace(".", ","),
+                "", "", date_str, "", ""
+            ])
+        return rows
+
     @staticmethod
     def generate_accounting_csv(documents: List[Dict[str, Any]]) -> str:
         """
@@ -13,21 +95,9 @@ class ExportService:
         writer = csv.writer(output, delimiter=';')
         
         # Headers (Simplified for basic accounting)
-        writer.writerow(["Date", "Document", "Type", "Client", "HT", "TVA", "TTC", "Status"])
-        
+        writer.writerow(CSV_HEADERS)
         for doc in documents:
-            # Assuming current_totals has the computed amounts
-            totals = doc.get("current_totals", {})
-            writer.writerow([
-                doc.get("updated_at", "").split("T")[0] if isinstance(doc.get("updated_at"), str) else doc.get("updated_at").strftime("%Y-%m-%d"),
-                doc.get("doc_number", f"ID-{doc.get('id')}"),
-                doc.get("type"),
-                doc.get("client_name", "N/A"),
-                totals.get("total_ht", 0),
-                totals.get("total_tva", 0),
-                totals.get("total_ttc", 0),
-                doc.get("status")
-            ])
+            writer.writerows(ExportService.accounting_csv_rows(doc))
             
         return output.getvalue()
 
@@ -41,44 +111,9 @@ class ExportService:
         # FEC is typically Tab-separated or Pipe-separated. We'll use Pipe.
         writer = csv.writer(output, delimiter='|')
         
-        # FEC Required Headers (Simplified version of DGFiP requirements)
-        headers = [
-            "JournalCode", "JournalLib", "EcritureNum", "EcritureDate",
-            "CompteNum", "CompteLib", "CompAuxNum", "CompAuxLib",
-            "PieceRef", "PieceDate", "EcritureLib", "Debit", "Credit",
-            "EcritureLet", "DateLet", "ValidDate", "Montantdevise", "Idevise"
-        ]
-        writer.writerow(headers)
-        
+        writer.writerow(FEC_HEADERS)
         for doc in documents:
-            date_str = doc.get("updated_at").strftime("%Y%m%d") if hasattr(doc.get("updated_at"), "strftime") else "20250101"
-            totals = doc.get("current_totals", {})
-            
-            # Entry 1: Income (Credit)
-            writer.writerow([
-                "VT", "VENTES", doc.get("id"), date_str,
-                "706000", "PRESTATIONS", "", "",
-                doc.get("doc_number"), date_str, f"Facture {doc.get('doc_number')}",
-                "0", str(totals.get("total_ht", 0)).replace(".", ","),
-                "", "", date_str, "", ""
-            ])
-            # Entry 2: Client Account (Debit)
-            writer.writerow([
-                "VT", "VENTES", doc.get("id"), date_str,
-                "411000", "CLIENT", "CLT-" + str(doc.get("client_id")), doc.get("client_name"),
-                doc.get("doc_number"), date_str, f"Facture {doc.get('doc_number')}",
-                str(totals.get("total_ttc", 0)).replace(".", ","), "0",
-                "", "", date_str, "", ""
-            ])
-            # Entry 3: VAT (Credit)
-            if totals.get("total_tva", 0) > 0:
-                writer.writerow([
-                    "VT", "VENTES", doc.get("id"), date_str,
-                    "445710", "TVA COLLECTEE", "", "",
-                    doc.get("doc_number"), date_str, f"TVA sur {doc.get('doc_number')}",
-                    "0", str(totals.get("total_tva", 0)).replace(".", ","),
-                    "", "", date_str, "", ""
-                ])
+            writer.writerows(ExportService.fec_rows(doc))
                 
         return output.getvalue()
 
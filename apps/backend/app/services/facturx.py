@@ -0,0 +1,196 @@
+from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+
+# lxml and factur-x are imported lazily: only generation workers pay for them
+
+RSM = "urn:un:unece:uncefact:data:standard:CrossIndustryInvoice:100"
+RAM = "urn:un:unece:uncefact:data:standard:ReusableAggregateBusinessInformationEntity:100"
+UDT = "urn:un:unece:uncefact:data:standard:UnqualifiedDataType:100"
+QDT = "urn:un:unece:uncefact:data:standard:QualifiedDataType:100"
+NSMAP = {"rsm": RSM, "ram": RAM, "udt": UDT, "qdt": QDT}
+
+PROFILES = {
+    "minimum": "urn:factur-x.eu:1p0:minimum",
+    "basicwl": "urn:factur-x.eu:1p0:basicwl",
+}
+INVOICE_TYPE_CODE = "380" # Commercial invoice (UNTDID 1001)
+CENT = Decimal("0.01")
+
+class FacturXError(ValueError):
+    pass
+
+def _amount(value: Any) -> Decimal:
+    try:
+        return Decimal(str(value if value not in (None, "") else 0)).quantize(CENT, ROUND_HALF_UP)
+    except InvalidOperation:
+        raise FacturXError(f"Invalid amount '{value}'")
+
+def _siren(registration_number: Optional[str]) -> Optional[str]:
+    # SIRET = SIREN (9 digits) + establishment number
+    digits = "".join(c for c in registration_number or "" if c.isdigit())
+    return digits[:9] if len(digits) >= 9 else None
+
+@lru_cache(maxsize=None)
+def _schema(profile: str):
+    """
+    Compiled XSD per profile. Parsing the schema costs far more than
+    validating an invoice, so each worker process does it once.
+    """
+    from importlib.resources import files
+    from lxml import etree
+    from facturx.facturx import FACTURX_LEVEL2xsd
+
+    xsd_path = files("facturx").joinpath("xsd_and_schematron", FACTURX_LEVEL2xsd[profile])
+    with xsd_path.open("rb") as f:
+        return etree.XMLSchema(etree.parse(f))
+
+class FacturXService:
+    """
+    Produces Factur-X e-invoices: the CII XML is built from the version snapshot
+    and totals, validated against the cached profile schema, and embedded as
+    an attachment (with the Factur-X XMP metadata) into the PDF/A-3 that
+    Gotenberg already produced, so no extra conversion is needed.
+    """
+    def __init__(self, profile: str, default_country: str, default_currency: str):
+        if profile not in PROFILES:
+            raise FacturXError(f"Unsupported Factur-X profile '{profile}'")
+        self.profile = profile
+        self.default_country = default_country
+        self.default_currency = default_currency
+
+    def build_xml(
+        self, doc_number: str, issue_date: datetime, data: Dict[str, Any], totals: Dict[str, Any],
+        seller: Dict[str, Any], buyer: Dict[str, Any]
+    ) -> bytes:
+        from lxml import etree
+
+        def sub(parent, tag: str, text: Any = None, **attrib):
+            prefix, name = tag.split(":")
+            el = etree.SubElement(parent, f"{{{NSMAP[prefix]}}}{name}", attrib)
+            if text is not None:
+                el.text = str(text)
+            return el
+
+        def party(parent, tag: str, info: Dict[str, Any], with_address: bool):
+            el = sub(parent, tag)
+            sub(el, "ram:Name", info["name"])
+            siren = _siren(info.get("registration_number"))
+            if siren:
+                org = sub(el, "ram:SpecifiedLegalOrganization")
+                sub(org, "ram:ID", siren, schemeID="0002")
+            if with_address:
+                address = sub(el, "ram:PostalTradeAddress")
+                sub(address, "ram:CountryID", info.get("country") or self.default_country)
+            if info.get("vat_number"):
+                tax = sub(el, "ram:SpecifiedTaxRegistration")
+                sub(tax, "ram:ID", info["vat_number"], schemeID="VA")
+            return el
+
+        basicwl = self.profile == "basicwl"
+        currency = data.get("currency") or self.default_currency
+        total_ht = _amount(totals.get("total_ht"))
+        total_tva = _amount(totals.get("total_tva"))
+        total_ttc = _amount(totals.get("total_ttc"))
+        due = _amount(totals.get("due", total_ttc))
+
+        root = etree.Element(f"{{{RSM}}}CrossIndustryInvoice", nsmap=NSMAP)
+        context = sub(root, "rsm:ExchangedDocumentContext")
+        guideline = sub(context, "ram:GuidelineSpecifiedDocumentContextParameter")
+        sub(guideline, "ram:ID", PROFILES[self.profile])
+
+        header = sub(root, "rsm:ExchangedDocument")
+        sub(header, "ram:ID", doc_number)
+        sub(header, "ram:TypeCode", INVOICE_TYPE_CODE)
+        issue = sub(header, "ram:IssueDateTime")
+        sub(issue, "udt:DateTimeString", issue_date.strftime("%Y%m%d"), format="102")
+
+        transaction = sub(root, "rsm:SupplyChainTradeTransaction")
+        agreement = sub(transaction, "ram:ApplicableHeaderTradeAgreement")
+        buyer_reference = data.get("buyer_reference")
+        if buyer_reference:
+            sub(agreement, "ram:BuyerReference", buyer_reference)
+        party(agreement, "ram:SellerTradeParty", seller, with_address=True)
+        party(agreement, "ram:BuyerTradeParty", buyer, with_address=basicwl)
+        po_number = data.get("po_number")
+        if po_number:
+            order = sub(agreement, "ram:BuyerOrderReferencedDocument")
+            sub(order, "ram:IssuerAssignedID", po_number)
+        sub(transaction, "ram:ApplicableHeaderTradeDelivery")
+
+        settlement = sub(transaction, "ram:ApplicableHeaderTradeSettlement")
+        sub(settlement, "ram:InvoiceCurrencyCode", currency)
+        if basicwl:
+            tax = sub(settlement, "ram:ApplicableTradeTax")
+            sub(tax, "ram:CalculatedAmount", total_tva)
+            sub(tax, "ram:TypeCode", "VAT")
+            sub(tax, "ram:BasisAmount", total_ht)
+            sub(tax, "ram:CategoryCode", "S" if total_tva else "E")
+            rate = totals.get("vat_rate")
+            if rate is None:
+                rate = (total_tva * 100 / total_ht) if total_ht else 0
+            sub(tax, "ram:RateApplicablePercent", _amount(rate))
+        summation = sub(settlement, "ram:SpecifiedTradeSettlementHeaderMonetarySummation")
+        if basicwl:
+            sub(summation, "ram:LineTotalAmount", total_ht)
+        sub(summation, "ram:TaxBasisTotalAmount", total_ht)
+        sub(summation, "ram:TaxTotalAmount", total_tva, currencyID=currency)
+        sub(summation, "ram:GrandTotalAmount", total_ttc)
+        sub(summation, "ram:DuePayableAmount", due)
+
+        return etree.tostring(root, xml_declaration=True, encoding="UTF-8")
+
+    def validate(self, xml: bytes) -> List[str]:
+        """
+        Returns the schema errors, empty when the XML is valid for the profile.
+        """
+        from lxml import etree
+
+        schema = _schema(self.profile)
+        if schema.validate(etree.fromstring(xml)):
+            return []
+        return [f"line {e.line}: {e.message}" for e in schema.error_log]
+
+    def embed(self, pdf_content: bytes, xml: bytes, doc_number: str, seller_name: str) -> bytes:
+        """
+        Attaches factur-x.xml to the PDF and writes the XMP metadata.
+        The XML was validated already and the metadata is passed explicitly
+        so the library does not parse the XML again.
+        """
+        from facturx import generate_from_binary
+
+        return generate_from_binary(
+            pdf_content, xml, flavor="factur-x", level=self.profile, check_xsd=False,
+            pdf_metadata={
+                "author": seller_name,
+                "keywords": "Factur-X, Invoice",
+                "title": f"{seller_name}: Invoice {doc_number}",
+                "subject": f"Factur-X invoice {doc_number} issued by {seller_name}",
+            },
+            lang="fr-FR",
+        )
+
+    def process(
+        self, pdf_content: bytes, doc_number: str, issue_date: datetime, data: Dict[str, Any],
+        totals: Dict[str, Any], seller: Dict[str, Any], buyer: Dict[str, Any]
+    ) -> Tuple[bytes, Dict[str, Any]]:
+        """
+        Returns the Factur-X PDF and the tags to store in extra_metadata.
+        An invoice whose XML does not validate keeps its plain PDF: the errors
+        are recorded instead of publishing a non-compliant e-invoice.
+        """
+        xml = self.build_xml(doc_number, issue_date, data, totals, seller, buyer)
+        errors = self.validate(xml)
+        tags = {"profile": self.profile, "valid": not errors}
+        if errors:
+            tags["errors"] = errors[:10]
+            return pdf_content, tags
+        return self.embed(pdf_content, xml, doc_number, seller["name"]), tags
+
+facturx_service = FacturXService(
+    profile=settings.FACTURX_PROFILE,
+    default_country=settings.FACTURX_DEFAULT_COUNTRY,
+    default_currency=settings.FACTURX_DEFAULT_CURRENCY
+)
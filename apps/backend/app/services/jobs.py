@@ -0,0 +1,155 @@
+import json
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+from redis.exceptions import WatchError
+from app.core.config import settings
+from app.core.redis import get_sync_redis
+from app.services.events import publish_event
+
+JOB_EVENT = "job.progress"
+
+def _job_key(job_id: str) -> str:
+    return f"job:{job_id}"
+
+def _parts_key(job_id: str) -> str:
+    return f"job:{job_id}:parts"
+
+def _request_key(company_id: int, request_key: str) -> str:
+    return f"job-request:{company_id}:{request_key}"
+
+class JobTracker:
+    """
+    State and progress of long-running jobs (merges, exports), kept in a Redis
+    hash per job so the API can report on them without touching Celery results.
+    Workers update it; the tenant is notified over SSE on every state change
+    and every 10% of progress.
+    Jobs made of independent parts (one per company of an accountant export)
+    also record each part's state, so a failed job can be resumed without
+    redoing the parts that succeeded.
+    """
+    def create(
+        self, company_id: int, kind: str, total: int, job_id: Optional[str] = None,
+        params: Optional[Dict[str, Any]] = None
+    ) -> str:
+        job_id = job_id or str(uuid.uuid4())
+        now = time.time()
+        r = get_sync_redis()
+        pipe = r.pipeline()
+        pipe.hset(_job_key(job_id), mapping={
+            "job_id": job_id, "company_id": company_id, "kind": kind, "status": "PENDING",
+            "done": 0, "total": total, "created_at": now, "updated_at": now,
+            # Kept to resume the job with the same arguments
+            **({"params": json.dumps(params)} if params is not None else {}),
+        })
+        pipe.expire(_job_key(job_id), settings.JOB_TTL_SECONDS)
+        pipe.execute()
+        return job_id
+
+    def _update(self, job_id: str, **fields) -> Dict[str, Any]:
+        r = get_sync_redis()
+        pipe = r.pipeline()
+        pipe.hset(_job_key(job_id), mapping={**fields, "updated_at": time.time()})
+        pipe.hgetall(_job_key(job_id))
+        _, raw = pipe.execute()
+        return self._decode(raw)
+
+    def _notify(self, job: Dict[str, Any]):
+        publish_event(job["company_id"], JOB_EVENT, {
+            k: job.get(k) for k in ("job_id", "kind", "status", "done", "total", "error")
+        })
+
+    def start(self, job_id: str):
+        self._notify(self._update(job_id, status="STARTED"))
+
+    def progress(self, job_id: str, done: int):
+        job = self._update(job_id, done=done)
+        total = job["total"] or 1
+        if done * 10 // total != (done - 1) * 10 // total:
+            self._notify(job)
+
+    def complete(self, job_id: str, result: Dict[str, Any]):
+        self._notify(self._update(job_id, status="SUCCESS", result=json.dumps(result)))
+
+    def fail(self, job_id: str, error: str):
+        self._notify(self._update(job_id, status="FAILURE", error=error))
+
+    def claim(self, company_id: int, request_key: str, job_id: str) -> Tuple[str, bool]:
+        """
+        Maps a request to the job serving it, so identical requests share one
+        job while it runs and reuse its result afterwards. Returns the job
+        to report and whether it is job_id, which the caller then starts
+        (otherwise it discards it). Failed and expired jobs are replaced.
+        The request key must change with the data, e.g. hold change counters.
+        """
+        r = get_sync_redis()
+        key = _request_key(company_id, request_key)
+        for _ in range(3):
+            if r.set(key, job_id, nx=True, ex=settings.JOB_TTL_SECONDS):
+                return job_id, True
+            existing = r.get(key)
+            if existing is None:
+                continue
+            job = self.get(existing, company_id)
+            if job is not None and job["status"] != "FAILURE":
+                return existing, False
+            # Released only if nobody replaced it meanwhile
+            with r.pipeline() as pipe:
+                try:
+                    pipe.watch(key)
+                    if pipe.get(key) == existing:
+                        pipe.multi()
+                        pipe.delete(key)
+                        pipe.execute()
+                except WatchError:
+                    pass
+        # Contended beyond reason: run it rather than fail the request
+        return job_id, True
+
+    def discard(self, job_id: str):
+        get_sync_redis().delete(_job_key(job_id), _parts_key(job_id))
+
+    def requeue(self, job_id: str):
+        r = get_sync_redis()
+        r.hdel(_job_key(job_id), "error")
+        self._notify(self._update(job_id, status="PENDING"))
+
+    def set_part(self, job_id: str, part: str, state: Dict[str, Any]):
+        r = get_sync_redis()
+        pipe = r.pipeline()
+        pipe.hset(_parts_key(job_id), part, json.dumps(state))
+        pipe.expire(_parts_key(job_id), settings.JOB_TTL_SECONDS)
+        pipe.execute()
+
+    def parts(self, job_id: str) -> Dict[str, Dict[str, Any]]:
+        raw = get_sync_redis().hgetall(_parts_key(job_id))
+        return {part: json.loads(state) for part, state in raw.items()}
+
+    @staticmethod
+    def _decode(raw: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        if not raw:
+            return None
+        job: Dict[str, Any] = dict(raw)
+        for field in ("company_id", "done", "total"):
+            job[field] = int(job[field])
+        for field in ("created_at", "updated_at"):
+            job[field] = float(job[field])
+        for field in ("result", "params"):
+            job[field] = json.loads(job[field]) if field in job else None
+        return job
+
+    def get(self, job_id: str, company_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Returns the job, or None if it does not exist or belongs to another company.
+        """
+        pipe = get_sync_redis().pipeline()
+        pipe.hgetall(_job_key(job_id))
+        pipe.hgetall(_parts_key(job_id))
+        raw, parts = pipe.execute()
+        job = self._decode(raw)
+        if job is None or job["company_id"] != company_id:
+            return None
+        job["parts"] = {part: json.loads(state) for part, state in parts.items()} or None
+        return job
+
+job_tracker = JobTracker()
@@ -3,6 +3,13 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update
 from app.models.business import NumberSequence, DocType
 
+# Mapping DocType to Prefixes
+PREFIXES = {
+    DocType.QUOTE: "DEVIS",
+    DocType.INVOICE: "FAC",
+    DocType.CONTRACT: "CTR"
+}
+
 class NumberingService:
     @staticmethod
     async def get_next_number(db: AsyncSession, company_id: int, doc_type: DocType) -> str:
@@ -13,13 +20,7 @@ class NumberingService:
         """
         year = datetime.utcnow().year
         
-        # Mapping DocType to Prefixes
-        prefixes = {
-            DocType.QUOTE: "DEVIS",
-            DocType.INVOICE: "FAC",
-            DocType.CONTRACT: "CTR"
-        }
-        prefix = prefixes.get(doc_type, "DOC")
+        prefix = PREFIXES.get(doc_type, "DOC")
 
         # Try to update existing sequence
         stmt = (
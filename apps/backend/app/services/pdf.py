@@ -1,23 +1,28 @@
-import httpx
 from typing import Optional
+from app.core.tracing import tracer
 
 class PdfService:
     def __init__(self, gotenberg_url: str = "http://localhost:3001"):
         self.url = gotenberg_url
 
-    async def convert_docx_to_pdf(self, docx_content: bytes) -> bytes:
+    async def convert_docx_to_pdf(self, docx_content: bytes, pdfa: Optional[str] = None) -> bytes:
         """
         Sends a DOCX file to Gotenberg and returns the converted PDF bytes.
+        pdfa requests an archival format in the same conversion, e.g. "PDF/A-3b".
         """
+        import httpx
         async with httpx.AsyncClient(timeout=30.0) as client:
             files = {
                 "files": ("document.docx", docx_content, "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
             }
             # Gotenberg 8 endpoint for LibreOffice conversion
-            response = await client.post(
-                f"{self.url}/forms/libreoffice/convert",
-                files=files
-            )
+            with tracer.span("gotenberg.convert", kind="client", **{"pdf.pdfa": pdfa or "", "docx.bytes": len(docx_content)}) as span:
+                response = await client.post(
+                    f"{self.url}/forms/libreoffice/convert",
+                    files=files,
+                    data={"pdfa": pdfa} if pdfa else None
+                )
+                span.set_attribute("http.status_code", response.status_code)
             
             if response.status_code != 200:
                 raise Exception(f"PDF conversion failed: {response.text}")
@@ -0,0 +1,148 @@
+import io
+from typing import BinaryIO, Dict, List, Tuple
+
+# pypdf is imported lazily: only the merge worker pays for it
+
+CATALOG_ID = 1
+PAGES_ID = 2
+# Attributes a page may inherit from its page tree nodes
+INHERITABLE = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+
+class PdfMergeError(ValueError):
+    pass
+
+class PdfStreamMerger:
+    """
+    Concatenates PDFs into one file, writing each source's objects to the
+    output as soon as that source is read. Only object offsets and page ids
+    stay in memory, so memory is bounded by the largest single source rather
+    than by the size of the merged document.
+    """
+    def __init__(self, out: BinaryIO):
+        self.out = out
+        self.offsets: List[int] = [0, 0, 0] # Index = object id, 1 and 2 are written on close
+        self.page_ids: List[int] = []
+        self.out.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    def _new_id(self) -> int:
+        self.offsets.append(0)
+        return len(self.offsets) - 1
+
+    def _write_object(self, object_id: int, obj):
+        self.offsets[object_id] = self.out.tell()
+        self.out.write(f"{object_id} 0 obj\n".encode())
+        if obj is None:
+            self.out.write(b"null")
+        else:
+            obj.write_to_stream(self.out)
+        self.out.write(b"\nendobj\n")
+
+    def append(self, pdf_content: bytes) -> int:
+        """
+        Appends every page of a PDF and returns the number of pages added.
+        Raises PdfMergeError for any source that cannot be read or copied;
+        the output stays valid and the next sources can still be appended.
+        """
+        try:
+            return self._append(pdf_content)
+        except PdfMergeError:
+            raise
+        except Exception as e:
+            # pypdf reports malformed files with all kinds of errors
+            # (PdfStreamError, KeyError, ValueError...), often only once
+            # objects are resolved during the copy
+            raise PdfMergeError(f"Unreadable PDF: {type(e).__name__}: {e}") from e
+
+    def _append(self, pdf_content: bytes) -> int:
+        from pypdf import PdfReader
+        from pypdf.generic import (
+            ArrayObject, DictionaryObject, IndirectObject, NameObject, StreamObject
+        )
+
+        reader = PdfReader(io.BytesIO(pdf_content))
+        pages = list(reader.pages)
+        if reader.is_encrypted:
+            raise PdfMergeError("Encrypted PDFs cannot be merged")
+
+        mapping: Dict[Tuple[int, int], int] = {}
+        pending: List[Tuple[int, int, int]] = []
+
+        def ref(idnum: int, generation: int) -> int:
+            key = (idnum, generation)
+            if key not in mapping:
+                mapping[key] = self._new_id()
+                pending.append((idnum, generation, mapping[key]))
+            return mapping[key]
+
+        def remap(obj):
+            # Copies the object with references renumbered into the output
+            if isinstance(obj, IndirectObject):
+                return IndirectObject(ref(obj.idnum, obj.generation), 0, None)
+            if isinstance(obj, StreamObject):
+                copy = obj.__class__()
+                copy._data = obj._data
+                for key, value in dict.items(obj):
+                    if key != "/Length":
+                        copy[key] = remap(value)
+                return copy
+            if isinstance(obj, DictionaryObject):
+                copy = DictionaryObject()
+                for key, value in dict.items(obj):
+                    copy[key] = remap(value)
+                return copy
+            if isinstance(obj, ArrayObject):
+                return ArrayObject(remap(v) for v in obj)
+            return obj
+
+        page_objects = {}
+        page_ids = []
+        for page in pages:
+            source = page.indirect_reference
+            page_dict = DictionaryObject(dict.items(page))
+            node = page.get("/Parent")
+            while node is not None:
+                node = node.get_object()
+                for key in INHERITABLE:
+                    if key not in page_dict and key in node:
+                        page_dict[NameObject(key)] = dict.__getitem__(node, key)
+                node = node.get("/Parent")
+            page_dict[NameObject("/Parent")] = IndirectObject(PAGES_ID, 0, None)
+            page_dict.pop("/StructParents", None) # The structure tree is not carried over
+            page_objects[(source.idnum, source.generation)] = page_dict
+            page_ids.append(ref(source.idnum, source.generation))
+
+        while pending:
+            idnum, generation, object_id = pending.pop()
+            obj = page_objects.get((idnum, generation))
+            if obj is None:
+                obj = reader.get_object(IndirectObject(idnum, generation, reader))
+            if isinstance(obj, DictionaryObject) and obj.get("/Type") == "/Pages":
+                # Only reachable through stray references, the source page tree is not copied
+                obj = None
+            self._write_object(object_id, remap(obj) if obj is not None else None)
+        # Pages join the tree only once fully written, so a source failing
+        # halfway leaves nothing but unreferenced objects behind
+        self.page_ids.extend(page_ids)
+        return len(pages)
+
+    def close(self) -> int:
+        """
+        Writes the page tree, catalog, cross-reference table and trailer.
+        Returns the total page count.
+        """
+        kids = " ".join(f"{i} 0 R" for i in self.page_ids)
+        self.offsets[PAGES_ID] = self.out.tell()
+        self.out.write(f"{PAGES_ID} 0 obj\n<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>\nendobj\n".encode())
+        self.offsets[CATALOG_ID] = self.out.tell()
+        self.out.write(f"{CATALOG_ID} 0 obj\n<< /Type /Catalog /Pages {PAGES_ID} 0 R >>\nendobj\n".encode())
+
+        xref_offset = self.out.tell()
+        self.out.write(f"xref\n0 {len(self.offsets)}\n0000000000 65535 f \n".encode())
+        self.out.write(b"".join(
+            (f"{offset:010d} 00000 n \n" if offset else "0000000000 00001 f \n").encode()
+            for offset in self.offsets[1:]
+        ))
+        self.out.write(
+            f"trailer\n<< /Size {len(self.offsets)} /Root {CATALOG_ID} 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode()
+        )
+        return len(self.page_ids)
@@ -0,0 +1,39 @@
+import json
+import time
+from typing import Any, Dict, List, Optional
+from app.core.config import settings
+from app.core.redis import get_sync_redis
+from app.services.storage import storage_service
+
+RECENT_KEY = "profiles:recent"
+
+def profile_object_name(profile_id: str) -> str:
+    return f"profiles/{profile_id}.collapsed.txt"
+
+class ProfileStore:
+    """
+    Profiles in object storage, the last PROFILING_KEEP of them listed in
+    Redis (newest first); older ones are deleted as new ones come in.
+    """
+    def save(self, profile_id: str, collapsed: str, meta: Dict[str, Any]) -> Dict[str, Any]:
+        object_name = profile_object_name(profile_id)
+        storage_service.upload_file(collapsed.encode("utf-8"), object_name, "text/plain; charset=utf-8")
+        entry = {"profile_id": profile_id, "object_name": object_name, "created_at": time.time(), **meta}
+        r = get_sync_redis()
+        pipe = r.pipeline()
+        pipe.lpush(RECENT_KEY, json.dumps(entry))
+        pipe.lrange(RECENT_KEY, settings.PROFILING_KEEP, -1)
+        pipe.ltrim(RECENT_KEY, 0, settings.PROFILING_KEEP - 1)
+        _, dropped, _ = pipe.execute()
+        for raw in dropped:
+            storage_service.delete_file(json.loads(raw)["object_name"])
+        return entry
+
+    def recent(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        end = (limit or settings.PROFILING_KEEP) - 1
+        return [json.loads(raw) for raw in get_sync_redis().lrange(RECENT_KEY, 0, end)]
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        return next((entry for entry in self.recent() if entry["profile_id"] == profile_id), None)
+
+profile_store = ProfileStore()
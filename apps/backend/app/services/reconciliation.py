@@ -0,0 +1,450 @@
+import bisect
+import csv
+import io
+import itertools
+import re
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import BinaryIO, Dict, Iterator, List, Optional, Set, Tuple
+from xml.etree import ElementTree
+from sqlalchemy import exists, func, insert, select, update, Integer, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.business import Client, Document, DocumentVersion, DocStatus, DocType, PaymentMatch
+from app.services.document_status import bulk_transition, OUTCOME_UPDATED, OUTCOME_UNCHANGED
+from app.services.numbering import PREFIXES
+
+# Bank reconciliation: statement lines (credits) are matched to open
+# invoices through hash indexes built from a single query, so a statement
+# costs a few dictionary lookups per line whatever the number of invoices.
+
+FORMAT_CSV = "csv"
+FORMAT_CAMT053 = "camt053"
+
+OPEN_STATUSES = (DocStatus.GENERATED, DocStatus.SENT)
+
+MATCH_PROPOSED = "proposed"
+MATCH_UNMATCHED = "unmatched"
+MATCH_CONFIRMED = "confirmed"
+MATCH_REJECTED = "rejected"
+
+# Rules, strongest first: document number in the label, exact amount from a
+# known client, exact amount unique among open invoices, amount within the
+# tolerance from a known client
+RULE_SCORES = {"number": 1.0, "amount_client": 0.9, "amount": 0.5, "tolerance": 0.4}
+# A number match whose amount is off (partial payment, bank fees) is still proposed
+NUMBER_AMOUNT_MISMATCH_SCORE = 0.6
+NUMBER_WITHIN_TOLERANCE_SCORE = 0.8
+
+CSV_HEADERS = {
+    "date": "date", "date operation": "date", "date comptable": "date", "booking date": "date",
+    "date de valeur": "date", "value date": "date",
+    "libelle": "label", "label": "label", "description": "label", "motif": "label", "libelle operation": "label",
+    "reference": "reference", "ref": "reference",
+    "montant": "amount", "amount": "amount",
+    "credit": "credit", "debit": "debit",
+    "devise": "currency", "currency": "currency",
+    "tiers": "counterparty", "contrepartie": "counterparty", "counterparty": "counterparty",
+    "emetteur": "counterparty", "donneur d'ordre": "counterparty", "payer": "counterparty",
+}
+DATE_FORMATS = ("%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d.%m.%Y", "%d/%m/%y")
+# Legal forms carry no information when comparing company names
+LEGAL_FORMS = {"SARL", "SAS", "SASU", "SA", "EURL", "SCI", "SNC", "SCOP", "SELARL", "EI", "GMBH", "LTD", "INC"}
+MAX_NAME_WORDS = 4
+
+class ReconciliationError(Exception):
+    pass
+
+@dataclass
+class StatementLine:
+    line_number: int
+    amount: Decimal # Credits only, always positive
+    booking_date: Optional[date] = None
+    currency: Optional[str] = None
+    label: str = ""
+    counterparty: Optional[str] = None
+
+@dataclass
+class OpenInvoice:
+    document_id: int
+    client_id: int
+    amount: Optional[Decimal]
+    numbers: List[str] = field(default_factory=list)
+
+def detect_format(filename: Optional[str]) -> str:
+    extension = (filename or "").rsplit(".", 1)[-1].lower()
+    if extension == "csv":
+        return FORMAT_CSV
+    if extension == "xml":
+        return FORMAT_CAMT053
+    raise ReconciliationError("Only .csv and CAMT.053 .xml statements can be imported")
+
+def _fold(text: str) -> str:
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+
+def normalize_name(name: Optional[str]) -> str:
+    words = re.sub(r"[^A-Z0-9]+", " ", _fold(name or "").upper()).split()
+    return " ".join(w for w in words if w not in LEGAL_FORMS)
+
+def normalize_number(number: str) -> str:
+    return re.sub(r"[^A-Z0-9]", "", number.upper())
+
+# Invoice numbers as banks print them: FAC-2026-0042, FAC 2026 0042, FAC20260042...
+NUMBER_RE = re.compile(rf"{PREFIXES[DocType.INVOICE]}[\s\-_/.]*(\d{{4}})[\s\-_/.]*(\d{{4,}})", re.IGNORECASE)
+
+def numbers_in(label: str) -> List[str]:
+    prefix = PREFIXES[DocType.INVOICE]
+    return [f"{prefix}{year}{counter}" for year, counter in NUMBER_RE.findall(label)]
+
+def parse_amount(text: str) -> Decimal:
+    """
+    Accepts French and English notations: "1 234,56", "1.234,56", "1,234.56".
+    """
+    value = re.sub(r"[^\d,.\-+]", "", text)
+    if "," in value and "." in value:
+        thousands = "." if value.rfind(",") > value.rfind(".") else ","
+        value = value.replace(thousands, "")
+    value = value.replace(",", ".")
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {text!r}")
+
+def parse_date(text: Optional[str]) -> Optional[date]:
+    text = (text or "").strip()[:10]
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+def _csv_lines(fileobj: BinaryIO) -> Iterator[StatementLine]:
+    stream = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    try:
+        sample = stream.readline()
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(itertools.chain([sample], stream), dialect)
+        header = next(reader, None)
+        if not header:
+            raise ReconciliationError("The statement is empty")
+        mapping = {}
+        for index, title in enumerate(header):
+            column = CSV_HEADERS.get(_fold(title).strip().lower())
+            if column and column not in mapping:
+                mapping[column] = index
+        if "amount" not in mapping and "credit" not in mapping:
+            raise ReconciliationError("Missing column: amount or credit")
+
+        for number, values in enumerate(reader, start=2):
+            row = {column: values[index].strip() for column, index in mapping.items() if index < len(values)}
+            try:
+                if row.get("amount"):
+                    amount = parse_amount(row["amount"])
+                elif row.get("credit"):
+                    amount = parse_amount(row["credit"])
+                else:
+                    continue # Debit line
+            except ValueError:
+                continue
+            if amount <= 0:
+                continue
+            yield StatementLine(
+                line_number=number,
+                amount=amount,
+                booking_date=parse_date(row.get("date")),
+                currency=row.get("currency") or None,
+                label=" ".join(filter(None, (row.get("label"), row.get("reference")))),
+                counterparty=row.get("counterparty") or None,
+            )
+    except UnicodeDecodeError:
+        raise ReconciliationError("CSV statements must be UTF-8 encoded")
+    finally:
+        stream.detach() # The caller owns the file
+
+def _local(tag: str) -> str:
+    return tag.rpartition("}")[2]
+
+def _find(elem: ElementTree.Element, path: str) -> Optional[ElementTree.Element]:
+    # CAMT versions only differ by namespace for what we read, so match local names
+    for name in path.split("/"):
+        elem = next((child for child in elem if _local(child.tag) == name), None)
+        if elem is None:
+            return None
+    return elem
+
+def _text(elem: ElementTree.Element, path: str) -> Optional[str]:
+    found = _find(elem, path)
+    return found.text.strip() if found is not None and found.text else None
+
+def _remittance(tx: ElementTree.Element) -> List[str]:
+    # Unstructured remittance, structured creditor reference, additional info
+    return [t.text.strip() for t in tx.iter() if _local(t.tag) in ("Ustrd", "Ref", "AddtlTxInf") and t.text]
+
+def _tx_amount(tx: ElementTree.Element) -> Optional[ElementTree.Element]:
+    amount = _find(tx, "Amt")
+    return amount if amount is not None else _find(tx, "AmtDtls/TxAmt/Amt")
+
+def _debtor(tx: ElementTree.Element) -> Optional[str]:
+    # camt.053.001.02 has Dbtr/Nm, later versions Dbtr/Pty/Nm
+    return _text(tx, "RltdPties/Dbtr/Nm") or _text(tx, "RltdPties/Dbtr/Pty/Nm")
+
+def _camt_lines(fileobj: BinaryIO) -> Iterator[StatementLine]:
+    number = 0
+    try:
+        for _, elem in ElementTree.iterparse(fileobj):
+            if _local(elem.tag) != "Ntry":
+                continue
+            status = _text(elem, "Sts") or _text(elem, "Sts/Cd")
+            if _text(elem, "CdtDbtInd") != "CRDT" or status in ("PDNG", "INFO"):
+                elem.clear()
+                continue
+            booking_date = parse_date(_text(elem, "BookgDt/Dt") or _text(elem, "BookgDt/DtTm"))
+            entry_info = _text(elem, "AddtlNtryInf")
+            details = _find(elem, "NtryDtls")
+            txs = [tx for tx in details if _local(tx.tag) == "TxDtls"] if details is not None else []
+            # A batch booking lists its transactions with their own amounts
+            split = len(txs) > 1 and all(_tx_amount(tx) is not None for tx in txs)
+            if split:
+                parts = [(tx, _tx_amount(tx)) for tx in txs]
+            else:
+                parts = [(txs[0] if txs else None, _find(elem, "Amt"))]
+            for tx, amount in parts:
+                if amount is None or not amount.text:
+                    continue
+                number += 1
+                texts = _remittance(tx) if tx is not None else []
+                if entry_info and not split:
+                    texts.append(entry_info)
+                yield StatementLine(
+                    line_number=number,
+                    amount=Decimal(amount.text.strip()),
+                    booking_date=booking_date,
+                    currency=amount.get("Ccy"),
+                    label=" ".join(texts),
+                    counterparty=_debtor(tx) if tx is not None else None,
+                )
+            elem.clear()
+    except ElementTree.ParseError as e:
+        raise ReconciliationError(f"Invalid CAMT.053 statement: {e}")
+
+def read_statement(fileobj: BinaryIO, fmt: str) -> Iterator[StatementLine]:
+    """
+    Yields the credit lines of a statement as the file is read.
+    """
+    if fmt == FORMAT_CAMT053:
+        return _camt_lines(fileobj)
+    return _csv_lines(fileobj)
+
+class InvoiceIndex:
+    """
+    Hash indexes over the open invoices of a company: by normalized document
+    number, by exact amount, by normalized client name, plus each client's
+    invoices sorted by amount for the tolerance range lookups.
+    """
+    def __init__(self, invoices: List[OpenInvoice], client_names: Dict[int, str], tolerance: Decimal):
+        self.tolerance = tolerance
+        self.by_number: Dict[str, OpenInvoice] = {}
+        self.by_amount: Dict[Decimal, List[OpenInvoice]] = defaultdict(list)
+        self.clients_by_name: Dict[str, Set[int]] = defaultdict(set)
+        by_client: Dict[int, List[OpenInvoice]] = defaultdict(list)
+        for invoice in invoices:
+            for doc_number in invoice.numbers:
+                self.by_number[normalize_number(doc_number)] = invoice
+            if invoice.amount is not None:
+                self.by_amount[invoice.amount].append(invoice)
+                by_client[invoice.client_id].append(invoice)
+        for client_id, name in client_names.items():
+            key = normalize_name(name)
+            if key:
+                self.clients_by_name[key].add(client_id)
+        self.by_client: Dict[int, Tuple[List[Decimal], List[OpenInvoice]]] = {}
+        for client_id, client_invoices in by_client.items():
+            client_invoices.sort(key=lambda i: i.amount)
+            self.by_client[client_id] = ([i.amount for i in client_invoices], client_invoices)
+
+    def clients_of(self, line: StatementLine) -> Set[int]:
+        """
+        Clients named by the counterparty, or by up to MAX_NAME_WORDS
+        consecutive words of the label.
+        """
+        clients = set(self.clients_by_name.get(normalize_name(line.counterparty), ()))
+        words = normalize_name(line.label).split()
+        for size in range(1, MAX_NAME_WORDS + 1):
+            for start in range(len(words) - size + 1):
+                clients |= self.clients_by_name.get(" ".join(words[start:start + size]), set())
+        return clients
+
+    def candidates(self, line: StatementLine) -> List[Tuple[float, str, OpenInvoice]]:
+        found = []
+        for key in numbers_in(line.label):
+            invoice = self.by_number.get(key)
+            if invoice is None:
+                continue
+            if invoice.amount == line.amount:
+                score = RULE_SCORES["number"]
+            elif invoice.amount is not None and abs(invoice.amount - line.amount) <= self.tolerance:
+                score = NUMBER_WITHIN_TOLERANCE_SCORE
+            else:
+                score = NUMBER_AMOUNT_MISMATCH_SCORE
+            found.append((score, "number", invoice))
+
+        clients = self.clients_of(line)
+        exact = self.by_amount.get(line.amount, [])
+        from_client = [i for i in exact if i.client_id in clients]
+        found.extend((RULE_SCORES["amount_client"], "amount_client", i) for i in from_client)
+        if not from_client and len(exact) == 1:
+            found.append((RULE_SCORES["amount"], "amount", exact[0]))
+
+        if not from_client:
+            for client_id in clients:
+                amounts, client_invoices = self.by_client.get(client_id, ([], []))
+                low = bisect.bisect_left(amounts, line.amount - self.tolerance)
+                high = bisect.bisect_right(amounts, line.amount + self.tolerance)
+                found.extend((RULE_SCORES["tolerance"], "tolerance", i) for i in client_invoices[low:high])
+        return found
+
+def match_lines(lines: List[StatementLine], index: InvoiceIndex) -> List[Tuple[StatementLine, Optional[OpenInvoice], Optional[str], Optional[float]]]:
+    """
+    Assigns each invoice to at most one line, best scores first; ties go to
+    the earliest line and the oldest invoice.
+    """
+    candidates = []
+    for position, line in enumerate(lines):
+        for score, rule, invoice in index.candidates(line):
+            closeness = abs((invoice.amount or Decimal(0)) - line.amount)
+            candidates.append((-score, closeness, position, invoice.document_id, rule, invoice))
+    candidates.sort(key=lambda c: c[:4])
+
+    assigned: Dict[int, Tuple[OpenInvoice, str, float]] = {}
+    taken = set()
+    for negative_score, _, position, document_id, rule, invoice in candidates:
+        if position in assigned or document_id in taken:
+            continue
+        assigned[position] = (invoice, rule, -negative_score)
+        taken.add(document_id)
+    return [
+        (line, *assigned[position]) if position in assigned else (line, None, None, None)
+        for position, line in enumerate(lines)
+    ]
+
+async def load_index(db: AsyncSession, company_id: int, tolerance: Decimal) -> InvoiceIndex:
+    """
+    Builds the index from one query over the open invoices of the company.
+    Invoices with a proposed or confirmed match are left out, so importing
+    another statement cannot propose them a second time.
+    """
+    stmt = (
+        select(
+            Document.id, Document.client_id, Document.current_totals["total_ttc"].astext.label("total_ttc"),
+            Client.name, func.array_agg(DocumentVersion.doc_number).label("numbers")
+        )
+        .join(Client, Client.id == Document.client_id)
+        .outerjoin(DocumentVersion, DocumentVersion.document_id == Document.id)
+        .where(
+            Document.company_id == company_id,
+            Document.type == DocType.INVOICE,
+            Document.status.in_(OPEN_STATUSES),
+            ~exists().where(
+                PaymentMatch.document_id == Document.id,
+                PaymentMatch.status.in_([MATCH_PROPOSED, MATCH_CONFIRMED]),
+            ),
+        )
+        .group_by(Document.id, Client.name)
+    )
+    invoices, client_names = [], {}
+    result = await db.stream(stmt.execution_options(yield_per=10000))
+    async for row in result:
+        try:
+            amount = Decimal(row.total_ttc).quantize(Decimal("0.01")) if row.total_ttc else None
+        except InvalidOperation:
+            amount = None
+        invoices.append(OpenInvoice(row.id, row.client_id, amount, [n for n in row.numbers if n]))
+        client_names[row.client_id] = row.name
+    return InvoiceIndex(invoices, client_names, tolerance)
+
+async def reconcile(
+    db: AsyncSession, company_id: int, statement_id: str, fileobj: BinaryIO, fmt: str, tolerance: Decimal
+) -> Dict[str, int]:
+    """
+    Matches a statement and stores one row per credit line, proposed or
+    unmatched. The caller commits.
+    """
+    lines = list(read_statement(fileobj, fmt))
+    index = await load_index(db, company_id, tolerance)
+    rows = [
+        {
+            "company_id": company_id, "statement_id": statement_id, "line_number": line.line_number,
+            "booking_date": line.booking_date, "amount": line.amount, "currency": (line.currency or "")[:3] or None,
+            "label": line.label[:500] or None, "counterparty": (line.counterparty or "")[:255] or None,
+            "document_id": invoice.document_id if invoice else None, "rule": rule, "score": score,
+            "status": MATCH_PROPOSED if invoice else MATCH_UNMATCHED,
+        }
+        for line, invoice, rule, score in match_lines(lines, index)
+    ]
+    if rows:
+        await db.execute(insert(PaymentMatch), rows)
+    proposed = sum(1 for r in rows if r["status"] == MATCH_PROPOSED)
+    return {"lines": len(rows), "proposed": proposed, "unmatched": len(rows) - proposed}
+
+async def confirm_matches(db: AsyncSession, company_id: int, match_ids: List[int]) -> List[dict]:
+    """
+    Confirms proposed matches: their invoices are marked PAID in one
+    statement, and only the matches whose invoice this call marked PAID are
+    confirmed, one per invoice. The others stay proposed, with outcome
+    "unchanged" when their invoice was already PAID. The caller commits.
+    """
+    result = await db.execute(
+        select(PaymentMatch.id, PaymentMatch.document_id).where(
+            PaymentMatch.id.in_(match_ids),
+            PaymentMatch.company_id == company_id,
+            PaymentMatch.status == MATCH_PROPOSED,
+        )
+    )
+    proposed = dict(result.all())
+    outcomes = {}
+    if proposed:
+        transitions = await bulk_transition(db, company_id, list(proposed.values()), DocStatus.PAID)
+        by_document = {t["document_id"]: t["outcome"] for t in transitions}
+        paid = set()
+        for match_id, document_id in proposed.items():
+            outcome = by_document[document_id]
+            if outcome == OUTCOME_UPDATED and document_id not in paid:
+                paid.add(document_id)
+                outcomes[match_id] = MATCH_CONFIRMED
+            else:
+                # Already PAID, possibly by another match of this call
+                outcomes[match_id] = OUTCOME_UNCHANGED if outcome == OUTCOME_UPDATED else outcome
+        confirmed = [m for m, outcome in outcomes.items() if outcome == MATCH_CONFIRMED]
+        await _set_status(db, confirmed, MATCH_CONFIRMED)
+    return [{"match_id": m, "outcome": outcomes.get(m, "not_found")} for m in match_ids]
+
+async def reject_matches(db: AsyncSession, company_id: int, match_ids: List[int]) -> List[dict]:
+    result = await db.execute(
+        update(PaymentMatch)
+        .where(
+            PaymentMatch.id == any_(bindparam("ids", match_ids, type_=ARRAY(Integer))),
+            PaymentMatch.company_id == company_id,
+            PaymentMatch.status == MATCH_PROPOSED,
+        )
+        .values(status=MATCH_REJECTED)
+        .returning(PaymentMatch.id)
+        .execution_options(synchronize_session=False)
+    )
+    rejected = set(result.scalars().all())
+    return [{"match_id": m, "outcome": MATCH_REJECTED if m in rejected else "not_found"} for m in match_ids]
+
+async def _set_status(db: AsyncSession, match_ids: List[int], status: str):
+    if match_ids:
+        await db.execute(
+            update(PaymentMatch)
+            .where(PaymentMatch.id == any_(bindparam("ids", match_ids, type_=ARRAY(Integer))))
+            .values(status=status)
+            .execution_options(synchronize_session=False)
+        )
@@ -0,0 +1,136 @@
+import logging
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.business import Document, DocStatus, RevenueRollup
+
+logger = logging.getLogger(__name__)
+
+AMOUNTS = ("total_ht", "total_tva", "total_ttc")
+
+# (company_id, month, doc_type, status, client_id)
+RollupKey = Tuple[int, date, str, str, int]
+# Key and (documents, total_ht, total_tva, total_ttc)
+Contribution = Tuple[RollupKey, Tuple[int, Decimal, Decimal, Decimal]]
+
+CENT = Decimal("0.01")
+
+# Per company: writers share it, reconcile takes it alone
+LOCK_SHARED = text("SELECT pg_advisory_xact_lock_shared(hashtext('revenue_rollups'), :company_id)")
+LOCK_EXCLUSIVE = text("SELECT pg_advisory_xact_lock(hashtext('revenue_rollups'), :company_id)")
+
+def _amount(value: Any) -> Decimal:
+    # Rounded per document like the stored columns, so sums never drift by rounding
+    try:
+        return Decimal(str(value)).quantize(CENT) if value is not None else Decimal(0)
+    except InvalidOperation:
+        return Decimal(0)
+
+def _value(enum_or_str) -> str:
+    return getattr(enum_or_str, "value", enum_or_str)
+
+def contribution(
+    company_id: int, created_at: datetime, doc_type, status, client_id: int, totals: Optional[dict]
+) -> Optional[Contribution]:
+    """
+    What a document adds to the rollups in a given state; drafts add nothing.
+    """
+    if _value(status) == DocStatus.DRAFT.value:
+        return None
+    totals = totals or {}
+    key = (company_id, created_at.date().replace(day=1), _value(doc_type), _value(status), client_id)
+    return key, (1, *(_amount(totals.get(name)) for name in AMOUNTS))
+
+def document_contribution(doc) -> Optional[Contribution]:
+    return contribution(doc.company_id, doc.created_at, doc.type, doc.status, doc.client_id, doc.current_totals)
+
+class RevenueRollupService:
+    """
+    Keeps revenue_rollups equal to the sum of the non-draft documents:
+    every write path passes the before and after state of the documents it
+    changes, and the difference is upserted in the caller's transaction.
+    Dashboards then read a few hundred rollup rows instead of documents.
+    """
+    async def apply(self, session: AsyncSession, changes: Iterable[Tuple[Optional[Contribution], Optional[Contribution]]]):
+        deltas: Dict[RollupKey, List] = defaultdict(lambda: [0, Decimal(0), Decimal(0), Decimal(0)])
+        for before, after in changes:
+            for sign, item in ((-1, before), (1, after)):
+                if item is None:
+                    continue
+                key, values = item
+                delta = deltas[key]
+                for i, value in enumerate(values):
+                    delta[i] += sign * value
+        rows = [
+            {
+                "company_id": key[0], "month": key[1], "doc_type": key[2], "status": key[3], "client_id": key[4],
+                "documents": delta[0], "total_ht": delta[1], "total_tva": delta[2], "total_ttc": delta[3],
+            }
+            # Sorted so concurrent writers lock rollup rows in the same order
+            for key, delta in sorted(deltas.items()) if any(delta)
+        ]
+        if not rows:
+            return
+        for company_id in sorted({row["company_id"] for row in rows}):
+            await session.execute(LOCK_SHARED, {"company_id": company_id})
+        stmt = insert(RevenueRollup)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["company_id", "month", "doc_type", "status", "client_id"],
+            set_={
+                column: getattr(RevenueRollup, column) + getattr(stmt.excluded, column)
+                for column in ("documents", *AMOUNTS)
+            },
+        )
+        await session.execute(stmt, rows)
+
+    async def record(self, session: AsyncSession, before: Optional[Contribution], after: Optional[Contribution]):
+        await self.apply(session, [(before, after)])
+
+    async def reconcile(self, session: AsyncSession, company_id: int) -> int:
+        """
+        Recomputes a company's rollups from its documents and fixes the rows
+        that drifted. Returns the number of rows repaired; the caller commits.
+        """
+        # This company's writers wait until the commit: their deltas then
+        # apply on top of exact values instead of being overwritten by them.
+        # Other tenants keep writing.
+        await session.execute(LOCK_EXCLUSIVE, {"company_id": company_id})
+
+        actual: Dict[RollupKey, List] = defaultdict(lambda: [0, Decimal(0), Decimal(0), Decimal(0)])
+        result = await session.stream(
+            select(
+                Document.company_id, Document.created_at, Document.type, Document.status,
+                Document.client_id, Document.current_totals
+            )
+            .where(Document.company_id == company_id, Document.status != DocStatus.DRAFT)
+            .execution_options(yield_per=5000)
+        )
+        # Same arithmetic as the incremental path, so both agree to the cent
+        async for row in result:
+            key, values = contribution(*row)
+            for i, value in enumerate(values):
+                actual[key][i] += value
+
+        result = await session.execute(
+            select(RevenueRollup).where(RevenueRollup.company_id == company_id).with_for_update()
+        )
+        stored = {
+            (r.company_id, r.month, r.doc_type, r.status, r.client_id): (r.documents, r.total_ht, r.total_tva, r.total_ttc)
+            for r in result.scalars().all()
+        }
+
+        zero = (0, Decimal(0), Decimal(0), Decimal(0))
+        repairs = [
+            ((key, stored.get(key, zero)), (key, tuple(values)))
+            for key, values in actual.items() if stored.get(key) != tuple(values)
+        ] + [((key, values), None) for key, values in stored.items() if key not in actual and values != zero]
+        if repairs:
+            logger.warning(f"Revenue rollups of company {company_id} drifted on {len(repairs)} rows, repairing")
+            await self.apply(session, repairs)
+        return len(repairs)
+
+revenue_rollups = RevenueRollupService()
@@ -0,0 +1,256 @@
+import json
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from redis.exceptions import LockError
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.redis import get_sync_redis
+from app.core.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_LANE = "fairq:priority"
+RING = "fairq:ring" # Round-robin order of tenants with pending batch jobs
+ACTIVE = "fairq:active" # Membership set for RING
+DEFICITS = "fairq:deficit"
+GLOBAL_INFLIGHT = "fairq:inflight"
+LOCK = "fairq:lock"
+
+def _tenant_queue(company_id: int) -> str:
+    return f"fairq:tenant:{company_id}"
+
+def _tenant_inflight(company_id: int) -> str:
+    return f"fairq:inflight:{company_id}"
+
+def _wait_stats(company_id: int) -> str:
+    return f"fairq:wait:{company_id}"
+
+@dataclass
+class TenantState:
+    company_id: int
+    pending: int
+    inflight: int
+    cap: int
+    weight: int
+    deficit: float
+
+def plan_dispatch(tenants: List[TenantState], slots: int) -> Tuple[List[int], Dict[int, float], int]:
+    """
+    Deficit round robin over tenants in ring order. Each visit credits a
+    tenant with its weight; every dispatched job costs 1. Tenants that are idle
+    or at their concurrency cap earn nothing, so credit cannot be hoarded.
+    Returns the company ids to dispatch (in order), the new deficits, and how
+    far to rotate the ring so the next call starts after the last tenant served.
+    """
+    deficits = {t.company_id: t.deficit for t in tenants}
+    pending = {t.company_id: t.pending for t in tenants}
+    inflight = {t.company_id: t.inflight for t in tenants}
+    order: List[int] = []
+    rotate = 0
+    progress = True
+    while slots > 0 and progress:
+        progress = False
+        for index, t in enumerate(tenants):
+            cid = t.company_id
+            if slots == 0:
+                break
+            if pending[cid] == 0 or inflight[cid] >= t.cap:
+                continue
+            deficits[cid] += t.weight
+            while deficits[cid] >= 1 and pending[cid] > 0 and inflight[cid] < t.cap and slots > 0:
+                order.append(cid)
+                deficits[cid] -= 1
+                pending[cid] -= 1
+                inflight[cid] += 1
+                slots -= 1
+                progress = True
+                rotate = index + 1
+            if pending[cid] == 0:
+                deficits[cid] = 0
+    return order, deficits, rotate % len(tenants) if tenants else 0
+
+class FairScheduler:
+    """
+    Tenant-fair front of the generation tasks. Jobs wait in per-company Redis
+    lists (plus a priority lane for interactive single-document generation) and
+    are only handed to Celery when a worker slot is free, so the broker queue
+    stays short and one tenant's batch cannot starve the others.
+    Dispatch runs on submit, on every job completion and periodically from beat.
+    """
+    def limits(self, company_id: int) -> Tuple[int, int]:
+        overrides = settings.FAIR_TENANT_LIMITS.get(company_id, {})
+        return (
+            overrides.get("weight", settings.FAIR_DEFAULT_WEIGHT),
+            overrides.get("concurrency", settings.FAIR_DEFAULT_CONCURRENCY),
+        )
+
+    def submit(self, company_id: int, document_id: int, user_id: int, interactive: bool = False) -> str:
+        return self.submit_many(company_id, [document_id], user_id, interactive)[0]
+
+    def submit_many(self, company_id: int, document_ids: List[int], user_id: int, interactive: bool = False) -> List[str]:
+        r = get_sync_redis()
+        lane = "priority" if interactive else "batch"
+        jobs = [
+            {
+                "job_id": str(uuid.uuid4()), "company_id": company_id, "document_id": document_id,
+                "user_id": user_id, "lane": lane, "enqueued_at": time.time(),
+                # The generation continues the submitting request's trace
+                "traceparent": tracer.current_traceparent(),
+            }
+            for document_id in document_ids
+        ]
+        if not jobs:
+            return []
+        queue = PRIORITY_LANE if interactive else _tenant_queue(company_id)
+        r.rpush(queue, *[json.dumps(j) for j in jobs])
+        if not interactive and r.sadd(ACTIVE, company_id):
+            r.rpush(RING, company_id)
+        self.dispatch()
+        return [j["job_id"] for j in jobs]
+
+    def _start(self, r, job: dict, queue: str) -> bool:
+        """
+        Takes a slot and publishes the job popped from queue. If publishing
+        fails the slot is freed and the job goes back to the head of its
+        queue, to be dispatched again; returns False.
+        """
+        from app.core.celery import celery_app
+        now = time.time()
+        r.zadd(GLOBAL_INFLIGHT, {job["job_id"]: now})
+        r.zadd(_tenant_inflight(job["company_id"]), {job["job_id"]: now})
+        try:
+            celery_app.send_task(
+                "generate_document_version",
+                args=[job["document_id"], job["user_id"]],
+                kwargs={"company_id": job["company_id"], "enqueued_at": job["enqueued_at"], "lane": job["lane"]},
+                task_id=job["job_id"],
+                headers={"traceparent": job["traceparent"]} if job.get("traceparent") else None,
+            )
+        except Exception as e:
+            logger.warning(f"Could not publish generation job {job['job_id']}, requeued: {e}")
+            pipe = r.pipeline()
+            pipe.zrem(GLOBAL_INFLIGHT, job["job_id"])
+            pipe.zrem(_tenant_inflight(job["company_id"]), job["job_id"])
+            pipe.lpush(queue, json.dumps(job))
+            pipe.execute()
+            return False
+        return True
+
+    def _prune_stale(self, r, company_ids: List[int]):
+        # Jobs whose worker died never release their slot
+        cutoff = time.time() - settings.FAIR_INFLIGHT_TIMEOUT_SECONDS
+        r.zremrangebyscore(GLOBAL_INFLIGHT, "-inf", cutoff)
+        for cid in company_ids:
+            r.zremrangebyscore(_tenant_inflight(cid), "-inf", cutoff)
+
+    def dispatch(self) -> int:
+        """
+        Hands as many jobs to Celery as there are free slots. Returns the number
+        dispatched. Only one process dispatches at a time; a concurrent caller
+        returns immediately since the running dispatch will see its jobs.
+        """
+        r = get_sync_redis()
+        lock = r.lock(LOCK, timeout=30, blocking_timeout=0)
+        if not lock.acquire(blocking=False):
+            return 0
+        try:
+            ring = [int(cid) for cid in r.lrange(RING, 0, -1)]
+            self._prune_stale(r, ring)
+            slots = settings.FAIR_GLOBAL_CONCURRENCY - r.zcard(GLOBAL_INFLIGHT)
+            dispatched = 0
+
+            # Interactive jobs first, they only wait for a free slot
+            while slots > 0:
+                raw = r.lpop(PRIORITY_LANE)
+                if raw is None:
+                    break
+                if not self._start(r, json.loads(raw), PRIORITY_LANE):
+                    # Broker unavailable: the next dispatch retries
+                    return dispatched
+                slots -= 1
+                dispatched += 1
+
+            if slots <= 0 or not ring:
+                return dispatched
+
+            pipe = r.pipeline()
+            for cid in ring:
+                pipe.llen(_tenant_queue(cid))
+                pipe.zcard(_tenant_inflight(cid))
+                pipe.hget(DEFICITS, cid)
+            counts = pipe.execute()
+            tenants = []
+            for i, cid in enumerate(ring):
+                weight, cap = self.limits(cid)
+                pending, inflight, deficit = counts[3 * i:3 * i + 3]
+                tenants.append(TenantState(cid, pending, inflight, cap, weight, float(deficit or 0)))
+
+            order, deficits, rotate = plan_dispatch(tenants, slots)
+            for cid in order:
+                raw = r.lpop(_tenant_queue(cid))
+                if raw is not None:
+                    if not self._start(r, json.loads(raw), _tenant_queue(cid)):
+                        # Deficits and the ring stay as they were for the retry
+                        return dispatched
+                    dispatched += 1
+
+            pipe = r.pipeline()
+            for cid, deficit in deficits.items():
+                pipe.hset(DEFICITS, cid, deficit)
+            for _ in range(rotate):
+                pipe.lmove(RING, RING, "LEFT", "RIGHT")
+            pipe.execute()
+
+            for t in tenants:
+                if r.llen(_tenant_queue(t.company_id)) == 0:
+                    r.srem(ACTIVE, t.company_id)
+                    r.lrem(RING, 0, t.company_id)
+                    r.hdel(DEFICITS, t.company_id)
+                    # A job may have been submitted while we were removing it
+                    if r.llen(_tenant_queue(t.company_id)) and r.sadd(ACTIVE, t.company_id):
+                        r.rpush(RING, t.company_id)
+            return dispatched
+        finally:
+            try:
+                lock.release()
+            except LockError:
+                # Expired while we were dispatching, another process may hold it now
+                pass
+
+    def release(self, company_id: int, job_id: str):
+        r = get_sync_redis()
+        r.zrem(GLOBAL_INFLIGHT, job_id)
+        r.zrem(_tenant_inflight(company_id), job_id)
+
+    def record_wait(self, company_id: int, lane: str, wait_seconds: float):
+        wait_ms = int(wait_seconds * 1000)
+        r = get_sync_redis()
+        key = _wait_stats(company_id)
+        pipe = r.pipeline()
+        pipe.hincrby(key, f"{lane}_count", 1)
+        pipe.hincrby(key, f"{lane}_total_ms", wait_ms)
+        pipe.hget(key, f"{lane}_max_ms")
+        _, _, current_max = pipe.execute()
+        if current_max is None or wait_ms > int(current_max):
+            r.hset(key, f"{lane}_max_ms", wait_ms)
+        logger.info(json.dumps({"metric": "generation_queue_wait_ms", "company_id": company_id, "lane": lane, "value": wait_ms}))
+
+    def stats(self, company_id: int) -> Dict[str, Optional[int]]:
+        r = get_sync_redis()
+        pipe = r.pipeline()
+        pipe.llen(_tenant_queue(company_id))
+        pipe.zcard(_tenant_inflight(company_id))
+        pipe.hgetall(_wait_stats(company_id))
+        pending, inflight, waits = pipe.execute()
+        weight, cap = self.limits(company_id)
+        stats = {"pending": pending, "inflight": inflight, "weight": weight, "concurrency": cap}
+        for lane in ("priority", "batch"):
+            count = int(waits.get(f"{lane}_count", 0))
+            stats[f"{lane}_jobs"] = count
+            stats[f"{lane}_avg_wait_ms"] = int(waits[f"{lane}_total_ms"]) // count if count else None
+            stats[f"{lane}_max_wait_ms"] = int(waits[f"{lane}_max_ms"]) if f"{lane}_max_ms" in waits else None
+        return stats
+
+fair_scheduler = FairScheduler()
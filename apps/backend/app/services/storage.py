@@ -1,21 +1,125 @@
-import boto3
-from botocore.exceptions import ClientError
+import io
 from app.core.config import settings
-from typing import Optional
+from app.core.tracing import tracer
+from typing import BinaryIO, Optional
+
+# S3 parts must be at least 5 MiB, except the last one
+MULTIPART_PART_SIZE = 8 * 1024 * 1024
+
+class MultipartWriter(io.BufferedIOBase):
+    """
+    Writable file object that uploads to storage while it is written, one
+    multipart part at a time, so outputs of any size stream out with a
+    single part in memory. Outputs smaller than a part end up as one PUT.
+    Closing completes the upload; leaving its context on an exception
+    aborts it. Writes are blocking: call it from a thread in async code.
+    """
+    def __init__(self, storage: "StorageService", object_name: str, content_type: Optional[str] = None,
+                 part_size: int = MULTIPART_PART_SIZE):
+        self._storage = storage
+        self.object_name = object_name
+        self._content_type = content_type
+        self._part_size = part_size
+        self._buffer = bytearray()
+        self._parts = []
+        self._upload_id = None
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def write(self, data) -> int:
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        data = memoryview(data).cast("B")
+        self._buffer += data
+        self._position += len(data)
+        while len(self._buffer) >= self._part_size:
+            self._upload_part(bytes(self._buffer[:self._part_size]))
+            del self._buffer[:self._part_size]
+        return len(data)
+
+    def _upload_part(self, body: bytes):
+        s3 = self._storage.s3_client
+        bucket = self._storage.bucket_name
+        if self._upload_id is None:
+            extra_args = {"ContentType": self._content_type} if self._content_type else {}
+            response = s3.create_multipart_upload(Bucket=bucket, Key=self.object_name, **extra_args)
+            self._upload_id = response["UploadId"]
+        number = len(self._parts) + 1
+        with tracer.span("s3.upload_part", kind="client", **{"s3.key": self.object_name, "s3.part": number}):
+            response = s3.upload_part(
+                Bucket=bucket, Key=self.object_name, UploadId=self._upload_id, PartNumber=number, Body=body
+            )
+        self._parts.append({"ETag": response["ETag"], "PartNumber": number})
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._upload_id is None:
+                self._storage.upload_file(bytes(self._buffer), self.object_name, self._content_type)
+            else:
+                if self._buffer:
+                    self._upload_part(bytes(self._buffer))
+                with tracer.span("s3.complete_multipart_upload", kind="client", **{"s3.key": self.object_name}):
+                    self._storage.s3_client.complete_multipart_upload(
+                        Bucket=self._storage.bucket_name, Key=self.object_name, UploadId=self._upload_id,
+                        MultipartUpload={"Parts": self._parts},
+                    )
+        except Exception:
+            self.abort()
+            raise
+        self._buffer = bytearray()
+        super().close()
+
+    def abort(self):
+        """
+        Drops the parts already uploaded; nothing is stored.
+        """
+        if self._upload_id is not None:
+            upload_id, self._upload_id = self._upload_id, None
+            self._storage.s3_client.abort_multipart_upload(
+                Bucket=self._storage.bucket_name, Key=self.object_name, UploadId=upload_id
+            )
+        self._buffer = bytearray()
+        super().close()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
 
 class StorageService:
+    """
+    S3/MinIO access. The boto3 client is created on first use so importing
+    this module costs nothing and never touches the network; the bucket is
+    ensured once by the API lifespan hook.
+    """
     def __init__(self):
-        self.s3_client = boto3.client(
-            "s3",
-            endpoint_url=f"http://{settings.MINIO_ENDPOINT}" if not settings.MINIO_USE_SSL else f"https://{settings.MINIO_ENDPOINT}",
-            aws_access_key_id=settings.MINIO_ROOT_USER,
-            aws_secret_access_key=settings.MINIO_ROOT_PASSWORD,
-            region_name="us-east-1", # MinIO doesn't care much about region
-        )
         self.bucket_name = "facturezen"
-        self._ensure_bucket_exists()
+        self._s3_client = None
 
-    def _ensure_bucket_exists(self):
+    @property
+    def s3_client(self):
+        if self._s3_client is None:
+            import boto3
+            from botocore.config import Config
+            self._s3_client = boto3.client(
+                "s3",
+                endpoint_url=f"http://{settings.MINIO_ENDPOINT}" if not settings.MINIO_USE_SSL else f"https://{settings.MINIO_ENDPOINT}",
+                aws_access_key_id=settings.MINIO_ROOT_USER,
+                aws_secret_access_key=settings.MINIO_ROOT_PASSWORD,
+                region_name="us-east-1", # MinIO doesn't care much about region
+                config=Config(connect_timeout=5, retries={"max_attempts": 3}),
+            )
+        return self._s3_client
+
+    def ensure_bucket(self):
         try:
             self.s3_client.head_bucket(Bucket=self.bucket_name)
         except Exception as e:
@@ -23,7 +127,7 @@ class StorageService:
                 self.s3_client.create_bucket(Bucket=self.bucket_name)
             except Exception as inner_e:
                 print(f"Warning: Could not ensure bucket exists: {inner_e}")
-                # We don't raise here to allow test collection to proceed
+                # We don't raise here so the API can start without MinIO
                 # and fail only when actual storage access is needed
 
     def upload_file(self, file_content: bytes, object_name: str, content_type: Optional[str] = None) -> str:
@@ -31,23 +135,54 @@ class StorageService:
         if content_type:
             extra_args["ContentType"] = content_type
             
-        self.s3_client.put_object(
-            Bucket=self.bucket_name,
-            Key=object_name,
-            Body=file_content,
-            **extra_args
-        )
+        with tracer.span("s3.put_object", kind="client", **{"s3.key": object_name, "s3.bytes": len(file_content)}):
+            self.s3_client.put_object(
+                Bucket=self.bucket_name,
+                Key=object_name,
+                Body=file_content,
+                **extra_args
+            )
         return object_name
 
+    def upload_fileobj(self, fileobj: BinaryIO, object_name: str, content_type: Optional[str] = None) -> str:
+        """
+        Streams a file object to storage, in multipart chunks for large files,
+        without loading it in memory.
+        """
+        extra_args = {"ContentType": content_type} if content_type else None
+        with tracer.span("s3.upload_fileobj", kind="client", **{"s3.key": object_name}):
+            self.s3_client.upload_fileobj(fileobj, self.bucket_name, object_name, ExtraArgs=extra_args)
+        return object_name
+
+    def open_writer(self, object_name: str, content_type: Optional[str] = None) -> MultipartWriter:
+        """
+        File object writing straight to storage, see MultipartWriter.
+        """
+        return MultipartWriter(self, object_name, content_type)
+
+    def download_fileobj(self, object_name: str, fileobj: BinaryIO):
+        with tracer.span("s3.download_fileobj", kind="client", **{"s3.key": object_name}):
+            self.s3_client.download_fileobj(self.bucket_name, object_name, fileobj)
+
+    def delete_file(self, object_name: str):
+        with tracer.span("s3.delete_object", kind="client", **{"s3.key": object_name}):
+            self.s3_client.delete_object(Bucket=self.bucket_name, Key=object_name)
+
     def get_file_content(self, object_name: str) -> bytes:
-        response = self.s3_client.get_object(Bucket=self.bucket_name, Key=object_name)
-        return response["Body"].read()
+        with tracer.span("s3.get_object", kind="client", **{"s3.key": object_name}):
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=object_name)
+            return response["Body"].read()
 
-    def get_presigned_url(self, object_name: str, expiration: int = 3600) -> str:
+    def get_presigned_url(self, object_name: str, expiration: int = 3600, filename: Optional[str] = None) -> str:
+        from botocore.exceptions import ClientError
+        params = {"Bucket": self.bucket_name, "Key": object_name}
+        if filename:
+            # Name the browser saves the file under
+            params["ResponseContentDisposition"] = f'attachment; filename="{filename}"'
         try:
             response = self.s3_client.generate_presigned_url(
                 "get_object",
-                Params={"Bucket": self.bucket_name, "Key": object_name},
+                Params=params,
                 ExpiresIn=expiration,
             )
         except ClientError as e:
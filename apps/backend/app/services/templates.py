@@ -1,39 +1,137 @@
-from docxtpl import DocxTemplate
 import io
 import re
-from typing import Set, Dict, Any
+from collections import OrderedDict
+from typing import Set, Dict, Any, Optional, Tuple
+from app.core.config import settings
+from app.services.docx_fast import FastDocxPlan, build_plan
+
+RENDER_MODE_FAST = "fast"
+RENDER_MODE_DOCXTPL = "docxtpl"
+
+# Set by the worker at generation (see tasks.documents), never in document data
+INJECTED_VARIABLES = {"doc_number", "date"}
+
+# How a template uses a variable, from its jinja syntax tree
+SHAPE_ARRAY = "array" # {% for x in var %}
+SHAPE_OBJECT = "object" # {{ var.attr }} / {{ var["key"] }}
+SHAPE_SCALAR = "scalar" # {{ var }}
+SHAPE_TEST = "test" # Only in {% if var %}: may be missing
+
+def _usages(node, usages: Dict[str, Set[str]], in_test: bool = False):
+    from jinja2 import nodes
+
+    if isinstance(node, nodes.Name):
+        usages.setdefault(node.name, set()).add(SHAPE_TEST if in_test else "other")
+        return
+    if isinstance(node, nodes.For) and isinstance(node.iter, nodes.Name):
+        usages.setdefault(node.iter.name, set()).add(SHAPE_ARRAY)
+        children = [child for child in node.iter_child_nodes() if child is not node.iter]
+    elif isinstance(node, (nodes.Getattr, nodes.Getitem)) and isinstance(node.node, nodes.Name):
+        usages.setdefault(node.node.name, set()).add(SHAPE_OBJECT)
+        children = [child for child in node.iter_child_nodes() if child is not node.node]
+    elif isinstance(node, nodes.Output):
+        children = []
+        for child in node.nodes:
+            if isinstance(child, nodes.Name):
+                usages.setdefault(child.name, set()).add(SHAPE_SCALAR)
+            else:
+                children.append(child)
+    elif isinstance(node, (nodes.If, nodes.CondExpr)):
+        _usages(node.test, usages, True)
+        children = [child for child in node.iter_child_nodes() if child is not node.test]
+    else:
+        children = node.iter_child_nodes()
+    for child in children:
+        _usages(child, usages, in_test)
+
+def variable_shapes(ast, undeclared: Set[str]) -> Dict[str, Optional[str]]:
+    """
+    Shape of each undeclared variable: array, object or scalar when the
+    template uses it only that way, test when it only appears in
+    conditions, None when usages disagree.
+    """
+    usages: Dict[str, Set[str]] = {}
+    _usages(ast, usages)
+    shapes = {}
+    for name in undeclared:
+        kinds = usages.get(name, set())
+        if kinds == {SHAPE_TEST}:
+            shapes[name] = SHAPE_TEST
+            continue
+        # Filter arguments, comparisons... tell nothing about the type
+        typed = kinds - {SHAPE_TEST, "other"}
+        shapes[name] = typed.pop() if len(typed) == 1 else None
+    return shapes
 
 class TemplateEngine:
+    """
+    Renders DOCX templates. Placeholder-only templates (classified at upload)
+    use a precompiled substitution plan; anything else goes through docxtpl.
+    Plans are cached per (template id, version), template files being immutable.
+    """
+    def __init__(self, plan_cache_size: int):
+        self.plan_cache_size = plan_cache_size
+        self._plans: "OrderedDict[Tuple[int, int], Optional[FastDocxPlan]]" = OrderedDict()
+
     @staticmethod
     def extract_variables(docx_content: bytes) -> Set[str]:
         # docxtpl uses jinja2-like syntax {{ variable }}
         # We can use docxtpl's internal get_undeclared_template_variables if accessible 
         # or a simple regex for {{ ... }} 
         # Regex is more reliable for raw DOCX if we don't want to load it fully yet
+        from docxtpl import DocxTemplate # Heavy import, only paid by code that renders
         
         doc = DocxTemplate(io.BytesIO(docx_content))
         return doc.get_undeclared_template_variables()
 
     @staticmethod
-    def generate_json_schema(variables: Set[str]) -> Dict[str, Any]:
+    def extract_variable_shapes(docx_content: bytes) -> Dict[str, Optional[str]]:
+        """
+        Undeclared variables with how the template uses them, see variable_shapes.
+        """
+        from docxtpl import DocxTemplate
+        from jinja2 import Environment, meta
+
+        doc = DocxTemplate(io.BytesIO(docx_content))
+        doc.init_docx()
+        # Same XML as get_undeclared_template_variables: body, headers and footers
+        xml = doc.patch_xml(doc.get_xml())
+        for uri in (doc.HEADER_URI, doc.FOOTER_URI):
+            for _, part in doc.get_headers_footers(uri):
+                xml += doc.patch_xml(doc.get_part_xml(part))
+        ast = Environment().parse(xml)
+        return variable_shapes(ast, meta.find_undeclared_variables(ast))
+
+    @staticmethod
+    def generate_json_schema(variables: Set[str], shapes: Optional[Dict[str, Optional[str]]] = None) -> Dict[str, Any]:
+        """
+        Data schema of a template. Scalars are typed from their name; loop
+        iterables and attribute roots are arrays / objects, variables whose
+        usages disagree are left untyped, and condition-only ones optional.
+        Variables the worker injects are not part of the data.
+        """
+        shapes = shapes or {}
         properties = {}
         required = []
         
-        for var in variables:
-            # Basic mapping logic: 
-            # variables containing 'date' -> string format date
-            # variables containing 'price', 'qty', 'amount' -> number
-            # rest -> string
+        for var in sorted(set(variables) - INJECTED_VARIABLES):
+            shape = shapes.get(var, SHAPE_SCALAR)
+            prop = {"title": var.replace("_", " ").capitalize()}
+            if shape == SHAPE_ARRAY:
+                prop["type"] = "array"
+            elif shape == SHAPE_OBJECT:
+                prop["type"] = "object"
+            elif shape == SHAPE_SCALAR:
+                # Basic mapping logic: 
+                # variables containing 'price', 'qty', 'amount' -> number
+                # rest -> string
+                prop["type"] = "string"
+                if any(k in var.lower() for k in ["qty", "quantite", "quantity", "price", "amount", "prix", "montant"]):
+                    prop["type"] = "number"
             
-            var_type = "string"
-            if any(k in var.lower() for k in ["qty", "quantite", "quantity", "price", "amount", "prix", "montant"]):
-                var_type = "number"
-            
-            properties[var] = {
-                "type": var_type,
-                "title": var.replace("_", " ").capitalize()
-            }
-            required.append(var)
+            properties[var] = prop
+            if shape != SHAPE_TEST:
+                required.append(var)
             
         return {
             "type": "object",
@@ -41,10 +139,31 @@ class TemplateEngine:
             "required": required
         }
 
-    async def render_document(self, docx_content: bytes, data: Dict[str, Any]) -> bytes:
+    @staticmethod
+    def classify(docx_content: bytes) -> str:
+        return RENDER_MODE_FAST if build_plan(docx_content) is not None else RENDER_MODE_DOCXTPL
+
+    def _plan(self, template, docx_content: bytes) -> Optional[FastDocxPlan]:
+        key = (template.id, template.version)
+        if key in self._plans:
+            self._plans.move_to_end(key)
+            return self._plans[key]
+        plan = build_plan(docx_content)
+        self._plans[key] = plan
+        while len(self._plans) > self.plan_cache_size:
+            self._plans.popitem(last=False)
+        return plan
+
+    async def render_document(self, docx_content: bytes, data: Dict[str, Any], template=None) -> bytes:
         """
-        Renders a DOCX template with provided data using docxtpl.
+        Renders a DOCX template with provided data. Pass the Template to allow
+        the fast path; data needing docxtpl's listing handling falls back to it.
         """
+        if template is not None and template.render_mode == RENDER_MODE_FAST:
+            plan = self._plan(template, docx_content)
+            if plan is not None and plan.can_render(data):
+                return plan.render(docx_content, data)
+
         from docxtpl import DocxTemplate
         import io
 
@@ -55,4 +174,4 @@ class TemplateEngine:
         doc.save(output)
         return output.getvalue()
 
-template_engine = TemplateEngine()
+template_engine = TemplateEngine(plan_cache_size=settings.TEMPLATE_PLAN_CACHE_SIZE)
@@ -0,0 +1,54 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Tuple
+import fastjsonschema
+from app.core.config import settings
+from app.services.templates import INJECTED_VARIABLES
+
+# (template_id, template_version, partial)
+ValidatorKey = Tuple[int, int, bool]
+
+class DocumentValidationService:
+    """
+    Validates document data against the JSON schema of its template.
+    Schemas are compiled to Python code once per (template id, version) and
+    kept in an LRU: a template version is immutable, so a compiled validator
+    never goes stale and validating costs microseconds.
+    Drafts are checked in partial mode (types only, fields may be missing);
+    the full schema is enforced before a document may be generated.
+    """
+    def __init__(self, cache_size: int):
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[ValidatorKey, Callable]" = OrderedDict()
+
+    def _validator(self, template, partial: bool) -> Callable:
+        key = (template.id, template.version, partial)
+        validator = self._cache.get(key)
+        if validator is not None:
+            self._cache.move_to_end(key)
+            return validator
+        schema = dict(template.schema_json or {})
+        # Schemas stored before they left out the variables set by the worker
+        if "properties" in schema:
+            schema["properties"] = {k: v for k, v in schema["properties"].items() if k not in INJECTED_VARIABLES}
+        if partial:
+            schema.pop("required", None)
+        elif "required" in schema:
+            schema["required"] = [k for k in schema["required"] if k not in INJECTED_VARIABLES]
+        validator = fastjsonschema.compile(schema)
+        self._cache[key] = validator
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return validator
+
+    def validate(self, template, data: Dict[str, Any], partial: bool = False) -> List[str]:
+        """
+        Returns the validation errors, empty when the data is valid.
+        template is anything with id, version and schema_json (model or row).
+        """
+        try:
+            self._validator(template, partial)(data)
+        except fastjsonschema.JsonSchemaValueException as e:
+            return [e.message]
+        return []
+
+document_validation = DocumentValidationService(cache_size=settings.VALIDATOR_CACHE_SIZE)
@@ -0,0 +1,133 @@
+import json
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import jsonpatch
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.business import DocumentVersion
+
+# (version_number, snapshot_data, snapshot_delta)
+VersionRow = Tuple[int, Optional[dict], Optional[list]]
+
+class VersionHistoryService:
+    """
+    Stores document versions as periodic full snapshots plus JSON-patch deltas
+    against the previous version, and rebuilds any version on read.
+    Versions are immutable, so reconstructed snapshots are kept in an LRU keyed
+    by (document_id, version_number). Cached dicts are shared: treat them as read-only.
+    """
+    def __init__(self, snapshot_interval: int, cache_size: int):
+        self.snapshot_interval = snapshot_interval
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[int, int], dict]" = OrderedDict()
+
+    def _cache_get(self, key: Tuple[int, int]) -> Optional[dict]:
+        data = self._cache.get(key)
+        if data is not None:
+            self._cache.move_to_end(key)
+        return data
+
+    def _cache_put(self, key: Tuple[int, int], data: dict):
+        self._cache[key] = data
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def remember(self, document_id: int, version_number: int, data: dict):
+        """
+        Caches the data of a version once its transaction has committed. A
+        rolled back generation must not leave an entry behind: the retry
+        reuses the version number.
+        """
+        self._cache_put((document_id, version_number), data)
+
+    def is_snapshot_version(self, version_number: int) -> bool:
+        return (version_number - 1) % self.snapshot_interval == 0
+
+    @staticmethod
+    async def allocate_version_number(session: AsyncSession, document_id: int) -> int:
+        """
+        Next version number for a document. The caller must hold the document
+        row lock (SELECT ... FOR UPDATE) so concurrent generations serialize;
+        the unique constraint on (document_id, version_number) is the backstop.
+        """
+        result = await session.execute(
+            select(func.coalesce(func.max(DocumentVersion.version_number), 0))
+            .where(DocumentVersion.document_id == document_id)
+        )
+        return result.scalar_one() + 1
+
+    async def build_storage(
+        self, session: AsyncSession, document_id: int, version_number: int, data: dict
+    ) -> Dict[str, Any]:
+        """
+        Returns the snapshot_data / snapshot_delta column values for a new
+        version. Call remember after the commit to cache it.
+        """
+        if not self.is_snapshot_version(version_number):
+            previous = await self.get_snapshot(session, document_id, version_number - 1)
+            if previous is not None:
+                delta = jsonpatch.make_patch(previous, data).patch
+                # A patch rewriting most of the document is no saving
+                if len(json.dumps(delta)) < len(json.dumps(data)):
+                    return {"snapshot_data": None, "snapshot_delta": delta}
+        return {"snapshot_data": data, "snapshot_delta": None}
+
+    def reconstruct(self, document_id: int, rows: List[VersionRow]) -> Dict[int, dict]:
+        """
+        Rebuilds every version in rows, which must be ordered by version number
+        and start at a full snapshot (or at a version already in cache).
+        """
+        snapshots: Dict[int, dict] = {}
+        current: Optional[dict] = None
+        for number, snapshot, delta in rows:
+            cached = self._cache_get((document_id, number))
+            if cached is not None:
+                current = cached
+            elif snapshot is not None:
+                current = snapshot
+            elif current is not None:
+                current = jsonpatch.apply_patch(current, delta, in_place=False)
+            else:
+                raise ValueError(f"Version {number} of document {document_id} has no base snapshot")
+            self._cache_put((document_id, number), current)
+            snapshots[number] = current
+        return snapshots
+
+    async def get_snapshot(self, session: AsyncSession, document_id: int, version_number: int) -> Optional[dict]:
+        cached = self._cache_get((document_id, version_number))
+        if cached is not None:
+            return cached
+
+        # Only read the chain from the closest full snapshot
+        base = (
+            select(func.max(DocumentVersion.version_number))
+            .where(
+                DocumentVersion.document_id == document_id,
+                DocumentVersion.version_number <= version_number,
+                DocumentVersion.snapshot_data.isnot(None)
+            )
+            .scalar_subquery()
+        )
+        result = await session.execute(
+            select(DocumentVersion.version_number, DocumentVersion.snapshot_data, DocumentVersion.snapshot_delta)
+            .where(
+                DocumentVersion.document_id == document_id,
+                DocumentVersion.version_number <= version_number,
+                DocumentVersion.version_number >= base
+            )
+            .order_by(DocumentVersion.version_number)
+        )
+        rows = [tuple(r) for r in result.all()]
+        if not rows:
+            return None
+        return self.reconstruct(document_id, rows).get(version_number)
+
+    def diff(self, source: dict, target: dict) -> List[Dict[str, Any]]:
+        return jsonpatch.make_patch(source, target).patch
+
+version_history = VersionHistoryService(
+    snapshot_interval=settings.VERSION_SNAPSHOT_INTERVAL,
+    cache_size=settings.VERSION_CACHE_SIZE
+)
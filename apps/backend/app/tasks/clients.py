@@ -0,0 +1,59 @@
+import asyncio
+import csv
+import io
+import tempfile
+from celery import shared_task
+from app.core.database import engine
+from app.core.config import settings
+from app.services.client_import import REPORT_HEADER, import_clients
+from app.services.change_counters import change_counters
+from app.services.jobs import job_tracker
+from app.services.storage import storage_service
+
+@shared_task(name="import_clients", bind=True)
+def import_clients_task(self, company_id: int, object_name: str, fmt: str):
+    """
+    Imports an uploaded client file. The job id is the Celery task id; its
+    download is the per-row error report.
+    """
+    job_id = self.request.id
+    job_tracker.start(job_id)
+    try:
+        result = asyncio.run(_import_clients(job_id, company_id, object_name, fmt))
+    except Exception as e:
+        job_tracker.fail(job_id, str(e))
+        raise
+    finally:
+        storage_service.delete_file(object_name)
+    job_tracker.complete(job_id, result)
+    return result
+
+async def _import_clients(job_id: str, company_id: int, object_name: str, fmt: str) -> dict:
+    with tempfile.TemporaryFile() as source, tempfile.TemporaryFile() as report_file:
+        await asyncio.to_thread(storage_service.download_fileobj, object_name, source)
+        size = source.tell()
+        source.seek(0)
+
+        report_text = io.TextIOWrapper(report_file, encoding="utf-8", newline="")
+        report = csv.writer(report_text)
+        report.writerow(REPORT_HEADER)
+
+        def on_chunk():
+            # Progress in bytes of the source file read so far
+            job_tracker.progress(job_id, min(source.tell(), size))
+
+        async with engine.begin() as conn:
+            counts = await import_clients(
+                conn, company_id, source, fmt, report, settings.CLIENT_IMPORT_CHUNK_SIZE, on_chunk
+            )
+        job_tracker.progress(job_id, size)
+
+        report_text.flush()
+        report_text.detach()
+        report_file.seek(0)
+        report_name = f"imports/{company_id}/{job_id}-errors.csv"
+        await asyncio.to_thread(storage_service.upload_fileobj, report_file, report_name, "text/csv")
+
+    if counts["imported"]:
+        change_counters.bump_sync(company_id, "clients")
+    return {"object_name": report_name, **counts}
@@ -1,87 +1,298 @@
 import asyncio
+import logging
+import tempfile
+import time
+from collections import deque
 from celery import shared_task
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import engine
-from app.models.business import Document, DocumentVersion, Template, DocStatus
+from app.core.config import settings
+from app.core.tracing import tracer
+from app.models.business import Client, Document, DocumentVersion, Template, DocStatus, DocType
+from app.models.core import Company
 from app.services.numbering import numbering_service
 from app.services.storage import storage_service
 from app.services.templates import template_engine
-from sqlalchemy import select
+from app.services.events import publish_event
+from app.services.versioning import version_history
+from app.services.change_counters import change_counters
+from app.services.scheduler import fair_scheduler
+from app.services.facturx import facturx_service
+from app.services.jobs import job_tracker
+from app.services.validation import document_validation
+from app.services.pdf_merge import PdfMergeError, PdfStreamMerger
+from app.services.rollups import revenue_rollups, document_contribution
+from app.services.aging import due_date_for, amount_due_for
+from sqlalchemy import select, update
 import io
 
-@shared_task(name="generate_document_version")
-def generate_document_version_task(document_id: int, user_id: int):
+logger = logging.getLogger(__name__)
+
+GENERATION_EVENT = "document.generation"
+
+@shared_task(name="generate_document_version", bind=True)
+def generate_document_version_task(
+    self, document_id: int, user_id: int,
+    company_id: int = None, enqueued_at: float = None, lane: str = None
+):
     """
     Background task to generate a DOCX and PDF from a document draft.
+    Dispatched by the fair scheduler, which passes the scheduling metadata.
+    """
+    if enqueued_at is not None:
+        fair_scheduler.record_wait(company_id, lane, time.time() - enqueued_at)
+    try:
+        return asyncio.run(_generate_document_version(document_id, user_id, job_id=self.request.id))
+    finally:
+        if company_id is not None:
+            fair_scheduler.release(company_id, self.request.id)
+            fair_scheduler.dispatch()
+
+@shared_task(name="dispatch_generation")
+def dispatch_generation_task():
+    return fair_scheduler.dispatch()
+
+@shared_task(name="merge_document_pdfs", bind=True)
+def merge_document_pdfs_task(self, company_id: int, version_ids: list):
+    """
+    Merges the PDFs of the given document versions, in order, into one PDF
+    for mailing runs. The job id is the Celery task id.
     """
-    return asyncio.run(_generate_document_version(document_id, user_id))
+    job_id = self.request.id
+    job_tracker.start(job_id)
+    try:
+        result = asyncio.run(_merge_document_pdfs(job_id, company_id, version_ids))
+    except Exception as e:
+        job_tracker.fail(job_id, str(e))
+        raise
+    job_tracker.complete(job_id, result)
+    return result
 
-async def _generate_document_version(document_id: int, user_id: int):
+async def _generate_document_version(document_id: int, user_id: int, job_id: str = None):
     async with AsyncSession(engine) as session:
         # 1. Fetch document and template
+        # Row lock serializes concurrent generations of the same document
         result = await session.execute(
-            select(Document).where(Document.id == document_id)
+            select(Document).where(Document.id == document_id).with_for_update()
         )
         doc = result.scalar_one_or_none()
         if not doc:
             return {"error": "Document not found"}
 
-        result = await session.execute(
-            select(Template).where(Template.id == doc.template_id)
-        )
-        template = result.scalar_one_or_none()
-        
-        # 2. Assign Document Number
-        doc_number = await numbering_service.get_next_number(session, doc.company_id, doc.type)
-        
-        # 3. Render DOCX
-        # Get template content from MinIO
-        # Note: docx_source_url is currently a presigned URL or object name. 
-        # In our implementation_plan, we use storage_service.get_file_content(object_name)
-        # Let's assume for now we can get the object name from the URL or store it.
-        # For simplicity, let's extract the object name from the URL if needed, 
-        # but better to have it in the model. (We'll adjust models/business.py later if needed)
-        
-        # Mocking for now: extract name from URL
-        object_name = template.docx_source_url.split("?")[0].split("/")[-1]
-        if "templates/" not in object_name:
-             object_name = f"templates/{doc.company_id}/{object_name}"
-             
-        docx_content = await storage_service.get_file_content(object_name)
-        
-        # Render
-        render_data = {**doc.current_data, "doc_number": doc_number, "date": doc.created_at.strftime("%d/%m/%Y")}
-        final_docx = await template_engine.render_document(docx_content, render_data)
-        
-        # 4. Upload DOCX to MinIO
-        docx_path = f"documents/{doc.company_id}/{doc_number}.docx"
-        await storage_service.upload_file(docx_path, final_docx)
-        
-        # 5. Convert to PDF via Gotenberg
-        from app.services.pdf import pdf_service
+        # Keep plain values: the ORM object is expired by the commit
+        company_id = doc.company_id
+        event = {"job_id": job_id, "document_id": doc.id}
+        publish_event(company_id, GENERATION_EVENT, {**event, "state": "STARTED"})
         try:
-            pdf_content = await pdf_service.convert_docx_to_pdf(final_docx)
-            pdf_path = f"documents/{doc.company_id}/{doc_number}.pdf"
-            await storage_service.upload_file(pdf_path, pdf_content)
+            with tracer.span("generation", **{"document.id": document_id, "company.id": company_id}):
+                result = await _render_and_store(session, doc, user_id)
         except Exception as e:
-            # For now, log and continue, or handle as needed
-            print(f"Error converting to PDF: {e}")
-            pdf_path = None
-
-        # 6. Create Version
-        version = DocumentVersion(
-            document_id=doc.id,
-            version_number=1, 
-            doc_number=doc_number,
-            snapshot_data=doc.current_data,
-            docx_url=docx_path,
-            pdf_url=pdf_path or docx_path, # Fallback to docx if pdf fails
-            generated_by=user_id
+            publish_event(company_id, GENERATION_EVENT, {**event, "state": "FAILURE", "error": str(e)})
+            raise
+        change_counters.bump_sync(company_id, "documents")
+        publish_event(company_id, GENERATION_EVENT, {**event, "state": "SUCCESS", **result})
+        return {"status": "success", "doc_number": result["doc_number"]}
+
+async def _render_and_store(session: AsyncSession, doc: Document, user_id: int) -> dict:
+    result = await session.execute(
+        select(Template).where(Template.id == doc.template_id)
+    )
+    template = result.scalar_one_or_none()
+
+    # Checked before numbering so a bad document never consumes a number
+    with tracer.span("generation.validate"):
+        errors = document_validation.validate(template, doc.current_data or {})
+    if errors:
+        raise ValueError(f"Document data does not match the template schema: {errors[0]}")
+    
+    # 2. Assign Document Number
+    with tracer.span("generation.numbering"):
+        doc_number = await numbering_service.get_next_number(session, doc.company_id, doc.type)
+    
+    # 3. Render DOCX
+    # Get template content from MinIO
+    # Note: docx_source_url is currently a presigned URL or object name. 
+    # In our implementation_plan, we use storage_service.get_file_content(object_name)
+    # Let's assume for now we can get the object name from the URL or store it.
+    # For simplicity, let's extract the object name from the URL if needed, 
+    # but better to have it in the model. (We'll adjust models/business.py later if needed)
+    
+    # Mocking for now: extract name from URL
+    object_name = template.docx_source_url.split("?")[0].split("/")[-1]
+    if "templates/" not in object_name:
+         object_name = f"templates/{doc.company_id}/{object_name}"
+         
+    with tracer.span("generation.fetch_template"):
+        docx_content = storage_service.get_file_content(object_name)
+    
+    # Render
+    render_data = {**doc.current_data, "doc_number": doc_number, "date": doc.created_at.strftime("%d/%m/%Y")}
+    with tracer.span("generation.render", **{"template.render_mode": template.render_mode}):
+        final_docx = await template_engine.render_document(docx_content, render_data, template)
+    
+    # 4. Upload DOCX to MinIO
+    docx_path = f"documents/{doc.company_id}/{doc_number}.docx"
+    with tracer.span("generation.store_docx"):
+        storage_service.upload_file(final_docx, docx_path)
+    
+    # 5. Convert to PDF via Gotenberg
+    # Invoices are converted straight to PDF/A-3 so Factur-X needs no second pass
+    from app.services.pdf import pdf_service
+    is_einvoice = settings.FACTURX_ENABLED and doc.type == DocType.INVOICE
+    facturx_tags = None
+    try:
+        with tracer.span("generation.convert_pdf"):
+            pdf_content = await pdf_service.convert_docx_to_pdf(final_docx, pdfa="PDF/A-3b" if is_einvoice else None)
+        if is_einvoice:
+            with tracer.span("generation.facturx"):
+                pdf_content, facturx_tags = await _embed_facturx(session, doc, doc_number, pdf_content)
+        pdf_path = f"documents/{doc.company_id}/{doc_number}.pdf"
+        with tracer.span("generation.store_pdf"):
+            storage_service.upload_file(pdf_content, pdf_path)
+    except Exception as e:
+        # For now, log and continue, or handle as needed
+        print(f"Error converting to PDF: {e}")
+        pdf_path = None
+
+    # 6. Create Version
+    with tracer.span("generation.version"):
+        version_number = await version_history.allocate_version_number(session, doc.id)
+        storage = await version_history.build_storage(session, doc.id, version_number, doc.current_data)
+    version = DocumentVersion(
+        document_id=doc.id,
+        version_number=version_number,
+        doc_number=doc_number,
+        **storage,
+        docx_url=docx_path,
+        pdf_url=pdf_path or docx_path, # Fallback to docx if pdf fails
+        generated_by=user_id
+    )
+    if facturx_tags is not None:
+        doc.extra_metadata = {**(doc.extra_metadata or {}), "facturx": facturx_tags}
+        version.extra_metadata = doc.extra_metadata
+    session.add(version)
+    
+    # Receivables aging reads these instead of the data and totals
+    if doc.type == DocType.INVOICE:
+        doc.due_date = due_date_for(doc.created_at, doc.current_data, settings.INVOICE_PAYMENT_TERMS_DAYS)
+        doc.amount_due = amount_due_for(doc.current_totals)
+
+    # Update doc status
+    before = document_contribution(doc)
+    doc.status = DocStatus.GENERATED
+    await revenue_rollups.record(session, before, document_contribution(doc))
+    
+    document_id, data = doc.id, doc.current_data
+    with tracer.span("generation.commit"):
+        await session.flush()
+        version_id = version.id
+        await session.commit()
+    version_history.remember(document_id, version_number, data)
+    return {"doc_number": doc_number, "version_id": version_id}
+
+async def _embed_facturx(session: AsyncSession, doc: Document, doc_number: str, pdf_content: bytes):
+    """
+    Factur-X stage: builds the CII XML from the document data and totals and
+    embeds it into the converted PDF. Returns the PDF and the Factur-X tags.
+    """
+    company = await session.get(Company, doc.company_id)
+    client = await session.get(Client, doc.client_id)
+    data = doc.current_data or {}
+    parties = [
+        {
+            "name": party.name,
+            "registration_number": party.registration_number,
+            "vat_number": party.vat_number,
+            "country": data.get(f"{role}_country"),
+        }
+        for role, party in (("seller", company), ("buyer", client))
+    ]
+    try:
+        return facturx_service.process(
+            pdf_content, doc_number, doc.created_at, data, doc.current_totals or {}, *parties
         )
-        session.add(version)
-        
-        # Update doc status
-        doc.status = DocStatus.GENERATED
-        
+    except Exception as e:
+        # The invoice PDF itself is fine, only the e-invoice part is missing
+        logger.warning(f"Factur-X embedding failed for {doc_number}: {e}")
+        return pdf_content, {"profile": facturx_service.profile, "valid": False, "errors": [str(e)]}
+
+async def _prefetch(items, fetch, window: int):
+    """
+    Yields fetch(item) results in order while keeping up to window fetches
+    running ahead, so downloads overlap without buffering everything.
+    """
+    it = iter(items)
+    pending = deque()
+    try:
+        for item in it:
+            pending.append(asyncio.ensure_future(fetch(item)))
+            if len(pending) >= window:
+                break
+        while pending:
+            result = await pending.popleft()
+            item = next(it, None)
+            if item is not None:
+                pending.append(asyncio.ensure_future(fetch(item)))
+            yield result
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def _merge_document_pdfs(job_id: str, company_id: int, version_ids: list) -> dict:
+    from app.services.pdf import pdf_service
+
+    async with AsyncSession(engine) as session:
+        result = await session.execute(
+            select(DocumentVersion.id, DocumentVersion.doc_number, DocumentVersion.pdf_url, DocumentVersion.docx_url)
+            .join(Document, Document.id == DocumentVersion.document_id)
+            .where(DocumentVersion.id.in_(version_ids), Document.company_id == company_id)
+        )
+        found = {row.id: row for row in result.all()}
+        rows = [found[vid] for vid in version_ids if vid in found]
+        skipped = [{"version_id": vid, "error": "Version not found"} for vid in version_ids if vid not in found]
+        converted = {}
+
+        async def fetch(row):
+            # Existing PDFs are reused; versions whose conversion failed at
+            # generation are converted once and their PDF kept for next time
+            try:
+                if row.pdf_url != row.docx_url:
+                    return row, await asyncio.to_thread(storage_service.get_file_content, row.pdf_url), None
+                docx = await asyncio.to_thread(storage_service.get_file_content, row.docx_url)
+                pdf = await pdf_service.convert_docx_to_pdf(docx)
+                pdf_path = f"documents/{company_id}/{row.doc_number}.pdf"
+                await asyncio.to_thread(storage_service.upload_file, pdf, pdf_path, "application/pdf")
+                converted[row.id] = pdf_path
+                return row, pdf, None
+            except Exception as e:
+                return row, None, str(e)
+
+        with tempfile.TemporaryFile() as out:
+            merger = PdfStreamMerger(out)
+            merged = 0
+            done = len(skipped)
+            async for row, pdf, error in _prefetch(rows, fetch, settings.MERGE_FETCH_CONCURRENCY):
+                if error is None:
+                    try:
+                        await asyncio.to_thread(merger.append, pdf)
+                        merged += 1
+                    except PdfMergeError as e:
+                        error = str(e)
+                if error is not None:
+                    skipped.append({"version_id": row.id, "error": error})
+                done += 1
+                job_tracker.progress(job_id, done)
+            if not merged:
+                raise PdfMergeError("None of the requested versions has a usable PDF")
+            pages = merger.close()
+            out.seek(0)
+            object_name = f"merged/{company_id}/{job_id}.pdf"
+            await asyncio.to_thread(storage_service.upload_fileobj, out, object_name, "application/pdf")
+
+        for version_id, pdf_path in converted.items():
+            await session.execute(
+                update(DocumentVersion).where(DocumentVersion.id == version_id).values(pdf_url=pdf_path)
+            )
         await session.commit()
-        return {"status": "success", "doc_number": doc_number}
+
+    return {"object_name": object_name, "pages": pages, "documents": merged, "skipped": skipped}
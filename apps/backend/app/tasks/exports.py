@@ -0,0 +1,239 @@
+import asyncio
+import contextlib
+import csv
+import io
+import logging
+import zipfile
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Optional
+from celery import shared_task
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import engine
+from app.core.config import settings
+from app.models.business import Client, Document, DocumentVersion, DocStatus, DocType
+from app.models.core import Company
+from app.services.columnar import FORMATS as COLUMNAR_FORMATS, export_tables
+from app.services.exports import CSV_HEADERS, FEC_HEADERS, company_folder, export_service, fec_filename
+from app.services.jobs import job_tracker
+from app.services.storage import storage_service
+
+logger = logging.getLogger(__name__)
+
+# Issued documents; drafts and cancelled ones are not accounting entries
+EXPORTED_STATUSES = (DocStatus.GENERATED, DocStatus.SENT, DocStatus.PAID)
+
+PART_DONE = "done"
+PART_FAILED = "failed"
+
+CONTENT_TYPES = {"fec": "text/plain; charset=utf-8", "csv": "text/csv; charset=utf-8"}
+
+class ExportError(Exception):
+    pass
+
+@shared_task(name="export_accountant_companies", bind=True)
+def export_accountant_companies_task(
+    self, owner_company_id: int, company_ids: list, period_start: str, period_end: str, formats: list
+):
+    """
+    FEC and CSV files of each company for the period, in one ZIP. The job
+    id is the Celery task id; a resumed job keeps it and only redoes the
+    companies that are not done.
+    """
+    job_id = self.request.id
+    job_tracker.start(job_id)
+    try:
+        result = asyncio.run(_export_companies(
+            job_id, owner_company_id, company_ids,
+            date.fromisoformat(period_start), date.fromisoformat(period_end), formats
+        ))
+    except Exception as e:
+        job_tracker.fail(job_id, str(e))
+        raise
+    job_tracker.complete(job_id, result)
+    return result
+
+@shared_task(name="export_documents", bind=True)
+def export_documents_task(
+    self, company_id: int, fmt: str, period_start: str = None, period_end: str = None, since: str = None
+):
+    """
+    Export of one company: its accounting CSV, its FEC or both in a ZIP
+    ("bundle"), or its tables as Parquet / Arrow IPC. The job id is the
+    Celery task id.
+    """
+    job_id = self.request.id
+    job_tracker.start(job_id)
+    try:
+        result = asyncio.run(_export_documents(
+            job_id, company_id, fmt,
+            date.fromisoformat(period_start) if period_start else None,
+            date.fromisoformat(period_end) if period_end else None,
+            datetime.fromisoformat(since) if since else None,
+        ))
+    except Exception as e:
+        job_tracker.fail(job_id, str(e))
+        raise
+    job_tracker.complete(job_id, result)
+    return result
+
+async def _export_documents(
+    job_id: str, company_id: int, fmt: str, period_start: Optional[date], period_end: Optional[date],
+    since: Optional[datetime] = None
+) -> dict:
+    if fmt in COLUMNAR_FORMATS:
+        object_name = f"exports/{company_id}/{job_id}.zip"
+        with storage_service.open_writer(object_name, "application/zip") as out:
+            async with AsyncSession(engine) as session:
+                exported = await export_tables(
+                    session, company_id, fmt, out, asyncio.to_thread, since, period_start, period_end,
+                    batch_size=settings.COLUMNAR_EXPORT_BATCH_SIZE,
+                    overlap=timedelta(seconds=settings.EXPORT_WATERMARK_OVERLAP_SECONDS),
+                )
+            await asyncio.to_thread(out.close)
+        job_tracker.progress(job_id, 1)
+        return {"object_name": object_name, "filename": f"{fmt}_{company_id}.zip", **exported}
+    if fmt == "bundle":
+        keys = {f: f"exports/parts/{job_id}/{company_id}/{f}" for f in ("fec", "csv")}
+        exported = await export_company(company_id, period_start, period_end, keys)
+        object_name = f"exports/{company_id}/{job_id}.zip"
+        await asyncio.to_thread(zip_parts, object_name, list(exported["files"].items()))
+        filename = f"{next(iter(exported['files'])).split('/')[0]}.zip"
+    else:
+        object_name = f"exports/{company_id}/{job_id}.{'txt' if fmt == 'fec' else 'csv'}"
+        exported = await export_company(company_id, period_start, period_end, {fmt: object_name})
+        filename = next(iter(exported["files"])).split("/")[-1]
+    job_tracker.progress(job_id, 1)
+    return {"object_name": object_name, "filename": filename, "documents": exported["documents"]}
+
+async def _export_companies(
+    job_id: str, owner_company_id: int, company_ids: list, period_start: date, period_end: date, formats: list
+) -> dict:
+    parts = job_tracker.parts(job_id)
+    todo = [cid for cid in company_ids if parts.get(str(cid), {}).get("status") != PART_DONE]
+    done = len(company_ids) - len(todo)
+    if done:
+        job_tracker.progress(job_id, done)
+
+    # Each company holds a connection while it is read, so this bounds DB load
+    semaphore = asyncio.Semaphore(settings.ACCOUNTANT_EXPORT_CONCURRENCY)
+
+    async def one(company_id: int) -> bool:
+        nonlocal done
+        keys = {fmt: f"exports/parts/{job_id}/{company_id}/{fmt}" for fmt in formats}
+        async with semaphore:
+            try:
+                state = await export_company(company_id, period_start, period_end, keys)
+                state["status"] = PART_DONE
+            except Exception as e:
+                logger.warning(f"Export {job_id} of company {company_id} failed: {e}")
+                state = {"status": PART_FAILED, "error": str(e)}
+        job_tracker.set_part(job_id, str(company_id), state)
+        if state["status"] == PART_DONE:
+            done += 1
+            job_tracker.progress(job_id, done)
+        return state["status"] == PART_DONE
+
+    results = await asyncio.gather(*(one(company_id) for company_id in todo))
+    failed = results.count(False)
+    if failed:
+        # Finished parts stay in storage for the resumed job
+        raise ExportError(f"{failed} of {len(company_ids)} companies failed, resume the job to retry them")
+
+    parts = job_tracker.parts(job_id)
+    entries = [item for company_id in company_ids for item in parts[str(company_id)]["files"].items()]
+    object_name = f"exports/{owner_company_id}/{job_id}.zip"
+    await asyncio.to_thread(zip_parts, object_name, entries)
+    return {
+        "object_name": object_name,
+        "companies": len(company_ids),
+        "documents": sum(parts[str(company_id)]["documents"] for company_id in company_ids),
+    }
+
+def zip_parts(object_name: str, entries: list):
+    """
+    Streams the (name in the ZIP, storage key) entries into one ZIP written
+    to storage as it grows, then deletes the parts. Blocking.
+    """
+    with storage_service.open_writer(object_name, "application/zip") as out:
+        with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+            for arcname, key in entries:
+                with zf.open(arcname, "w", force_zip64=True) as entry:
+                    storage_service.download_fileobj(key, entry)
+    for _, key in entries:
+        storage_service.delete_file(key)
+
+def _write_documents(writers: dict, rows):
+    for row in rows:
+        doc = {**row._mapping, "current_totals": row.current_totals or {}}
+        # FEC entries are sales journal lines: invoices only
+        if "fec" in writers and row.type == DocType.INVOICE:
+            writers["fec"].writerows(export_service.fec_rows(doc))
+        if "csv" in writers:
+            writers["csv"].writerows(export_service.accounting_csv_rows(doc))
+
+async def export_company(
+    company_id: int, period_start: Optional[date], period_end: Optional[date], keys: Dict[str, str]
+) -> dict:
+    """
+    Writes the company's FEC and/or CSV file (keys maps each format to its
+    storage key) straight to storage, a batch of rows at a time. Returns the
+    document count and the files by their name in a ZIP.
+    """
+    doc_number = (
+        select(DocumentVersion.doc_number)
+        .where(DocumentVersion.document_id == Document.id)
+        .order_by(DocumentVersion.version_number.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    query = (
+        select(
+            Document.id, Document.type, Document.status, Document.client_id,
+            Document.created_at.label("date"), Document.updated_at, Document.current_totals,
+            Client.name.label("client_name"), doc_number.label("doc_number"),
+        )
+        .join(Client, Client.id == Document.client_id)
+        .where(Document.company_id == company_id, Document.status.in_(EXPORTED_STATUSES))
+        .order_by(Document.created_at, Document.id)
+        .execution_options(yield_per=2000)
+    )
+    if period_start is not None:
+        query = query.where(Document.created_at >= datetime.combine(period_start, time.min))
+    if period_end is not None:
+        query = query.where(Document.created_at < datetime.combine(period_end + timedelta(days=1), time.min))
+
+    with contextlib.ExitStack() as stack:
+        outputs = {
+            fmt: stack.enter_context(storage_service.open_writer(key, CONTENT_TYPES[fmt]))
+            for fmt, key in keys.items()
+        }
+        texts = {fmt: io.TextIOWrapper(out, encoding="utf-8", newline="") for fmt, out in outputs.items()}
+        writers = {fmt: csv.writer(text, delimiter="|" if fmt == "fec" else ";") for fmt, text in texts.items()}
+        if "fec" in writers:
+            writers["fec"].writerow(FEC_HEADERS)
+        if "csv" in writers:
+            writers["csv"].writerow(CSV_HEADERS)
+
+        documents = 0
+        async with AsyncSession(engine) as session:
+            company = await session.get(Company, company_id)
+            if company is None:
+                raise ExportError("Company not found")
+            folder = company_folder(company.id, company.name)
+            period = f"{period_start:%Y%m%d}_{period_end:%Y%m%d}" if period_start and period_end else "all"
+            names = {
+                "fec": f"{folder}/{fec_filename(company.registration_number, company.id, period_end or date.today())}",
+                "csv": f"{folder}/export_{period}.csv",
+            }
+            result = await session.stream(query)
+            # Formatting and part uploads run off the event loop, one batch at a time
+            async for rows in result.partitions():
+                await asyncio.to_thread(_write_documents, writers, rows)
+                documents += len(rows)
+
+        for fmt, text in texts.items():
+            text.flush()
+            text.detach()
+            await asyncio.to_thread(outputs[fmt].close)
+    return {"documents": documents, "files": {names[fmt]: key for fmt, key in keys.items()}}
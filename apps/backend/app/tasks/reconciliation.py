@@ -0,0 +1,40 @@
+import asyncio
+import tempfile
+from decimal import Decimal
+from celery import shared_task
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import engine
+from app.core.config import settings
+from app.services.jobs import job_tracker
+from app.services.reconciliation import reconcile
+from app.services.storage import storage_service
+
+@shared_task(name="reconcile_statement", bind=True)
+def reconcile_statement_task(self, company_id: int, object_name: str, fmt: str):
+    """
+    Matches an uploaded bank statement against the company's open invoices.
+    The job id is the Celery task id and the statement id of the matches.
+    """
+    job_id = self.request.id
+    job_tracker.start(job_id)
+    try:
+        result = asyncio.run(_reconcile_statement(job_id, company_id, object_name, fmt))
+    except Exception as e:
+        job_tracker.fail(job_id, str(e))
+        raise
+    finally:
+        storage_service.delete_file(object_name)
+    job_tracker.complete(job_id, result)
+    return result
+
+async def _reconcile_statement(job_id: str, company_id: int, object_name: str, fmt: str) -> dict:
+    tolerance = Decimal(str(settings.RECONCILIATION_AMOUNT_TOLERANCE))
+    with tempfile.TemporaryFile() as source:
+        await asyncio.to_thread(storage_service.download_fileobj, object_name, source)
+        size = source.tell()
+        source.seek(0)
+        async with AsyncSession(engine) as session:
+            counts = await reconcile(session, company_id, job_id, source, fmt, tolerance)
+            await session.commit()
+    job_tracker.progress(job_id, size)
+    return {"statement_id": job_id, **counts}
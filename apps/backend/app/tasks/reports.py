@@ -0,0 +1,29 @@
+import asyncio
+from celery import shared_task
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import engine
+from app.models.core import Company
+from app.services.change_counters import change_counters
+from app.services.rollups import revenue_rollups
+
+@shared_task(name="reconcile_revenue_rollups")
+def reconcile_revenue_rollups_task():
+    """
+    Periodic repair of the revenue rollups, one short transaction per company.
+    """
+    return asyncio.run(_reconcile_revenue_rollups())
+
+async def _reconcile_revenue_rollups() -> dict:
+    async with AsyncSession(engine) as session:
+        company_ids = (await session.execute(select(Company.id).order_by(Company.id))).scalars().all()
+    repaired = {}
+    for company_id in company_ids:
+        async with AsyncSession(engine) as session:
+            count = await revenue_rollups.reconcile(session, company_id)
+            await session.commit()
+        if count:
+            repaired[company_id] = count
+            # The summary's ETag comes from the documents counter
+            change_counters.bump_sync(company_id, "documents")
+    return {"companies": len(company_ids), "repaired": repaired}
@@ -0,0 +1,76 @@
+"""JSONB document data with GIN and totals indexes
+
+Revision ID: 3b8d0e6f1a27
+Revises: 7c1e4b9a2f60
+Create Date: 2026-10-19 10:02:17.884310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b8d0e6f1a27'
+down_revision: Union[str, None] = '7c1e4b9a2f60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+JSON_COLUMNS = {
+    'documents': ['current_data', 'current_totals', 'extra_metadata'],
+    'document_versions': ['snapshot_data', 'snapshot_delta', 'extra_metadata'],
+}
+
+# Totals are user-supplied JSON: a non-numeric value must not break the index build
+FZ_NUMERIC = """
+CREATE OR REPLACE FUNCTION fz_numeric(value text) RETURNS numeric
+LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE AS $$
+BEGIN
+    RETURN value::numeric;
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END;
+$$
+"""
+
+
+def _supports_lz4() -> bool:
+    # Column compression exists since PostgreSQL 14, lz4 only if the server was built with it
+    return bool(op.get_bind().execute(sa.text(
+        "SELECT current_setting('server_version_num')::int >= 140000 "
+        "AND EXISTS (SELECT 1 FROM pg_settings WHERE name = 'default_toast_compression' "
+        "AND 'lz4' = ANY(enumvals))"
+    )).scalar())
+
+
+def upgrade() -> None:
+    lz4 = _supports_lz4()
+    for table, columns in JSON_COLUMNS.items():
+        # One ALTER per table so each table is rewritten only once
+        clauses = []
+        for column in columns:
+            clauses.append(f'ALTER COLUMN {column} TYPE jsonb USING {column}::jsonb')
+            if lz4:
+                clauses.append(f'ALTER COLUMN {column} SET COMPRESSION lz4')
+        op.execute(f'ALTER TABLE {table} ' + ', '.join(clauses))
+
+    op.execute(FZ_NUMERIC)
+    op.create_index('ix_documents_current_data', 'documents', ['current_data'],
+                    postgresql_using='gin', postgresql_ops={'current_data': 'jsonb_path_ops'})
+    op.create_index('ix_documents_extra_metadata', 'documents', ['extra_metadata'],
+                    postgresql_using='gin', postgresql_ops={'extra_metadata': 'jsonb_path_ops'})
+    op.execute("CREATE INDEX ix_documents_total_ttc ON documents (company_id, fz_numeric(current_totals->>'total_ttc'))")
+    op.execute("CREATE INDEX ix_documents_total_ht ON documents (company_id, fz_numeric(current_totals->>'total_ht'))")
+
+
+def downgrade() -> None:
+    op.drop_index('ix_documents_total_ht', table_name='documents')
+    op.drop_index('ix_documents_total_ttc', table_name='documents')
+    op.drop_index('ix_documents_extra_metadata', table_name='documents')
+    op.drop_index('ix_documents_current_data', table_name='documents')
+    op.execute('DROP FUNCTION IF EXISTS fz_numeric(text)')
+    for table, columns in JSON_COLUMNS.items():
+        op.execute(f'ALTER TABLE {table} ' + ', '.join(
+            f'ALTER COLUMN {column} TYPE json USING {column}::json' for column in columns
+        ))
@@ -0,0 +1,130 @@
+"""Full-text search vector on documents
+
+Revision ID: 5e2a9c4d7b13
+Revises: 3b8d0e6f1a27
+Create Date: 2026-10-19 11:26:05.117492
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e2a9c4d7b13'
+down_revision: Union[str, None] = '3b8d0e6f1a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_CONFIG = """
+CREATE TEXT SEARCH CONFIGURATION fr_unaccent (COPY = french);
+ALTER TEXT SEARCH CONFIGURATION fr_unaccent
+    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, french_stem;
+"""
+
+# Text of every string/number leaf of a JSON document
+FZ_JSONB_TEXT = """
+CREATE OR REPLACE FUNCTION fz_jsonb_text(data jsonb) RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT coalesce(string_agg(v #>> '{}', ' '), '')
+    FROM jsonb_path_query(coalesce(data, '{}'::jsonb),
+        'strict $.** ? (@.type() == "string" || @.type() == "number")') AS v
+$$
+"""
+
+# Same for a JSON-patch delta, skipping op names and paths
+FZ_PATCH_TEXT = """
+CREATE OR REPLACE FUNCTION fz_patch_text(delta jsonb) RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT coalesce(string_agg(v #>> '{}', ' '), '')
+    FROM jsonb_path_query(coalesce(delta, '[]'::jsonb),
+        'strict $[*].value.** ? (@.type() == "string" || @.type() == "number")') AS v
+$$
+"""
+
+# Weights: A document numbers, B client name, C current data, D version snapshots
+FZ_DOCUMENT_SEARCH_VECTOR = """
+CREATE OR REPLACE FUNCTION fz_document_search_vector(p_document_id integer, p_client_id integer, p_data jsonb)
+RETURNS tsvector LANGUAGE sql STABLE AS $$
+    SELECT setweight(to_tsvector('fr_unaccent', coalesce(string_agg(v.doc_number, ' '), '')), 'A')
+        || setweight(to_tsvector('fr_unaccent', coalesce((SELECT c.name FROM clients c WHERE c.id = p_client_id), '')), 'B')
+        || setweight(to_tsvector('fr_unaccent', fz_jsonb_text(p_data)), 'C')
+        || setweight(to_tsvector('fr_unaccent', coalesce(string_agg(
+            CASE WHEN v.snapshot_data IS NOT NULL THEN fz_jsonb_text(v.snapshot_data)
+                 ELSE fz_patch_text(v.snapshot_delta) END, ' '), '')), 'D')
+    FROM document_versions v
+    WHERE v.document_id = p_document_id
+$$
+"""
+
+TRIGGERS = """
+CREATE OR REPLACE FUNCTION fz_documents_search_trigger() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.search_vector := fz_document_search_vector(NEW.id, NEW.client_id, NEW.current_data);
+    RETURN NEW;
+END;
+$$;
+
+CREATE TRIGGER documents_search_vector
+    BEFORE INSERT OR UPDATE OF current_data, client_id ON documents
+    FOR EACH ROW EXECUTE FUNCTION fz_documents_search_trigger();
+
+CREATE OR REPLACE FUNCTION fz_document_versions_search_trigger() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE documents SET search_vector = fz_document_search_vector(id, client_id, current_data)
+    WHERE id = NEW.document_id;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER document_versions_search_vector
+    AFTER INSERT ON document_versions
+    FOR EACH ROW EXECUTE FUNCTION fz_document_versions_search_trigger();
+
+CREATE OR REPLACE FUNCTION fz_clients_search_trigger() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE documents SET search_vector = fz_document_search_vector(id, client_id, current_data)
+    WHERE client_id = NEW.id;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER clients_search_vector
+    AFTER UPDATE OF name ON clients
+    FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE FUNCTION fz_clients_search_trigger();
+"""
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS unaccent')
+    # Lets company_id and the tsvector share one GIN index
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gin')
+    op.execute(SEARCH_CONFIG)
+    op.execute(FZ_JSONB_TEXT)
+    op.execute(FZ_PATCH_TEXT)
+    op.add_column('documents', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    op.execute(FZ_DOCUMENT_SEARCH_VECTOR)
+    op.execute(TRIGGERS)
+    op.execute('UPDATE documents SET search_vector = fz_document_search_vector(id, client_id, current_data)')
+    op.create_index('ix_documents_search', 'documents', ['company_id', 'search_vector'], postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_documents_search', table_name='documents')
+    op.execute('DROP TRIGGER IF EXISTS clients_search_vector ON clients')
+    op.execute('DROP TRIGGER IF EXISTS document_versions_search_vector ON document_versions')
+    op.execute('DROP TRIGGER IF EXISTS documents_search_vector ON documents')
+    op.execute('DROP FUNCTION IF EXISTS fz_clients_search_trigger()')
+    op.execute('DROP FUNCTION IF EXISTS fz_document_versions_search_trigger()')
+    op.execute('DROP FUNCTION IF EXISTS fz_documents_search_trigger()')
+    op.execute('DROP FUNCTION IF EXISTS fz_document_search_vector(integer, integer, jsonb)')
+    op.drop_column('documents', 'search_vector')
+    op.execute('DROP FUNCTION IF EXISTS fz_patch_text(jsonb)')
+    op.execute('DROP FUNCTION IF EXISTS fz_jsonb_text(jsonb)')
+    op.execute('DROP TEXT SEARCH CONFIGURATION IF EXISTS fr_unaccent')
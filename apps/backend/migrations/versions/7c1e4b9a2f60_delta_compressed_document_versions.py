@@ -0,0 +1,31 @@
+"""Delta-compressed document versions
+
+Revision ID: 7c1e4b9a2f60
+Revises: d6282968e2a4
+Create Date: 2026-10-19 09:12:41.503118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1e4b9a2f60'
+down_revision: Union[str, None] = 'd6282968e2a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('document_versions', sa.Column('snapshot_delta', sa.JSON(), nullable=True))
+    op.alter_column('document_versions', 'snapshot_data', existing_type=sa.JSON(), nullable=True)
+    op.create_unique_constraint('uix_document_version', 'document_versions', ['document_id', 'version_number'])
+
+
+def downgrade() -> None:
+    # Deltas cannot be expanded in SQL; downgrade only once every version is a full snapshot
+    op.drop_constraint('uix_document_version', 'document_versions', type_='unique')
+    op.alter_column('document_versions', 'snapshot_data', existing_type=sa.JSON(), nullable=False)
+    op.drop_column('document_versions', 'snapshot_delta')
@@ -0,0 +1,26 @@
+"""Company plan for admission limits
+
+Revision ID: 9a4f6d2c8e51
+Revises: 5e2a9c4d7b13
+Create Date: 2026-10-19 14:48:52.301955
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4f6d2c8e51'
+down_revision: Union[str, None] = '5e2a9c4d7b13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('companies', sa.Column('plan', sa.String(length=50), server_default='standard', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('companies', 'plan')
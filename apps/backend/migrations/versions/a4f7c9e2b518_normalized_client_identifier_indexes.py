@@ -0,0 +1,37 @@
+"""Normalized client identifier indexes for import deduplication
+
+Revision ID: a4f7c9e2b518
+Revises: e8c4a2f6d915
+Create Date: 2026-10-20 09:41:12.208315
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4f7c9e2b518'
+down_revision: Union[str, None] = 'e8c4a2f6d915'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Same expressions as NORMALIZED_VAT_NUMBER / NORMALIZED_REGISTRATION_NUMBER
+# in app.models.business, copied so the migration does not change with them
+VAT_NUMBER = r"upper(regexp_replace(vat_number, '\s', '', 'g'))"
+REGISTRATION_NUMBER = r"regexp_replace(registration_number, '[\s.]', '', 'g')"
+
+
+def upgrade() -> None:
+    op.drop_index('ix_clients_company_vat_number', table_name='clients')
+    op.drop_index('ix_clients_company_registration_number', table_name='clients')
+    op.create_index('ix_clients_company_registration_number_norm', 'clients', ['company_id', sa.text(REGISTRATION_NUMBER)], unique=False)
+    op.create_index('ix_clients_company_vat_number_norm', 'clients', ['company_id', sa.text(VAT_NUMBER)], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_clients_company_vat_number_norm', table_name='clients')
+    op.drop_index('ix_clients_company_registration_number_norm', table_name='clients')
+    op.create_index('ix_clients_company_registration_number', 'clients', ['company_id', 'registration_number'], unique=False)
+    op.create_index('ix_clients_company_vat_number', 'clients', ['company_id', 'vat_number'], unique=False)
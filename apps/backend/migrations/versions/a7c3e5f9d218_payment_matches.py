@@ -0,0 +1,46 @@
+"""Payment matches for bank reconciliation
+
+Revision ID: a7c3e5f9d218
+Revises: f3a9d2b6c184
+Create Date: 2026-10-19 19:24:05.117846
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c3e5f9d218'
+down_revision: Union[str, None] = 'f3a9d2b6c184'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('payment_matches',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('company_id', sa.Integer(), nullable=False),
+    sa.Column('statement_id', sa.String(length=36), nullable=False),
+    sa.Column('line_number', sa.Integer(), nullable=False),
+    sa.Column('booking_date', sa.Date(), nullable=True),
+    sa.Column('amount', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('currency', sa.String(length=3), nullable=True),
+    sa.Column('label', sa.String(length=500), nullable=True),
+    sa.Column('counterparty', sa.String(length=255), nullable=True),
+    sa.Column('document_id', sa.Integer(), nullable=True),
+    sa.Column('rule', sa.String(length=20), nullable=True),
+    sa.Column('score', sa.Float(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ),
+    sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_payment_matches_company_statement', 'payment_matches', ['company_id', 'statement_id', 'line_number'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_payment_matches_company_statement', table_name='payment_matches')
+    op.drop_table('payment_matches')
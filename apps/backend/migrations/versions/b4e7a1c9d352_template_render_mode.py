@@ -0,0 +1,27 @@
+"""Template render mode for the fast-path renderer
+
+Revision ID: b4e7a1c9d352
+Revises: 9a4f6d2c8e51
+Create Date: 2026-10-19 16:21:07.514233
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4e7a1c9d352'
+down_revision: Union[str, None] = '9a4f6d2c8e51'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing templates keep docxtpl until they are re-uploaded and classified
+    op.add_column('templates', sa.Column('render_mode', sa.String(length=20), server_default='docxtpl', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('templates', 'render_mode')
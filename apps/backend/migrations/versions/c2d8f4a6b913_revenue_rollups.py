@@ -0,0 +1,50 @@
+"""Revenue rollups for dashboard reports
+
+Revision ID: c2d8f4a6b913
+Revises: a7c3e5f9d218
+Create Date: 2026-10-19 20:41:52.604318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2d8f4a6b913'
+down_revision: Union[str, None] = 'a7c3e5f9d218'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('revenue_rollups',
+    sa.Column('company_id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('doc_type', sa.String(length=20), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('client_id', sa.Integer(), nullable=False),
+    sa.Column('documents', sa.Integer(), nullable=False),
+    sa.Column('total_ht', sa.Numeric(precision=16, scale=2), nullable=False),
+    sa.Column('total_tva', sa.Numeric(precision=16, scale=2), nullable=False),
+    sa.Column('total_ttc', sa.Numeric(precision=16, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ),
+    sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ),
+    sa.PrimaryKeyConstraint('company_id', 'month', 'doc_type', 'status', 'client_id')
+    )
+    # Initial fill from numeric amounts; the periodic reconciliation settles any other case
+    op.execute("""
+        INSERT INTO revenue_rollups
+        SELECT company_id, date_trunc('month', created_at)::date, type, status::text, client_id, count(*),
+            coalesce(sum(round(CASE WHEN jsonb_typeof(current_totals->'total_ht') = 'number' THEN (current_totals->>'total_ht')::numeric END, 2)), 0),
+            coalesce(sum(round(CASE WHEN jsonb_typeof(current_totals->'total_tva') = 'number' THEN (current_totals->>'total_tva')::numeric END, 2)), 0),
+            coalesce(sum(round(CASE WHEN jsonb_typeof(current_totals->'total_ttc') = 'number' THEN (current_totals->>'total_ttc')::numeric END, 2)), 0)
+        FROM documents
+        WHERE status <> 'DRAFT'
+        GROUP BY 1, 2, 3, 4, 5
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('revenue_rollups')
@@ -0,0 +1,49 @@
+"""Due dates for receivables aging
+
+Revision ID: d5b1e7f3a624
+Revises: c2d8f4a6b913
+Create Date: 2026-10-19 22:03:17.148205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5b1e7f3a624'
+down_revision: Union[str, None] = 'c2d8f4a6b913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('documents', sa.Column('due_date', sa.Date(), nullable=True))
+    op.add_column('documents', sa.Column('amount_due', sa.Numeric(precision=16, scale=2), nullable=True))
+    # Generated invoices: ISO due dates and day-count terms from their data, 30 days otherwise
+    op.execute("""
+        UPDATE documents SET
+            due_date = CASE
+                WHEN current_data->>'due_date' ~ '^\\d{4}-\\d{2}-\\d{2}$' THEN (current_data->>'due_date')::date
+                WHEN current_data->>'due_date' ~ '^\\d{2}/\\d{2}/\\d{4}$' THEN to_date(current_data->>'due_date', 'DD/MM/YYYY')
+                WHEN coalesce(current_data->>'payment_terms_days', current_data->>'payment_terms') ~ '^\\s*\\d{1,3}\\M'
+                    THEN created_at::date + substring(coalesce(current_data->>'payment_terms_days', current_data->>'payment_terms') FROM '\\d{1,3}')::int
+                ELSE created_at::date + 30
+            END,
+            amount_due = CASE
+                WHEN jsonb_typeof(coalesce(current_totals->'due', current_totals->'total_ttc')) = 'number'
+                    THEN round((coalesce(current_totals->'due', current_totals->'total_ttc') #>> '{}')::numeric, 2)
+            END
+        WHERE type = 'INVOICE' AND status <> 'DRAFT'
+    """)
+    op.create_index('ix_documents_unpaid_due', 'documents', ['company_id', 'client_id', 'due_date'], unique=False,
+        postgresql_include=['amount_due'],
+        postgresql_where=sa.text("type = 'INVOICE' AND status IN ('GENERATED', 'SENT')"))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_documents_unpaid_due', table_name='documents',
+        postgresql_where=sa.text("type = 'INVOICE' AND status IN ('GENERATED', 'SENT')"))
+    op.drop_column('documents', 'amount_due')
+    op.drop_column('documents', 'due_date')
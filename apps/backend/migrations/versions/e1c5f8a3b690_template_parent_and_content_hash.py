@@ -0,0 +1,32 @@
+"""Template parent link and content hash for upload deduplication
+
+Revision ID: e1c5f8a3b690
+Revises: b4e7a1c9d352
+Create Date: 2026-10-19 17:02:44.918310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1c5f8a3b690'
+down_revision: Union[str, None] = 'b4e7a1c9d352'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('templates', sa.Column('parent_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('fk_templates_parent_id', 'templates', 'templates', ['parent_id'], ['id'])
+    op.add_column('templates', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index('ix_templates_company_content_hash', 'templates', ['company_id', 'content_hash'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_templates_company_content_hash', table_name='templates')
+    op.drop_column('templates', 'content_hash')
+    op.drop_constraint('fk_templates_parent_id', 'templates', type_='foreignkey')
+    op.drop_column('templates', 'parent_id')
@@ -0,0 +1,34 @@
+"""Change timestamps for incremental exports
+
+Revision ID: e8c4a2f6d915
+Revises: d5b1e7f3a624
+Create Date: 2026-10-19 23:12:40.517392
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8c4a2f6d915'
+down_revision: Union[str, None] = 'd5b1e7f3a624'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('clients', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute("UPDATE clients SET updated_at = created_at")
+    op.alter_column('clients', 'updated_at', nullable=False)
+    op.create_index('ix_clients_company_updated_at', 'clients', ['company_id', 'updated_at'], unique=False)
+    op.create_index('ix_documents_company_updated_at', 'documents', ['company_id', 'updated_at'], unique=False)
+    op.create_index('ix_document_versions_generated_at', 'document_versions', ['generated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_document_versions_generated_at', table_name='document_versions')
+    op.drop_index('ix_documents_company_updated_at', table_name='documents')
+    op.drop_index('ix_clients_company_updated_at', table_name='clients')
+    op.drop_column('clients', 'updated_at')
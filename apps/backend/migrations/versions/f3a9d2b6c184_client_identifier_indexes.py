@@ -0,0 +1,28 @@
+"""Client identifier indexes for import deduplication
+
+Revision ID: f3a9d2b6c184
+Revises: e1c5f8a3b690
+Create Date: 2026-10-19 18:11:27.530142
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a9d2b6c184'
+down_revision: Union[str, None] = 'e1c5f8a3b690'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_clients_company_registration_number', 'clients', ['company_id', 'registration_number'], unique=False)
+    op.create_index('ix_clients_company_vat_number', 'clients', ['company_id', 'vat_number'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_clients_company_vat_number', table_name='clients')
+    op.drop_index('ix_clients_company_registration_number', table_name='clients')
@@ -0,0 +1,83 @@
+"""
+Render benchmark: DOCX renders per second on one core, docxtpl versus the
+fast path, on a generated placeholder-only invoice template.
+
+    python scripts/bench_render.py [--paragraphs 200] [--seconds 5] [--output report.json]
+"""
+import argparse
+import io
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from docx import Document
+from docxtpl import DocxTemplate
+from app.services.docx_fast import build_plan
+
+def make_template(paragraphs: int) -> bytes:
+    doc = Document()
+    doc.sections[0].header.paragraphs[0].text = "Facture {{ doc_number }} du {{ date }}"
+    doc.sections[0].footer.paragraphs[0].text = "{{ company_name }} - SIRET {{ company_siret }}"
+    doc.add_paragraph("Client : {{ client_name }}, {{ client_address }}")
+    for i in range(paragraphs):
+        doc.add_paragraph(f"Clause {i}: conditions générales de vente, paiement à {{{{ payment_terms }}}} jours.")
+    table = doc.add_table(rows=3, cols=2)
+    for row, label in enumerate(("total_ht", "total_tva", "total_ttc")):
+        table.cell(row, 0).text = label
+        table.cell(row, 1).text = f"{{{{ {label} }}}}"
+    out = io.BytesIO()
+    doc.save(out)
+    return out.getvalue()
+
+DATA = {
+    "doc_number": "FAC-2026-0042", "date": "19/10/2026", "company_name": "ACME SAS",
+    "company_siret": "12345678900012", "client_name": "Dupont & Fils", "client_address": "1 rue de Paris\n75001 Paris",
+    "payment_terms": 30, "total_ht": "1000.00", "total_tva": "200.00", "total_ttc": "1200.00",
+}
+
+def render_docxtpl(content: bytes) -> bytes:
+    template = DocxTemplate(io.BytesIO(content))
+    template.render(DATA)
+    out = io.BytesIO()
+    template.save(out)
+    return out.getvalue()
+
+def rate(render, seconds: float) -> float:
+    render() # Warm-up
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        render()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--paragraphs", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    content = make_template(args.paragraphs)
+    plan = build_plan(content)
+    if plan is None:
+        sys.exit("Benchmark template was not classified as placeholder-only")
+
+    docxtpl_rate = rate(lambda: render_docxtpl(content), args.seconds)
+    fast_rate = rate(lambda: plan.render(content, DATA), args.seconds)
+    report = {
+        "template_bytes": len(content),
+        "paragraphs": args.paragraphs,
+        "docxtpl_renders_per_second": round(docxtpl_rate, 1),
+        "fast_renders_per_second": round(fast_rate, 1),
+        "speedup": round(fast_rate / docxtpl_rate, 1),
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
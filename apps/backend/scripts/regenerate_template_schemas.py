@@ -0,0 +1,47 @@
+"""
+Recomputes the data schema of every stored template from its DOCX, for
+templates uploaded before loops and attribute access were typed (their
+schemas typed loop iterables as strings).
+
+    python scripts/regenerate_template_schemas.py [--dry-run]
+
+Compiled validators are cached per template version: restart the API and
+the workers afterwards.
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import select
+from app.core.database import AsyncSessionLocal
+from app.models.business import Template
+from app.services.storage import storage_service
+from app.services.templates import template_engine
+
+async def main(dry_run: bool):
+    schemas = {}
+    async with AsyncSessionLocal() as session:
+        templates = (await session.execute(select(Template).order_by(Template.id))).scalars().all()
+        changed = 0
+        for template in templates:
+            # Content-addressed objects: versions sharing a file share a schema
+            if template.docx_source_url not in schemas:
+                content = await asyncio.to_thread(storage_service.get_file_content, template.docx_source_url)
+                shapes = template_engine.extract_variable_shapes(content)
+                schemas[template.docx_source_url] = template_engine.generate_json_schema(set(shapes), shapes)
+            schema = schemas[template.docx_source_url]
+            if schema != template.schema_json:
+                changed += 1
+                print(f"template {template.id} v{template.version}: {sorted(schema['properties'])}")
+                template.schema_json = schema
+        if not dry_run:
+            await session.commit()
+    print(f"{changed} of {len(templates)} schemas {'would change' if dry_run else 'updated'}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true")
+    asyncio.run(main(parser.parse_args().dry_run))
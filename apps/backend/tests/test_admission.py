@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+from app.api import admission
+from app.api.admission import AdmissionController, admission_control, admission_controller
+
+def test_concurrency_slots_are_per_company_and_route():
+    controller = AdmissionController()
+    route = "POST /api/templates/{template_id}/test-render"
+    assert controller.acquire_slot(1, route, limit=1)
+    assert not controller.acquire_slot(1, route, limit=1)
+    # Another tenant is not affected
+    assert controller.acquire_slot(2, route, limit=1)
+
+    controller.release_slot(1, route)
+    assert controller.acquire_slot(1, route, limit=1)
+
+def test_route_limits_fall_back_to_default_plan():
+    route = "POST /api/templates/{template_id}/test-render"
+    assert AdmissionController.route_limits(route, "premium")["concurrency"] == 4
+    assert AdmissionController.route_limits(route, "free")["concurrency"] == 2
+    assert AdmissionController.route_limits("GET /api/clients/", "free") is None
+
+def _request(route):
+    method, path = route.split(" ", 1)
+    return Request({"type": "http", "method": method, "route": SimpleNamespace(path=path), "headers": []})
+
+async def _plan(db, company_id):
+    return "standard"
+
+async def test_empty_bucket_is_rejected_with_retry_after(monkeypatch):
+    async def take_tokens(company_id, route, plan, route_limits):
+        return 2.3
+
+    monkeypatch.setattr(admission_controller, "plan_for", _plan)
+    monkeypatch.setattr(admission_controller, "take_tokens", take_tokens)
+    with pytest.raises(HTTPException) as exc:
+        await admission_control(_request("GET /api/clients/"), db=None, company_id=1).__anext__()
+    assert exc.value.status_code == 429
+    assert exc.value.headers["Retry-After"] == "3"
+
+async def test_concurrency_slot_is_held_until_the_handler_returns(monkeypatch):
+    async def take_tokens(company_id, route, plan, route_limits):
+        return 0.0
+
+    monkeypatch.setattr(admission_controller, "plan_for", _plan)
+    monkeypatch.setattr(admission_controller, "take_tokens", take_tokens)
+    route = "POST /api/templates/{template_id}/test-render"
+    running = [admission_control(_request(route), db=None, company_id=1) for _ in range(2)]
+    for dependency in running:
+        await dependency.__anext__()
+    with pytest.raises(HTTPException) as exc:
+        await admission_control(_request(route), db=None, company_id=1).__anext__()
+    assert exc.value.status_code == 429
+
+    await running[0].aclose()
+    third = admission_control(_request(route), db=None, company_id=1)
+    await third.__anext__()
+    for dependency in (running[1], third):
+        await dependency.aclose()
+    assert (1, route) not in admission_controller._inflight
+
+async def test_redis_errors_admit_the_request(monkeypatch):
+    class BrokenRedis:
+        async def eval(self, *args):
+            raise ConnectionError("redis down")
+
+    monkeypatch.setattr(admission, "get_async_redis", lambda: BrokenRedis())
+    assert await AdmissionController().take_tokens(1, "GET /api/clients/", "free", None) == 0.0
@@ -0,0 +1,31 @@
+from datetime import date, datetime
+from decimal import Decimal
+import pytest
+from sqlalchemy.dialects import postgresql
+from app.services.aging import aging_query, amount_due_for, due_date_for
+
+ISSUED = datetime(2026, 10, 19, 15, 30)
+
+@pytest.mark.parametrize("data, expected", [
+    ({}, date(2026, 11, 18)),
+    ({"payment_terms": "45 jours"}, date(2026, 12, 3)),
+    ({"payment_terms_days": 0}, date(2026, 10, 19)),
+    ({"payment_terms": "à réception"}, date(2026, 11, 18)),
+    ({"due_date": "31/12/2026", "payment_terms": "45"}, date(2026, 12, 31)),
+    ({"due_date": "2027-01-15"}, date(2027, 1, 15)),
+])
+def test_due_date_from_data_or_terms(data, expected):
+    assert due_date_for(ISSUED, data, 30) == expected
+
+def test_amount_due_prefers_due_over_total():
+    assert amount_due_for({"total_ttc": 1200, "due": 800.005}) == Decimal("800.01")
+    assert amount_due_for({"total_ttc": "1200.5"}) == Decimal("1200.50")
+    assert amount_due_for({"total_ttc": "n/a"}) is None
+
+def test_aging_is_one_grouped_query_matching_the_partial_index():
+    sql = str(aging_query(7, date(2026, 10, 19)).compile(dialect=postgresql.dialect()))
+    # Literal predicate so the planner can pick ix_documents_unpaid_due
+    assert "documents.type = 'INVOICE'" in sql
+    assert "documents.status IN ('GENERATED', 'SENT')" in sql
+    assert sql.count("FILTER (WHERE") == 5
+    assert "GROUP BY documents.client_id" in sql
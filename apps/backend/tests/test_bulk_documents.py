@@ -0,0 +1,100 @@
+import json
+import pytest
+from sqlalchemy import select
+from app.api.documents import _insert_bulk_chunk, create_documents_bulk, ndjson_lines
+from app.core.config import settings
+from app.models.business import Client, Document, DocType, Template
+from app.models.core import Company, User
+from app.schemas.document import DocumentCreate
+from app.services.change_counters import change_counters
+
+async def _stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+@pytest.mark.asyncio
+async def test_ndjson_lines_split_across_chunks():
+    chunks = [b'{"a": 1}\n{"b"', b': 2}\n\n  \n{"c": 3', b"}"]
+    lines = [item async for item in ndjson_lines(_stream(*chunks))]
+    # Blank lines are skipped but still counted, so numbers match the body
+    assert lines == [(1, b'{"a": 1}'), (2, b'{"b": 2}'), (5, b'{"c": 3}')]
+
+@pytest.mark.asyncio
+async def test_ndjson_lines_trailing_newline():
+    lines = [item async for item in ndjson_lines(_stream(b'{"a": 1}\r\n{"b": 2}\n'))]
+    assert [number for number, _ in lines] == [1, 2]
+
+@pytest.mark.asyncio
+async def test_ndjson_lines_long_line_over_many_chunks():
+    chunks = [b'{"a": "'] + [b"x"] * 1000 + [b'"}\n{"b": 2}']
+    lines = [item async for item in ndjson_lines(_stream(*chunks))]
+    assert lines == [(1, b'{"a": "' + b"x" * 1000 + b'"}'), (2, b'{"b": 2}')]
+
+class _Body:
+    def __init__(self, *chunks):
+        self.chunks = chunks
+
+    def stream(self):
+        return _stream(*self.chunks)
+
+async def _company(db):
+    company = Company(name="ACME")
+    other = Company(name="Other")
+    user = User(email="bulk@example.com", hashed_password="x")
+    db.add_all([company, other, user])
+    await db.flush()
+    schema = {"type": "object", "properties": {"amount": {"type": "number"}}, "required": ["amount"]}
+    client = Client(company_id=company.id, name="Dupont")
+    foreign_client = Client(company_id=other.id, name="Martin")
+    template = Template(company_id=company.id, type=DocType.INVOICE, name="Facture", docx_source_url="t.docx", schema_json=schema)
+    db.add_all([client, foreign_client, template])
+    await db.commit()
+    return company, user, client, foreign_client, template
+
+def _line(client_id, template_id, **data):
+    return json.dumps({"client_id": client_id, "template_id": template_id, "type": "INVOICE", "current_data": data}).encode()
+
+@pytest.mark.asyncio
+async def test_bulk_create_reports_each_line(db_session, monkeypatch):
+    async def bump(company_id, collection):
+        pass
+
+    monkeypatch.setattr(change_counters, "bump", bump)
+    monkeypatch.setattr(settings, "DOCUMENT_BULK_CHUNK_SIZE", 2)
+    company, user, client, foreign_client, template = await _company(db_session)
+    body = b"\n".join([
+        _line(client.id, template.id, amount=10),
+        _line(foreign_client.id, template.id, amount=20), # Another tenant's client
+        b"",
+        _line(client.id, template.id + 1000, amount=30),
+        _line(client.id, template.id, amount="thirty"),
+        b'{"client_id": "x"}',
+        _line(client.id, template.id), # Drafts may leave required fields out
+    ])
+    # Split mid-line, and across the chunks of the insert
+    result = await create_documents_bulk(
+        _Body(body[:25], body[25:]), generate=False, db=db_session, current_user=user, company_id=company.id
+    )
+
+    assert result["created"] == 2
+    assert [line for line, doc_id in enumerate(result["ids"], 1) if doc_id] == [1, 7]
+    assert len(result["ids"]) == 7
+    errors = {e["line"]: e["error"] for e in result["errors"]}
+    assert errors.keys() == {2, 4, 5, 6}
+    assert errors[2] == "Client not found"
+    assert errors[4] == "Template not found"
+    assert errors[5].startswith("Document data does not match the template schema")
+    assert errors[6].startswith("client_id")
+
+    docs = (await db_session.execute(select(Document).where(Document.id.in_([i for i in result["ids"] if i])))).scalars().all()
+    assert {doc.id: doc.current_data for doc in docs} == {result["ids"][0]: {"amount": 10}, result["ids"][6]: {}}
+    assert all(doc.company_id == company.id and doc.created_by == user.id for doc in docs)
+
+@pytest.mark.asyncio
+async def test_generate_requires_the_full_schema(db_session):
+    company, user, client, _, template = await _company(db_session)
+    created, rejected = await _insert_bulk_chunk(
+        db_session, [(1, DocumentCreate.model_validate_json(_line(client.id, template.id)))],
+        {}, company.id, user.id, partial=False
+    )
+    assert created == [] and [e["line"] for e in rejected] == [1]
@@ -0,0 +1,94 @@
+import pytest
+from fastapi import HTTPException, Response
+from starlette.requests import Request
+from app.api.deps import conditional_list
+from app.services import change_counters as change_counters_module
+from app.services.change_counters import change_counters
+
+class _FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    async def get(self, key):
+        value = self.values.get(key)
+        return None if value is None else str(value)
+
+    async def set(self, key, value, nx=False):
+        if nx and key in self.values:
+            return None
+        self.values[key] = int(value)
+        return True
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+class _FakePipeline:
+    def __init__(self, r):
+        self.r, self.calls = r, []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def set(self, key, value, nx=False):
+        self.calls.append(lambda: self.r.set(key, value, nx=nx))
+
+    def incr(self, key):
+        async def incr():
+            self.r.values[key] += 1
+            return self.r.values[key]
+        self.calls.append(incr)
+
+    async def execute(self):
+        return [await call() for call in self.calls]
+
+@pytest.fixture
+def redis(monkeypatch):
+    r = _FakeRedis()
+    monkeypatch.setattr(change_counters_module, "get_async_redis", lambda: r)
+    return r
+
+def _request(query="", if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/api/clients/", "query_string": query.encode(), "headers": headers})
+
+async def _list(query="", if_none_match=None):
+    response = Response()
+    etag = await conditional_list("clients")(_request(query, if_none_match), response, company_id=1)
+    return etag, response
+
+async def test_bump_changes_the_etag(redis):
+    etag, response = await _list()
+    assert response.headers["etag"] == etag and etag.startswith('W/"clients-')
+    assert (await _list())[0] == etag
+    other_tenant = await change_counters.etag(2, "clients")
+    other_collection = await change_counters.etag(1, "documents")
+
+    await change_counters.bump(1, "clients")
+    assert (await _list())[0] != etag
+    assert await change_counters.etag(2, "clients") == other_tenant
+    assert await change_counters.etag(1, "documents") == other_collection
+
+async def test_matching_if_none_match_is_304(redis):
+    etag, _ = await _list("page=2")
+    with pytest.raises(HTTPException) as exc:
+        await _list("page=2", if_none_match=etag.removeprefix("W/"))
+    assert exc.value.status_code == 304
+    assert exc.value.headers["ETag"] == etag
+
+    # Another query string is another representation
+    assert (await _list("page=3", if_none_match=etag))[0] != etag
+    await change_counters.bump(1, "clients")
+    new_etag, response = await _list("page=2", if_none_match=etag)
+    assert new_etag != etag and response.headers["etag"] == new_etag
+
+async def test_redis_errors_skip_caching(monkeypatch):
+    def broken():
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(change_counters_module, "get_async_redis", broken)
+    await change_counters.bump(1, "clients")
+    etag, response = await _list(if_none_match="*")
+    assert etag is None and "etag" not in response.headers
@@ -0,0 +1,93 @@
+import io
+import zipfile
+import pytest
+from app.models.business import NORMALIZED_REGISTRATION_NUMBER, NORMALIZED_VAT_NUMBER, Client
+from app.schemas.client import ClientCreate, ClientUpdate
+from app.services.client_import import REMOVE_EXISTING, ClientImportError, detect_format, read_rows, validate_chunk
+
+def _xlsx(rows) -> bytes:
+    strings = sorted({v for row in rows for v in row if isinstance(v, str)})
+    cells = []
+    for r, row in enumerate(rows, start=1):
+        xml = "".join(
+            f'<c r="{chr(65 + c)}{r}" t="s"><v>{strings.index(v)}</v></c>' if isinstance(v, str)
+            # Large numbers are stored in scientific notation
+            else f'<c r="{chr(65 + c)}{r}"><v>{v:.13E}</v></c>' if isinstance(v, float)
+            else f'<c r="{chr(65 + c)}{r}"><v>{v}</v></c>'
+            for c, v in enumerate(row) if v is not None
+        )
+        cells.append(f'<row r="{r}">{xml}</row>')
+    ns = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w") as zf:
+        zf.writestr("xl/workbook.xml", (
+            f'<workbook {ns} xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            '<sheets><sheet name="Clients" sheetId="1" r:id="rId1"/></sheets></workbook>'
+        ))
+        zf.writestr("xl/_rels/workbook.xml.rels", (
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="worksheets/sheet1.xml"/></Relationships>'
+        ))
+        zf.writestr("xl/sharedStrings.xml", f'<sst {ns}>' + "".join(f"<si><t>{s}</t></si>" for s in strings) + "</sst>")
+        zf.writestr("xl/worksheets/sheet1.xml", f'<worksheet {ns}><sheetData>{"".join(cells)}</sheetData></worksheet>')
+    return out.getvalue()
+
+def test_csv_with_semicolons_and_french_headers():
+    content = (
+        "﻿Nom;E-mail;SIRET;TVA;Commentaire\n"
+        "Dupont SARL;contact@dupont.fr;123 456 789 00012;fr 12 345678901;x\n"
+        ";;;;\n"
+        '"Martin; et fils";;;;"y"\n'
+    ).encode("utf-8")
+    rows = list(read_rows(io.BytesIO(content), "csv"))
+    assert rows == [
+        (2, {"name": "Dupont SARL", "email": "contact@dupont.fr", "registration_number": "123 456 789 00012", "vat_number": "fr 12 345678901"}),
+        (4, {"name": "Martin; et fils", "email": "", "registration_number": "", "vat_number": ""}),
+    ]
+    records, errors = validate_chunk(rows)
+    assert errors == []
+    assert records[0] == (2, "Dupont SARL", "contact@dupont.fr", None, "FR12345678901", "12345678900012")
+    assert records[1] == (4, "Martin; et fils", None, None, None, None)
+
+def test_xlsx_sparse_rows_and_numeric_identifiers():
+    content = _xlsx([
+        ["name", "address", "registration_number"],
+        ["ACME", None, 12345678900012.0],
+        ["Globex", "1 rue de Paris", 98765432100019],
+    ])
+    assert list(read_rows(io.BytesIO(content), "xlsx")) == [
+        (2, {"name": "ACME", "address": "", "registration_number": "12345678900012"}),
+        (3, {"name": "Globex", "address": "1 rue de Paris", "registration_number": "98765432100019"}),
+    ]
+
+def test_invalid_rows_are_reported_not_raised():
+    records, errors = validate_chunk([
+        (2, {"name": "", "email": "not-an-email"}),
+        (3, {"name": "A" * 300}),
+        (4, {"name": "Valid"}),
+    ])
+    assert [r[0] for r in records] == [4]
+    assert {(row, field) for row, field, _ in errors} == {(2, "name"), (2, "email"), (3, "name")}
+
+@pytest.mark.parametrize("filename, content, message", [
+    ("clients.pdf", b"", "Only .csv and .xlsx"),
+    ("clients.csv", b"email,siret\na@b.fr,1\n", "Missing column: name"),
+    ("clients.csv", b"", "empty"),
+    ("clients.csv", "nom\nSociété\n".encode("latin-1"), "UTF-8"),
+    ("clients.xlsx", b"name\nACME\n", "not a valid .xlsx"),
+])
+def test_unreadable_files_fail(filename, content, message):
+    with pytest.raises(ClientImportError, match=message):
+        list(read_rows(io.BytesIO(content), detect_format(filename)))
+
+def test_api_clients_store_identifiers_as_the_import_compares_them():
+    created = ClientCreate(name="Dupont", vat_number="fr 12 345678901", registration_number="123.456.789 00012")
+    assert (created.vat_number, created.registration_number) == ("FR12345678901", "12345678900012")
+    assert ClientUpdate(vat_number="fr 12").model_dump(exclude_unset=True) == {"vat_number": "FR12"}
+
+def test_existing_clients_are_compared_through_the_indexed_expressions():
+    # Clients saved unnormalized still match, and the lookups can use the indexes
+    indexed = {str(expr) for index in Client.__table__.indexes for expr in index.expressions}
+    for column, expression in (("vat_number", NORMALIZED_VAT_NUMBER), ("registration_number", NORMALIZED_REGISTRATION_NUMBER)):
+        assert expression.format(column=column) in indexed
+        assert expression.format(column=f"c.{column}") in REMOVE_EXISTING
@@ -0,0 +1,59 @@
+import io
+import zipfile
+from datetime import date, datetime, timezone
+from decimal import Decimal
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from sqlalchemy.dialects import postgresql
+from app.services.columnar import TableWriter, record_batch, table_queries, table_schemas
+
+ROWS = [
+    (1, 10, 3, "INVOICE", "SENT", datetime(2026, 10, 1, 9, 30), datetime(2026, 10, 2), date(2026, 10, 31),
+     Decimal("1000.00"), Decimal("200.00"), Decimal("1200.00"), Decimal("1200.00")),
+    (2, 11, 3, "QUOTE", "DRAFT", datetime(2026, 10, 3), datetime(2026, 10, 3), None, None, None, None, None),
+]
+
+def test_record_batch_is_typed():
+    batch = record_batch(table_schemas()["documents"], ROWS)
+    assert batch.schema.field("total_ttc").type == pa.decimal128(16, 2)
+    assert pa.types.is_dictionary(batch.schema.field("status").type)
+    assert batch.column("total_ttc").to_pylist() == [Decimal("1200.00"), None]
+    # Naive values are UTC
+    assert batch.column("created_at")[0].as_py() == datetime(2026, 10, 1, 9, 30, tzinfo=timezone.utc)
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_tables_stream_into_a_zip_without_seeking(fmt):
+    class Sink(io.RawIOBase):
+        # Like the storage writer: write and tell only
+        def __init__(self):
+            self.data = bytearray()
+        def writable(self):
+            return True
+        def write(self, b):
+            self.data += b
+            return len(b)
+        def tell(self):
+            return len(self.data)
+
+    sink = Sink()
+    schema = table_schemas()["documents"]
+    with zipfile.ZipFile(sink, "w") as zf:
+        with zf.open("documents", "w") as entry:
+            writer = TableWriter(fmt, entry, schema)
+            writer.write_rows(ROWS[:1])
+            writer.write_rows(ROWS[1:])
+            writer.close()
+    content = zipfile.ZipFile(io.BytesIO(bytes(sink.data))).read("documents")
+    table = pq.read_table(io.BytesIO(content)) if fmt == "parquet" else pa.ipc.open_stream(content).read_all()
+    assert table.num_rows == 2
+    assert table.column("status").to_pylist() == ["SENT", "DRAFT"]
+    assert table.column("due_date").to_pylist() == [date(2026, 10, 31), None]
+
+def test_since_filters_every_table():
+    queries = dict(table_queries(7, datetime(2026, 10, 1), None, None))
+    compiled = {name: str(q.compile(dialect=postgresql.dialect())) for name, q in queries.items()}
+    assert "documents.updated_at >=" in compiled["documents"]
+    assert "document_versions.generated_at >=" in compiled["versions"]
+    assert "clients.updated_at >=" in compiled["clients"]
+    assert "updated_at >=" not in str(dict(table_queries(7, None, None, None))["documents"])
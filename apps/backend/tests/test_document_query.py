@@ -0,0 +1,21 @@
+import pytest
+from sqlalchemy.dialects import postgresql
+from app.services.document_query import parse_filter, DocumentFilterError
+
+def _sql(expr: str) -> str:
+    return str(parse_filter(expr).compile(dialect=postgresql.dialect()))
+
+def test_equality_uses_containment():
+    assert "documents.current_data @>" in _sql("data.po_number:eq:PO-1234")
+
+def test_totals_comparison_matches_expression_index():
+    assert _sql("totals.total_ttc:gte:10000") == "fz_numeric(documents.current_totals ->> 'total_ttc') >= %(fz_numeric_1)s"
+
+def test_nested_path_and_exists():
+    assert "#>> '{buyer,siret}'" in _sql("data.buyer.siret:contains:123")
+    assert "documents.extra_metadata @?" in _sql("meta.facturx:exists")
+
+@pytest.mark.parametrize("expr", ["data", "other.x:eq:1", "data.x';--:eq:1", "data.x:like:1", "totals.total_ttc:gt:abc"])
+def test_invalid_filters_are_rejected(expr):
+    with pytest.raises(DocumentFilterError):
+        parse_filter(expr)
@@ -0,0 +1,61 @@
+import asyncio
+from datetime import datetime
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.business import Client, Document, DocStatus, DocType, RevenueRollup, Template
+from app.models.core import Company, User
+from app.services.document_status import (
+    TRANSITIONS, bulk_transition, sources_for, explain,
+    OUTCOME_UNCHANGED, OUTCOME_NOT_FOUND, OUTCOME_LOCKED, OUTCOME_INVALID, OUTCOME_UPDATED
+)
+from app.services.rollups import contribution, document_contribution, revenue_rollups
+
+def test_every_status_has_transitions():
+    assert set(TRANSITIONS) == set(DocStatus)
+    # Generation is the only way into GENERATED
+    assert sources_for(DocStatus.GENERATED) == []
+    assert set(sources_for(DocStatus.PAID)) == {DocStatus.GENERATED, DocStatus.SENT}
+
+LOCK = datetime(2026, 1, 1)
+
+@pytest.mark.parametrize("status, created_at, locked_until, target, outcome", [
+    (None, None, None, DocStatus.PAID, OUTCOME_NOT_FOUND),
+    (DocStatus.PAID, datetime(2025, 6, 1), LOCK, DocStatus.PAID, OUTCOME_UNCHANGED),
+    (DocStatus.DRAFT, datetime(2026, 6, 1), None, DocStatus.PAID, OUTCOME_INVALID),
+    (DocStatus.CANCELLED, datetime(2026, 6, 1), None, DocStatus.SENT, OUTCOME_INVALID),
+    (DocStatus.SENT, datetime(2025, 6, 1), LOCK, DocStatus.PAID, OUTCOME_LOCKED),
+])
+def test_explain_rejections(status, created_at, locked_until, target, outcome):
+    assert explain(status, created_at, locked_until, target) == outcome
+
+async def test_concurrent_transition_does_not_skew_rollups(db_session):
+    company = Company(name="ACME")
+    user = User(email="status@example.com", hashed_password="x")
+    db_session.add_all([company, user])
+    await db_session.flush()
+    client = Client(company_id=company.id, name="Dupont")
+    template = Template(company_id=company.id, type=DocType.INVOICE, name="Facture", docx_source_url="t.docx", schema_json={})
+    db_session.add_all([client, template])
+    await db_session.flush()
+    doc = Document(company_id=company.id, client_id=client.id, template_id=template.id, type=DocType.INVOICE,
+                   status=DocStatus.GENERATED, current_data={}, current_totals={"total_ttc": 120}, created_by=user.id)
+    db_session.add(doc)
+    await db_session.flush()
+    await revenue_rollups.record(db_session, None, document_contribution(doc))
+    await db_session.commit()
+
+    # Another request sends the invoice and commits while the bulk transition waits
+    async with AsyncSession(db_session.bind) as other, AsyncSession(db_session.bind) as bulk:
+        await other.execute(update(Document).where(Document.id == doc.id).values(status=DocStatus.SENT))
+        sent = contribution(company.id, doc.created_at, doc.type, DocStatus.SENT, client.id, doc.current_totals)
+        await revenue_rollups.record(other, document_contribution(doc), sent)
+        waiting = asyncio.create_task(bulk_transition(bulk, company.id, [doc.id], DocStatus.PAID))
+        await asyncio.sleep(0.5)
+        await other.commit()
+        [outcome] = await waiting
+        await bulk.commit()
+    assert outcome["outcome"] == OUTCOME_UPDATED
+
+    rows = (await db_session.execute(select(RevenueRollup.status, RevenueRollup.documents))).all()
+    assert {status: documents for status, documents in rows if documents} == {"PAID": 1}
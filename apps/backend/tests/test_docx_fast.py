@@ -0,0 +1,87 @@
+import io
+import zipfile
+import pytest
+from docx import Document
+from docxtpl import DocxTemplate
+from lxml import etree
+from app.services.docx_fast import build_plan
+
+def _docx(*paragraphs, header=None, footer=None) -> bytes:
+    doc = Document()
+    if header:
+        doc.sections[0].header.paragraphs[0].text = header
+    if footer:
+        doc.sections[0].footer.paragraphs[0].text = footer
+    for runs in paragraphs:
+        p = doc.add_paragraph()
+        for i, text in enumerate([runs] if isinstance(runs, str) else runs):
+            p.add_run(text).bold = i % 2 == 1
+    table = doc.add_table(rows=1, cols=2)
+    table.cell(0, 0).text = "{{ qty }}"
+    out = io.BytesIO()
+    doc.save(out)
+    return out.getvalue()
+
+def _docxtpl(content: bytes, data: dict) -> bytes:
+    template = DocxTemplate(io.BytesIO(content))
+    template.render(data)
+    out = io.BytesIO()
+    template.save(out)
+    return out.getvalue()
+
+def _c14n(xml: bytes) -> bytes:
+    return etree.tostring(etree.fromstring(xml), method="c14n")
+
+TEMPLATE = _docx(
+    "Montant {{amount}} EUR, note {{ note }}, missing [{{ missing }}] none {{ nothing }}",
+    # Word often splits a placeholder across runs
+    ["Client: ", "{{ cli", "ent_name }}", " {_{ literal }_}"],
+    header="Facture {{ doc_number }}",
+    footer="{{ company_name }}",
+)
+DATA = {
+    "doc_number": "FAC-2026-0001", "company_name": "ACME", "client_name": "Dupont",
+    "amount": 12.5, "note": "line 1\nline 2", "nothing": None, "qty": 3,
+}
+
+def test_output_matches_docxtpl():
+    plan = build_plan(TEMPLATE)
+    assert plan is not None
+    fast = zipfile.ZipFile(io.BytesIO(plan.render(TEMPLATE, DATA)))
+    slow = zipfile.ZipFile(io.BytesIO(_docxtpl(TEMPLATE, DATA)))
+
+    assert fast.testzip() is None
+    assert sorted(fast.namelist()) == sorted(slow.namelist())
+    for name in slow.namelist():
+        # docxtpl rewrites core properties (adding empty elements) even when nothing is templated
+        if name == "docProps/core.xml":
+            continue
+        if name.endswith((".xml", ".rels")):
+            assert _c14n(fast.read(name)) == _c14n(slow.read(name)), name
+        else:
+            assert fast.read(name) == slow.read(name), name
+
+def test_unchanged_members_are_copied_raw():
+    rendered = build_plan(TEMPLATE).render(TEMPLATE, DATA)
+    source = {i.filename: i for i in zipfile.ZipFile(io.BytesIO(TEMPLATE)).infolist()}
+    target = {i.filename: i for i in zipfile.ZipFile(io.BytesIO(rendered)).infolist()}
+
+    for name in ("word/styles.xml", "docProps/thumbnail.jpeg"):
+        assert (target[name].CRC, target[name].compress_size) == (source[name].CRC, source[name].compress_size)
+    assert target["word/document.xml"].CRC != source["word/document.xml"].CRC
+
+def test_values_are_xml_escaped():
+    plan = build_plan(TEMPLATE)
+    document = Document(io.BytesIO(plan.render(TEMPLATE, {**DATA, "client_name": "Dupont & Fils <SARL>"})))
+    assert document.paragraphs[1].text.startswith("Client: Dupont & Fils <SARL>")
+
+@pytest.mark.parametrize("text", [
+    "{% for line in lines %}{{ line }}{% endfor %}",
+    "{% if paid %}Payée{% endif %}",
+    "{{ client.name }}",
+    "{{ amount|round(2) }}",
+    "{{r bold_text }}",
+    "{# comment #}",
+])
+def test_templates_needing_jinja_fall_back(text):
+    assert build_plan(_docx(text)) is None
@@ -0,0 +1,96 @@
+import json
+import pytest
+from app.core.config import settings
+from app.services import events
+from app.services.events import EventBroker, Subscription, format_sse
+
+def _message(event_id: int, data: dict) -> str:
+    return json.dumps({"id": event_id, "type": "document.generation", "data": data})
+
+@pytest.mark.asyncio
+async def test_dispatch_reaches_only_tenant_subscribers():
+    broker = EventBroker()
+    sub_a = Subscription(1, maxsize=10)
+    sub_b = Subscription(2, maxsize=10)
+    broker._subscribers = {1: {sub_a}, 2: {sub_b}}
+
+    broker.dispatch(1, _message(7, {"state": "SUCCESS"}))
+
+    assert sub_a.queue.get_nowait() == (7, format_sse(7, "document.generation", {"state": "SUCCESS"}))
+    assert sub_b.queue.empty()
+
+@pytest.mark.asyncio
+async def test_overflowing_subscriber_is_cut_off():
+    sub = Subscription(1, maxsize=2)
+    for i in range(3):
+        sub.push((i, f"frame {i}"))
+
+    # Buffer is released and the stream is told to end
+    assert sub.overflowed
+    assert sub.queue.get_nowait() is None
+    assert sub.queue.empty()
+
+@pytest.mark.asyncio
+async def test_frame_format():
+    frame = format_sse(3, "document.generation", {"job_id": "abc"})
+    assert frame == 'id: 3\nevent: document.generation\ndata: {"job_id": "abc"}\n\n'
+    assert settings.SSE_QUEUE_MAXSIZE > 0
+
+class _Redis:
+    def __init__(self, seq, backlog):
+        self.seq, self.backlog = seq, backlog
+
+    def pipeline(self, transaction=True):
+        return _Pipeline(self)
+
+class _Pipeline:
+    def __init__(self, r):
+        self.r, self.results = r, []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def lrange(self, key, start, end):
+        self.results.append(self.r.backlog)
+
+    def get(self, key):
+        self.results.append(None if self.r.seq is None else str(self.r.seq))
+
+    async def execute(self):
+        return self.results
+
+def _broker(monkeypatch, seq, backlog):
+    monkeypatch.setattr(events, "get_async_redis", lambda: _Redis(seq, [_message(i, {}) for i in backlog]))
+    broker = EventBroker()
+    monkeypatch.setattr(broker, "_ensure_listener", lambda: None)
+    return broker
+
+@pytest.mark.asyncio
+async def test_replay_from_the_backlog(monkeypatch):
+    broker = _broker(monkeypatch, 5, [3, 4, 5])
+    assert [event_id for event_id, _ in await broker.replay(1, 2)] == [3, 4, 5]
+    assert await broker.replay(1, 5) == []
+
+@pytest.mark.asyncio
+async def test_resync_when_the_backlog_lost_events(monkeypatch):
+    # Trimmed past the client
+    assert await _broker(monkeypatch, 9, [8, 9]).replay(1, 5) == [(9, format_sse(9, "resync", {}))]
+    # Expired
+    assert await _broker(monkeypatch, 9, []).replay(1, 5) == [(9, format_sse(9, "resync", {}))]
+
+@pytest.mark.asyncio
+async def test_resync_after_sequence_reset_then_new_events(monkeypatch):
+    broker = _broker(monkeypatch, 2, [1, 2])
+    stream = broker.stream(1, 40)
+    assert (await stream.__anext__()).startswith("retry:")
+    assert await stream.__anext__() == format_sse(2, "resync", {})
+
+    # Ids below the client's Last-Event-ID are delivered after the reset
+    broker.dispatch(1, _message(2, {})) # Already covered by the resync
+    broker.dispatch(1, _message(3, {"state": "SUCCESS"}))
+    assert await stream.__anext__() == format_sse(3, "document.generation", {"state": "SUCCESS"})
+    await stream.aclose()
+    assert broker._subscribers == {}
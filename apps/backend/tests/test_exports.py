@@ -0,0 +1,82 @@
+import io
+import zipfile
+from datetime import date, datetime
+import pytest
+from app.services.exports import company_folder, export_service, fec_filename
+from app.services.storage import MultipartWriter, StorageService
+
+DOC = {
+    "id": 12, "type": "INVOICE", "status": "SENT", "client_id": 3, "client_name": "Dupont SARL",
+    "doc_number": "FAC-2026-0042", "date": datetime(2026, 3, 31, 18, 0), "updated_at": datetime(2026, 4, 2),
+    "current_totals": {"total_ht": 1000.5, "total_tva": 200.1, "total_ttc": 1200.6},
+}
+
+def test_fec_entries_balance_and_use_the_issue_date():
+    rows = export_service.fec_rows(DOC)
+    assert [row[4] for row in rows] == ["706000", "411000", "445710"]
+    assert {row[3] for row in rows} == {"20260331"}
+    assert rows[1][11] == "1200,6" and rows[0][12] == "1000,5" and rows[2][12] == "200,1"
+
+def test_fec_without_vat_has_no_vat_line():
+    assert len(export_service.fec_rows({**DOC, "current_totals": {"total_ht": 10, "total_ttc": 10}})) == 2
+
+def test_csv_rows_match_the_full_file():
+    content = export_service.generate_accounting_csv([DOC])
+    assert content.splitlines()[1] == "2026-03-31;FAC-2026-0042;INVOICE;Dupont SARL;1000.5;200.1;1200.6;SENT"
+
+def test_zip_names():
+    assert fec_filename("123 456 789 00012", 7, date(2026, 12, 31)) == "123456789FEC20261231.txt"
+    assert fec_filename(None, 7, date(2026, 12, 31)) == "company7FEC20261231.txt"
+    assert company_folder(7, "Dupont & Fils / Paris") == "7-Dupont_Fils_Paris"
+    assert company_folder(8, "") == "8"
+
+class FakeS3:
+    def __init__(self):
+        self.objects, self.uploads, self.aborted = {}, {}, []
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[Key] = Body
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        self.uploads[Key] = {}
+        return {"UploadId": Key}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.uploads[UploadId][PartNumber] = Body
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)
+        self.objects[Key] = b"".join(parts[p["PartNumber"]] for p in MultipartUpload["Parts"])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(UploadId)
+        self.aborted.append(Key)
+
+def _storage():
+    storage = StorageService()
+    storage._s3_client = FakeS3()
+    return storage
+
+def test_multipart_writer_streams_a_zip_in_parts():
+    storage = _storage()
+    with MultipartWriter(storage, "exports/1/job.zip", "application/zip", part_size=1024) as out:
+        # Not seekable: zipfile writes data descriptors instead of seeking back
+        with zipfile.ZipFile(out, "w", zipfile.ZIP_STORED) as zf:
+            with zf.open("a.txt", "w") as entry:
+                entry.write(b"x" * 5000)
+    data = storage.s3_client.objects["exports/1/job.zip"]
+    assert zipfile.ZipFile(io.BytesIO(data)).read("a.txt") == b"x" * 5000
+    assert not storage.s3_client.uploads
+
+def test_multipart_writer_small_output_and_abort():
+    storage = _storage()
+    with MultipartWriter(storage, "small.csv", part_size=1024) as out:
+        out.write(b"a;b\n")
+    assert storage.s3_client.objects["small.csv"] == b"a;b\n"
+
+    with pytest.raises(RuntimeError):
+        with MultipartWriter(storage, "failed.csv", part_size=1024) as out:
+            out.write(b"x" * 2048)
+            raise RuntimeError("source failed")
+    assert "failed.csv" not in storage.s3_client.objects and storage.s3_client.aborted == ["failed.csv"]
@@ -0,0 +1,53 @@
+import io
+from datetime import datetime
+import pytest
+from pypdf import PdfWriter
+from facturx import get_xml_from_pdf
+from app.services.facturx import FacturXError, FacturXService
+
+SELLER = {"name": "ACME SAS", "registration_number": "12345678900012", "vat_number": "FR12345678901"}
+BUYER = {"name": "Client SARL", "registration_number": "98765432100011", "vat_number": "FR98765432100"}
+TOTALS = {"total_ht": 100, "total_tva": 20, "total_ttc": 120}
+
+def _blank_pdf() -> bytes:
+    writer = PdfWriter()
+    writer.add_blank_page(595, 842)
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+@pytest.mark.parametrize("profile", ["minimum", "basicwl"])
+def test_built_xml_is_valid_for_profile(profile):
+    service = FacturXService(profile, "FR", "EUR")
+    xml = service.build_xml(
+        "FAC-2026-0001", datetime(2026, 3, 1), {"po_number": "PO-1", "buyer_reference": "DEPT-7"},
+        TOTALS, SELLER, BUYER
+    )
+
+    assert service.validate(xml) == []
+    assert b"<ram:ID>urn:factur-x.eu:1p0:" + profile.encode() in xml
+    assert b"<ram:GrandTotalAmount>120.00</ram:GrandTotalAmount>" in xml
+    assert b'<ram:ID schemeID="0002">123456789</ram:ID>' in xml
+
+def test_process_embeds_xml_into_pdf():
+    service = FacturXService("minimum", "FR", "EUR")
+    pdf, tags = service.process(_blank_pdf(), "FAC-2026-0002", datetime(2026, 3, 1), {}, TOTALS, SELLER, BUYER)
+
+    assert tags == {"profile": "minimum", "valid": True}
+    filename, xml = get_xml_from_pdf(pdf, check_xsd=False)
+    assert filename == "factur-x.xml"
+    assert b"FAC-2026-0002" in xml
+
+def test_invalid_xml_keeps_plain_pdf(monkeypatch):
+    service = FacturXService("minimum", "FR", "EUR")
+    monkeypatch.setattr(service, "validate", lambda xml: ["line 1: not valid"])
+    original = _blank_pdf()
+    pdf, tags = service.process(original, "FAC-2026-0003", datetime(2026, 3, 1), {}, TOTALS, SELLER, BUYER)
+
+    assert pdf == original
+    assert tags == {"profile": "minimum", "valid": False, "errors": ["line 1: not valid"]}
+
+def test_rejects_malformed_amounts():
+    service = FacturXService("minimum", "FR", "EUR")
+    with pytest.raises(FacturXError):
+        service.build_xml("FAC-2026-0004", datetime(2026, 3, 1), {}, {"total_ttc": "12,50"}, SELLER, BUYER)
@@ -0,0 +1,50 @@
+import io
+import pytest
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import NameObject
+from app.services.pdf_merge import PdfMergeError, PdfStreamMerger
+
+def _pdf(width, height, pages=1, inherit_mediabox=False) -> bytes:
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width, height)
+    if inherit_mediabox:
+        # Page size only on the page tree node, as some producers do
+        writer._root_object["/Pages"][NameObject("/MediaBox")] = writer.pages[0]["/MediaBox"]
+        for page in writer.pages:
+            del page["/MediaBox"]
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+def _merge(sources):
+    out = io.BytesIO()
+    merger = PdfStreamMerger(out)
+    for source in sources:
+        try:
+            merger.append(source)
+        except PdfMergeError:
+            pass
+    merger.close()
+    return PdfReader(io.BytesIO(out.getvalue()), strict=True)
+
+def test_merges_pages_in_order():
+    reader = _merge([_pdf(100, 200, pages=2), _pdf(300, 400, pages=3, inherit_mediabox=True), _pdf(595, 842)])
+
+    sizes = [(float(p.mediabox.width), float(p.mediabox.height)) for p in reader.pages]
+    assert sizes == [(100, 200)] * 2 + [(300, 400)] * 3 + [(595, 842)]
+
+def test_unreadable_source_is_rejected_without_corrupting_output():
+    with pytest.raises(PdfMergeError):
+        PdfStreamMerger(io.BytesIO()).append(b"not a pdf")
+
+    reader = _merge([_pdf(100, 100), b"%PDF-1.4 garbage", _pdf(200, 200)])
+    assert len(reader.pages) == 2
+
+def test_truncated_source_is_skipped():
+    truncated = _pdf(300, 300, pages=3)[:400]
+    with pytest.raises(PdfMergeError):
+        PdfStreamMerger(io.BytesIO()).append(truncated)
+
+    reader = _merge([_pdf(100, 100), truncated, _pdf(200, 200)])
+    assert [float(p.mediabox.width) for p in reader.pages] == [100, 200]
@@ -0,0 +1,88 @@
+import asyncio
+import time
+import pytest
+from fastapi import HTTPException
+from jose import JWTError, jwt
+from app.api.deps import get_current_user
+from app.core.config import settings
+from app.core.profiling import ProfilingMiddleware, SamplingProfiler, create_profile_token, verify_profile_token
+from app.core.security import create_access_token
+from app.services.profiles import profile_store
+
+def _busy(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+def test_profile_token():
+    token, _ = create_profile_token(1, "/api/templates/")
+    assert verify_profile_token(token, "/api/templates/3/test-render")["sub"] == "1"
+    assert verify_profile_token(token, "/api/clients") is None
+    assert verify_profile_token(create_access_token(1)) is None
+    assert verify_profile_token(token[:-2]) is None
+    with pytest.raises(JWTError):
+        jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.ALGORITHM])
+
+class _Users:
+    class _NoTestUser:
+        def scalar_one_or_none(self):
+            return None
+
+    async def execute(self, stmt):
+        return self._NoTestUser()
+
+    async def get(self, model, user_id):
+        return model(id=user_id, email="ops@example.com", hashed_password="x")
+
+async def test_only_access_tokens_authenticate():
+    assert (await get_current_user(_Users(), create_access_token(1))).id == 1
+    # Even signed with the access key, a typed token is not an access token
+    profile_claims = {"sub": "1", "type": "profile"}
+    for token in (create_profile_token(1)[0], jwt.encode(profile_claims, settings.JWT_SECRET, algorithm=settings.ALGORITHM)):
+        with pytest.raises(HTTPException) as exc:
+            await get_current_user(_Users(), token)
+        assert exc.value.status_code == 401
+
+def test_sampling_profiler_collapsed_stacks():
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    _busy(0.1)
+    profiler.stop()
+    assert profiler.samples > 0
+    lines = profiler.collapsed().splitlines()
+    assert any("_busy (test_profiling.py:" in line for line in lines)
+    stack, count = lines[0].rsplit(" ", 1)
+    assert stack.startswith("MainThread;") and int(count) > 0
+
+def _request(headers):
+    sent = []
+
+    async def app(scope, receive, send):
+        _busy(0.05)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/api/templates/3/test-render", "headers": headers}
+    asyncio.run(ProfilingMiddleware(app)(scope, receive, send))
+    return dict(sent[0]["headers"])
+
+def test_middleware_profiles_only_signed_requests(monkeypatch):
+    saved = []
+    monkeypatch.setattr(profile_store, "save", lambda profile_id, collapsed, meta: saved.append((profile_id, collapsed, meta)))
+
+    assert b"x-profile-id" not in _request([(b"x-profile", b"not-a-token")])
+    assert saved == []
+
+    token, _ = create_profile_token(1)
+    headers = _request([(b"x-profile", token.encode())])
+    [(profile_id, collapsed, meta)] = saved
+    assert headers[b"x-profile-id"] == profile_id.encode()
+    assert meta["kind"] == "request" and meta["trigger"] == "token"
+    assert meta["name"] == "POST /api/templates/3/test-render"
+    assert "_busy" in collapsed
@@ -0,0 +1,58 @@
+import asyncio
+from sqlalchemy import create_engine, text
+from app.core import query_stats
+from app.core.config import settings
+from app.core.query_stats import QueryStatsMiddleware, bind_shape, normalize_sql
+
+def test_normalize_sql_groups_values():
+    a = normalize_sql("SELECT * FROM documents\n WHERE company_id = $1::INTEGER AND id IN ($2::INTEGER, $3::INTEGER) LIMIT 10")
+    b = normalize_sql("SELECT * FROM documents WHERE company_id = $1::INTEGER AND id IN ($2::INTEGER, $3::INTEGER, $4::INTEGER) LIMIT 50")
+    assert a == b == "SELECT * FROM documents WHERE company_id = ? AND id IN (?, ...) LIMIT ?"
+    assert normalize_sql("SELECT 'l''été', t1.x FROM t1") == "SELECT ?, t1.x FROM t1"
+
+def test_bind_shape_has_no_values():
+    assert bind_shape(("secret", 4, None)) == ["str", "int", "NoneType"]
+    assert bind_shape([{"a": 1}, {"a": 2}], executemany=True) == {"rows": 2, "shape": {"a": "int"}}
+
+def _run(app, engine):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/api/documents", "headers": []}
+    asyncio.run(QueryStatsMiddleware(app)(scope, receive, send))
+    return dict(sent[0]["headers"])
+
+def test_request_stats_and_n_plus_one(monkeypatch, caplog):
+    monkeypatch.setattr(settings, "SQL_STATS_HEADERS", True)
+    monkeypatch.setattr(settings, "SQL_N_PLUS_ONE_THRESHOLD", 3)
+    engine = create_engine("sqlite://")
+    query_stats.instrument_engine(engine)
+
+    async def app(scope, receive, send):
+        with engine.connect() as conn:
+            for i in range(4):
+                conn.execute(text("SELECT :id"), {"id": i})
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    with caplog.at_level("WARNING", logger="app.core.query_stats"):
+        headers = _run(app, engine)
+    assert headers[b"x-db-query-count"] == b"4"
+    assert headers[b"x-db-n-plus-one"] == b"1"
+    assert b"db;dur=" in headers[b"server-timing"]
+    assert any('"n_plus_one"' in record.message and '"times": 4' in record.message for record in caplog.records)
+
+def test_slow_queries_are_logged_outside_requests(monkeypatch, caplog):
+    monkeypatch.setattr(settings, "SQL_SLOW_QUERY_MS", 0)
+    engine = create_engine("sqlite://")
+    query_stats.instrument_engine(engine)
+    with caplog.at_level("WARNING", logger="app.core.query_stats"):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT :name"), {"name": "Dupont"})
+    [record] = [r for r in caplog.records if '"slow_query"' in r.message]
+    assert '"statement": "SELECT ?"' in record.message and "Dupont" not in record.message
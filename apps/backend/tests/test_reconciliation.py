@@ -0,0 +1,119 @@
+import io
+from datetime import date
+from decimal import Decimal
+from sqlalchemy import select
+from app.models.business import Client, Document, DocStatus, DocType, PaymentMatch, Template
+from app.models.core import Company, User
+from app.services.document_status import OUTCOME_UNCHANGED
+from app.services.reconciliation import (
+    MATCH_CONFIRMED, MATCH_PROPOSED, MATCH_REJECTED, InvoiceIndex, OpenInvoice, StatementLine,
+    confirm_matches, load_index, match_lines, parse_amount, read_statement
+)
+
+CAMT = b"""<?xml version="1.0" encoding="UTF-8"?>
+<Document xmlns="urn:iso:std:iso:20022:tech:xsd:camt.053.001.02"><BkToCstmrStmt><Stmt>
+<Ntry><Amt Ccy="EUR">1200.00</Amt><CdtDbtInd>CRDT</CdtDbtInd><Sts>BOOK</Sts><BookgDt><Dt>2026-10-01</Dt></BookgDt>
+  <NtryDtls><TxDtls><RltdPties><Dbtr><Nm>DUPONT ET FILS SARL</Nm></Dbtr></RltdPties>
+  <RmtInf><Ustrd>VIR SEPA FAC-2026-0042</Ustrd></RmtInf></TxDtls></NtryDtls></Ntry>
+<Ntry><Amt Ccy="EUR">80.00</Amt><CdtDbtInd>DBIT</CdtDbtInd><Sts>BOOK</Sts></Ntry>
+<Ntry><Amt Ccy="EUR">300.00</Amt><CdtDbtInd>CRDT</CdtDbtInd><Sts>BOOK</Sts><BookgDt><Dt>2026-10-02</Dt></BookgDt>
+  <NtryDtls>
+    <TxDtls><AmtDtls><TxAmt><Amt Ccy="EUR">100.00</Amt></TxAmt></AmtDtls><RmtInf><Ustrd>A</Ustrd></RmtInf></TxDtls>
+    <TxDtls><AmtDtls><TxAmt><Amt Ccy="EUR">200.00</Amt></TxAmt></AmtDtls><RmtInf><Strd><CdtrRefInf><Ref>B</Ref></CdtrRefInf></Strd></RmtInf></TxDtls>
+  </NtryDtls></Ntry>
+</Stmt></BkToCstmrStmt></Document>"""
+
+def test_camt053_credits_and_batch_bookings():
+    lines = list(read_statement(io.BytesIO(CAMT), "camt053"))
+    assert [(l.amount, l.label, l.counterparty) for l in lines] == [
+        (Decimal("1200.00"), "VIR SEPA FAC-2026-0042", "DUPONT ET FILS SARL"),
+        (Decimal("100.00"), "A", None),
+        (Decimal("200.00"), "B", None),
+    ]
+    assert lines[0].booking_date == date(2026, 10, 1) and lines[0].currency == "EUR"
+
+def test_csv_french_bank_export():
+    content = (
+        "Date opération;Libellé;Débit;Crédit\n"
+        "01/10/2026;PRLV EDF;45,10;\n"
+        "02/10/2026;VIR MARTIN FAC 2026 0007;;1 234,56\n"
+    ).encode("utf-8")
+    lines = list(read_statement(io.BytesIO(content), "csv"))
+    assert [(l.line_number, l.amount, l.booking_date) for l in lines] == [(3, Decimal("1234.56"), date(2026, 10, 2))]
+
+def test_parse_amount_notations():
+    assert parse_amount("1.234,56 €") == parse_amount("1,234.56") == Decimal("1234.56")
+    assert parse_amount("-12,5") == Decimal("-12.5")
+
+def _index():
+    invoices = [
+        OpenInvoice(1, 10, Decimal("1200.00"), ["FAC-2026-0042"]),
+        OpenInvoice(2, 10, Decimal("500.00"), ["FAC-2026-0043"]),
+        OpenInvoice(3, 20, Decimal("500.00"), ["FAC-2026-0044"]),
+        OpenInvoice(4, 30, Decimal("99.00"), ["FAC-2026-0045"]),
+        OpenInvoice(5, 20, Decimal("250.00"), ["FAC-2026-0046"]),
+    ]
+    return InvoiceIndex(invoices, {10: "Dupont et Fils", 20: "Martin SAS", 30: "Globex"}, Decimal("1.00"))
+
+def test_matching_rules_and_one_line_per_invoice():
+    lines = [
+        StatementLine(1, Decimal("1200.00"), label="VIR FAC20260042"),
+        # Same number again: the invoice is already taken by the exact match
+        StatementLine(2, Decimal("1200.00"), label="FAC-2026-0042 relance"),
+        StatementLine(3, Decimal("500.00"), label="VIR SEPA MARTIN"),
+        StatementLine(4, Decimal("99.00"), label="VIREMENT"),
+        StatementLine(5, Decimal("249.50"), counterparty="MARTIN"),
+        StatementLine(6, Decimal("500.00"), label="VIREMENT"),
+    ]
+    results = {line.line_number: (invoice.document_id if invoice else None, rule) for line, invoice, rule, _ in match_lines(lines, _index())}
+    assert results == {
+        1: (1, "number"),
+        2: (None, None),
+        3: (3, "amount_client"),
+        4: (4, "amount"),
+        5: (5, "tolerance"),
+        # Two open invoices of 500.00 and no client: nothing proposed
+        6: (None, None),
+    }
+
+async def _invoices(db, *statuses):
+    company = Company(name="ACME")
+    user = User(email="reconcile@example.com", hashed_password="x")
+    db.add_all([company, user])
+    await db.flush()
+    client = Client(company_id=company.id, name="Dupont et Fils")
+    template = Template(company_id=company.id, type=DocType.INVOICE, name="Facture", docx_source_url="t.docx", schema_json={})
+    db.add_all([client, template])
+    await db.flush()
+    docs = [
+        Document(company_id=company.id, client_id=client.id, template_id=template.id, type=DocType.INVOICE,
+                 status=status, current_data={}, current_totals={"total_ttc": "1200.00"}, created_by=user.id)
+        for status in statuses
+    ]
+    db.add_all(docs)
+    await db.flush()
+    return company, docs
+
+def _match(company, doc, status=MATCH_PROPOSED):
+    return PaymentMatch(company_id=company.id, statement_id="s1", line_number=1, amount=Decimal("1200.00"),
+                        document_id=doc.id, status=status)
+
+async def test_index_skips_invoices_already_matched(db_session):
+    company, docs = await _invoices(db_session, DocStatus.SENT, DocStatus.SENT, DocStatus.SENT)
+    db_session.add_all([_match(company, docs[0]), _match(company, docs[1], MATCH_REJECTED)])
+    await db_session.flush()
+    index = await load_index(db_session, company.id, Decimal("0.01"))
+    assert sorted(i.document_id for i in index.by_amount[Decimal("1200.00")]) == [docs[1].id, docs[2].id]
+
+async def test_confirm_reports_only_invoices_it_paid(db_session):
+    company, docs = await _invoices(db_session, DocStatus.SENT, DocStatus.PAID)
+    matches = [_match(company, docs[0]), _match(company, docs[0]), _match(company, docs[1])]
+    db_session.add_all(matches)
+    await db_session.flush()
+
+    outcomes = await confirm_matches(db_session, company.id, [m.id for m in matches] + [-1])
+    assert [o["outcome"] for o in outcomes] == [MATCH_CONFIRMED, OUTCOME_UNCHANGED, OUTCOME_UNCHANGED, "not_found"]
+    statuses = (await db_session.execute(
+        select(PaymentMatch.id, PaymentMatch.status).where(PaymentMatch.id.in_([m.id for m in matches]))
+    )).all()
+    assert dict(statuses) == {matches[0].id: MATCH_CONFIRMED, matches[1].id: MATCH_PROPOSED, matches[2].id: MATCH_PROPOSED}
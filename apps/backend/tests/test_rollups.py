@@ -0,0 +1,119 @@
+import asyncio
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.business import Client, Document, DocStatus, DocType, RevenueRollup, Template
+from app.models.core import Company, User
+from app.services.change_counters import change_counters
+from app.services.rollups import contribution, revenue_rollups
+from app.tasks import reports
+
+class _Session:
+    def __init__(self):
+        self.rows = []
+        self.locks = []
+
+    async def execute(self, stmt, params):
+        if isinstance(params, list):
+            self.rows.extend(params)
+        else:
+            self.locks.append(params["company_id"])
+
+CREATED = datetime(2026, 10, 19, 15, 30)
+TOTALS = {"total_ht": 100, "total_tva": "20.004", "total_ttc": 120.0}
+
+def test_drafts_contribute_nothing():
+    assert contribution(1, CREATED, DocType.INVOICE, DocStatus.DRAFT, 7, TOTALS) is None
+
+def test_contribution_key_and_rounded_amounts():
+    key, values = contribution(1, CREATED, DocType.INVOICE, DocStatus.SENT, 7, TOTALS)
+    assert key == (1, datetime(2026, 10, 1).date(), "INVOICE", "SENT", 7)
+    assert values == (1, Decimal("100.00"), Decimal("20.00"), Decimal("120.00"))
+    # Missing or malformed totals count as zero
+    assert contribution(1, CREATED, "QUOTE", "PAID", 7, {"total_ht": "n/a"})[1] == (1, 0, 0, 0)
+
+@pytest.mark.asyncio
+async def test_status_change_moves_amounts_between_keys():
+    session = _Session()
+    sent = contribution(1, CREATED, DocType.INVOICE, DocStatus.SENT, 7, TOTALS)
+    paid = contribution(1, CREATED, DocType.INVOICE, DocStatus.PAID, 7, TOTALS)
+    generated = contribution(1, CREATED, DocType.INVOICE, DocStatus.GENERATED, 7, TOTALS)
+    await revenue_rollups.apply(session, [(sent, paid), (None, generated), (generated, generated)])
+    assert [(r["status"], r["documents"], r["total_ttc"]) for r in session.rows] == [
+        ("GENERATED", 1, Decimal("120.00")),
+        ("PAID", 1, Decimal("120.00")),
+        ("SENT", -1, Decimal("-120.00")),
+    ]
+    assert session.locks == [1]
+
+@pytest.mark.asyncio
+async def test_no_op_changes_write_nothing():
+    session = _Session()
+    generated = contribution(1, CREATED, DocType.INVOICE, DocStatus.GENERATED, 7, TOTALS)
+    await revenue_rollups.apply(session, [(generated, generated), (None, None)])
+    assert session.rows == []
+
+async def _company(db, name):
+    company = Company(name=name)
+    user = User(email=f"{name}@example.com", hashed_password="x")
+    db.add_all([company, user])
+    await db.flush()
+    client = Client(company_id=company.id, name="Dupont")
+    template = Template(company_id=company.id, type=DocType.INVOICE, name="Facture", docx_source_url="t.docx", schema_json={})
+    db.add_all([client, template])
+    await db.flush()
+    doc = Document(company_id=company.id, client_id=client.id, template_id=template.id, type=DocType.INVOICE,
+                   status=DocStatus.SENT, current_data={}, current_totals=TOTALS, created_by=user.id, created_at=CREATED)
+    db.add(doc)
+    await db.commit()
+    return company, doc
+
+async def test_reconcile_repairs_one_company_without_blocking_others(db_session):
+    company, doc = await _company(db_session, "acme")
+    other, other_doc = await _company(db_session, "other")
+    # Drifted: the document was never counted
+    assert await revenue_rollups.reconcile(db_session, company.id) == 1
+
+    # Another tenant's writer does not wait for the reconciling transaction
+    async with AsyncSession(db_session.bind) as writer:
+        await asyncio.wait_for(revenue_rollups.record(writer, None, contribution(
+            other.id, CREATED, DocType.INVOICE, DocStatus.SENT, other_doc.client_id, TOTALS
+        )), timeout=5)
+        await writer.commit()
+    await db_session.commit()
+
+    rows = (await db_session.execute(select(RevenueRollup).order_by(RevenueRollup.company_id))).scalars().all()
+    assert [(r.company_id, r.documents, r.total_ttc) for r in rows] == [
+        (company.id, 1, Decimal("120.00")), (other.id, 1, Decimal("120.00"))
+    ]
+    assert await revenue_rollups.reconcile(db_session, company.id) == 0
+
+async def test_repairs_change_the_summary_etag(monkeypatch):
+    class _Sessions:
+        def __init__(self, engine):
+            pass
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def execute(self, stmt):
+            return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: [1, 2]))
+
+        async def commit(self):
+            pass
+
+    async def reconcile(session, company_id):
+        return {1: 0, 2: 3}[company_id]
+
+    bumped = []
+    monkeypatch.setattr(reports, "AsyncSession", _Sessions)
+    monkeypatch.setattr(revenue_rollups, "reconcile", reconcile)
+    monkeypatch.setattr(change_counters, "bump_sync", lambda company_id, collection: bumped.append((company_id, collection)))
+    assert await reports._reconcile_revenue_rollups() == {"companies": 2, "repaired": {2: 3}}
+    assert bumped == [(2, "documents")]
@@ -0,0 +1,73 @@
+import json
+from app.services.scheduler import TenantState, plan_dispatch
+
+def _tenant(cid, pending, inflight=0, cap=10, weight=1, deficit=0.0):
+    return TenantState(cid, pending, inflight, cap, weight, deficit)
+
+def test_big_batch_does_not_starve_small_tenants():
+    tenants = [_tenant(1, 10_000), _tenant(2, 1), _tenant(3, 1)]
+    order, _, _ = plan_dispatch(tenants, slots=3)
+    assert sorted(order) == [1, 2, 3]
+
+def test_weights_and_caps():
+    tenants = [_tenant(1, 100, weight=3), _tenant(2, 100, weight=1), _tenant(3, 100, inflight=2, cap=2)]
+    order, _, _ = plan_dispatch(tenants, slots=8)
+    assert order.count(1) == 6
+    assert order.count(2) == 2
+    # Tenant 3 is at its concurrency cap
+    assert 3 not in order
+
+def test_ring_rotates_after_last_served_tenant():
+    tenants = [_tenant(1, 5), _tenant(2, 5), _tenant(3, 5)]
+    order, deficits, rotate = plan_dispatch(tenants, slots=2)
+    assert order == [1, 2]
+    assert rotate == 2
+    assert all(d == 0 for d in deficits.values())
+
+def test_empty_queues_reset_deficit():
+    order, deficits, _ = plan_dispatch([_tenant(1, 1, weight=5)], slots=10)
+    assert order == [1]
+    assert deficits[1] == 0
+
+class _FakeRedis:
+    def __init__(self):
+        self.lists, self.zsets = {}, {}
+
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    def zrem(self, key, member):
+        self.zsets.get(key, {}).pop(member, None)
+
+    def lpush(self, key, value):
+        self.lists.setdefault(key, []).insert(0, value)
+
+    def pipeline(self):
+        return _FakePipeline(self)
+
+class _FakePipeline:
+    def __init__(self, r):
+        self.r, self.calls = r, []
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name, args))
+
+    def execute(self):
+        return [getattr(self.r, name)(*args) for name, args in self.calls]
+
+def test_failed_publish_frees_the_slot_and_requeues(monkeypatch):
+    from app.core.celery import celery_app
+    from app.services.scheduler import GLOBAL_INFLIGHT, FairScheduler, _tenant_inflight, _tenant_queue
+
+    def send_task(*args, **kwargs):
+        raise ConnectionError("broker down")
+
+    monkeypatch.setattr(celery_app, "send_task", send_task)
+    r = _FakeRedis()
+    r.lpush(_tenant_queue(1), "next")
+    job = {"job_id": "j1", "company_id": 1, "document_id": 5, "user_id": 2, "enqueued_at": 0.0, "lane": "batch"}
+    assert FairScheduler()._start(r, job, _tenant_queue(1)) is False
+    assert r.zsets[GLOBAL_INFLIGHT] == {} and r.zsets[_tenant_inflight(1)] == {}
+    # Back at the head of its queue, ahead of the jobs submitted after it
+    assert json.loads(r.lists[_tenant_queue(1)][0]) == job
+    assert r.lists[_tenant_queue(1)][1] == "next"
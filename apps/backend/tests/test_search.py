@@ -0,0 +1,89 @@
+import importlib.util
+from datetime import datetime, timedelta
+from pathlib import Path
+import pytest
+from sqlalchemy import text
+from app.api.search import search_documents
+from app.core.config import settings
+from app.models.business import Client, Document, DocumentVersion, DocType, Template
+from app.models.core import Company, User
+
+MIGRATION = Path(__file__).resolve().parent.parent / "migrations/versions/5e2a9c4d7b13_full_text_search_on_documents.py"
+
+@pytest.fixture
+async def search_db(db_session):
+    # The tables come from the models; the search functions and triggers from the migration
+    spec = importlib.util.spec_from_file_location("fts_migration", MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    await db_session.execute(text("CREATE EXTENSION IF NOT EXISTS unaccent"))
+    await db_session.execute(text("DROP TEXT SEARCH CONFIGURATION IF EXISTS fr_unaccent CASCADE"))
+    for sql in (migration.SEARCH_CONFIG, migration.FZ_JSONB_TEXT, migration.FZ_PATCH_TEXT,
+                migration.FZ_DOCUMENT_SEARCH_VECTOR, migration.TRIGGERS):
+        await db_session.execute(text(sql))
+    await db_session.commit()
+    return db_session
+
+async def _company(db):
+    company = Company(name="ACME")
+    user = User(email="search@example.com", hashed_password="x")
+    db.add_all([company, user])
+    await db.flush()
+    client = Client(company_id=company.id, name="Société Générale des Eaux")
+    template = Template(company_id=company.id, type=DocType.INVOICE, name="Facture", docx_source_url="t.docx", schema_json={})
+    db.add_all([client, template])
+    await db.flush()
+    return company, user, client, template
+
+def _document(company, user, client, template, data, updated_at=None):
+    return Document(
+        company_id=company.id, client_id=client.id, template_id=template.id, type=DocType.INVOICE,
+        current_data=data, current_totals={}, created_by=user.id, updated_at=updated_at or datetime.utcnow(),
+    )
+
+async def _search(db, company, q, **kwargs):
+    return await search_documents(q=q, page=kwargs.get("page", 1), page_size=kwargs.get("page_size", 20), db=db, company_id=company.id)
+
+async def test_triggers_index_data_versions_and_client_names(search_db):
+    db = search_db
+    company, user, client, template = await _company(db)
+    doc = _document(company, user, client, template, {"objet": "Réfection des toitures"})
+    db.add(doc)
+    await db.flush()
+    db.add(DocumentVersion(document_id=doc.id, version_number=1, doc_number="FAC-2026-0042",
+                           pdf_url="", docx_url="", generated_by=user.id))
+    await db.commit()
+
+    # Stemmed and accent-insensitive, on data, number and client name
+    for q in ("toiture refection", "FAC-2026-0042", "societe generale"):
+        result = await _search(db, company, q)
+        assert [hit["document_id"] for hit in result["results"]] == [doc.id], q
+    assert (await _search(db, company, "FAC-2026-0042"))["results"][0]["doc_number"] == "FAC-2026-0042"
+
+    # Renaming the client reindexes its documents
+    client.name = "Dupont & Fils"
+    await db.commit()
+    assert (await _search(db, company, "dupont"))["results"]
+    assert not (await _search(db, company, "generale"))["results"]
+
+async def test_rank_window_keeps_the_most_recent_matches(search_db, monkeypatch):
+    db = search_db
+    company, user, client, template = await _company(db)
+    now = datetime.utcnow()
+    docs = [
+        _document(company, user, client, template, {"objet": "maintenance"}, now - timedelta(days=i))
+        for i in range(3)
+    ]
+    db.add_all(docs)
+    await db.commit()
+
+    monkeypatch.setattr(settings, "SEARCH_RANK_WINDOW", 2)
+    result = await _search(db, company, "maintenance")
+    assert result["truncated"] is True
+    # The oldest match is the one left out
+    assert {hit["document_id"] for hit in result["results"]} == {docs[0].id, docs[1].id}
+    assert (await _search(db, company, "maintenance", page=2, page_size=2))["truncated"] is True
+
+    monkeypatch.setattr(settings, "SEARCH_RANK_WINDOW", 3)
+    result = await _search(db, company, "maintenance", page_size=2)
+    assert result["truncated"] is False and result["has_more"] is True
@@ -0,0 +1,59 @@
+import io
+import pytest
+from docx import Document
+from fastapi import UploadFile
+from app.api import templates as templates_api
+from app.models.business import DocType
+from app.models.core import Company
+
+def _docx(text: str) -> bytes:
+    doc = Document()
+    doc.add_paragraph(text)
+    out = io.BytesIO()
+    doc.save(out)
+    return out.getvalue()
+
+@pytest.fixture
+def storage(monkeypatch):
+    uploads = []
+    monkeypatch.setattr(templates_api.storage_service, "upload_file", lambda content, name, content_type=None: uploads.append(name))
+    monkeypatch.setattr(templates_api.storage_service, "get_presigned_url", lambda name, expiration=3600: name)
+
+    async def bump(company_id, collection):
+        return 1
+    monkeypatch.setattr(templates_api.change_counters, "bump", bump)
+    return uploads
+
+async def _upload(db_session, company_id, name, content):
+    file = UploadFile(io.BytesIO(content), filename=f"{name}.docx")
+    return await templates_api.upload_template(
+        name=name, type=DocType.INVOICE, file=file, db=db_session, company_id=company_id
+    )
+
+@pytest.mark.asyncio
+async def test_identical_uploads_share_storage_and_keep_versioning(db_session, storage, monkeypatch):
+    company = Company(name="Test Company")
+    db_session.add(company)
+    await db_session.commit()
+    content = _docx("Bonjour {{ client_name }}")
+
+    first = await _upload(db_session, company.id, "Facture", content)
+    # Same file again under the same name: nothing new
+    again = await _upload(db_session, company.id, "Facture", content)
+    assert again.id == first.id
+
+    # Known file under another name: no upload and no parsing
+    parsed = []
+    extract = templates_api.template_engine.extract_variable_shapes
+    monkeypatch.setattr(templates_api.template_engine, "extract_variable_shapes", lambda content: parsed.append(1) or extract(content))
+    other = await _upload(db_session, company.id, "Avoir", content)
+    assert len(storage) == 1 and not parsed
+    assert other.docx_source_url == first.docx_source_url
+    assert other.schema_json == first.schema_json
+    assert (other.version, other.parent_id) == (1, None)
+
+    second = await _upload(db_session, company.id, "Facture", _docx("Bonjour {{ client_name }} !"))
+    await db_session.refresh(first)
+    assert (second.version, second.parent_id, second.is_active) == (2, first.id, True)
+    assert first.is_active is False
+    assert len(storage) == 2 and len(parsed) == 1
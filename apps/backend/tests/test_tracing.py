@@ -0,0 +1,68 @@
+import pytest
+from app.core.tracing import NOOP_SPAN, Tracer, otlp_payload, parse_traceparent
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+class MemoryExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+def test_parse_traceparent():
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01") == (TRACE_ID, PARENT_ID, True)
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-00") == (TRACE_ID, PARENT_ID, False)
+    assert parse_traceparent("00-" + "0" * 32 + f"-{PARENT_ID}-01") is None
+    assert parse_traceparent("garbage") is None
+    assert parse_traceparent(None) is None
+
+def test_nested_spans_are_exported_with_their_parents():
+    exporter = MemoryExporter()
+    tracer = Tracer(exporter=exporter, sample_rate=1.0)
+    with tracer.start_trace("POST /api/documents/{id}/generate", f"00-{TRACE_ID}-{PARENT_ID}-01") as root:
+        with tracer.span("generation.render", **{"template.render_mode": "fast"}) as child:
+            assert tracer.current_traceparent() == f"00-{TRACE_ID}-{child.span_id}-01"
+        with pytest.raises(ValueError):
+            with tracer.span("s3.put_object", kind="client"):
+                raise ValueError("boom")
+    tracer.flush()
+
+    spans = {span["name"]: span for span in exporter.spans}
+    assert set(spans) == {"POST /api/documents/{id}/generate", "generation.render", "s3.put_object"}
+    assert spans["POST /api/documents/{id}/generate"]["parent_id"] == PARENT_ID
+    assert spans["generation.render"]["parent_id"] == root.span_id
+    assert spans["generation.render"]["attributes"] == {"template.render_mode": "fast"}
+    assert spans["s3.put_object"]["error"] == "ValueError: boom"
+    assert all(span["trace_id"] == TRACE_ID for span in exporter.spans)
+    assert tracer.current_traceparent() is None
+
+def test_unsampled_trace_propagates_without_recording():
+    exporter = MemoryExporter()
+    tracer = Tracer(exporter=exporter, sample_rate=0.0)
+    with tracer.start_trace("celery generate_document") as root:
+        assert tracer.span("generation.render") is NOOP_SPAN
+        assert tracer.current_traceparent() == f"00-{root.trace_id}-{root.span_id}-00"
+    tracer.flush()
+    assert exporter.spans == []
+
+def test_disabled_tracer_is_a_noop():
+    tracer = Tracer()
+    assert not tracer.enabled
+    assert tracer.start_trace("GET /health") is NOOP_SPAN
+    assert tracer.span("sql") is NOOP_SPAN
+
+def test_otlp_payload():
+    span = {
+        "trace_id": TRACE_ID, "span_id": PARENT_ID, "parent_id": None, "name": "gotenberg.convert",
+        "kind": "client", "start_ns": 1, "end_ns": 5, "attributes": {"http.status_code": 200, "pdf.pdfa": "PDF/A-3b"},
+        "error": None,
+    }
+    body = otlp_payload([span], "facturezen")
+    resource = body["resourceSpans"][0]
+    assert resource["resource"]["attributes"][0]["value"] == {"stringValue": "facturezen"}
+    out = resource["scopeSpans"][0]["spans"][0]
+    assert "parentSpanId" not in out
+    assert out["kind"] == 3 and out["startTimeUnixNano"] == "1" and out["status"] == {"code": 1}
+    assert out["attributes"][0] == {"key": "http.status_code", "value": {"intValue": "200"}}
@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+from app.services.templates import TemplateEngine
+from app.services.validation import DocumentValidationService
+
+def _template(template_id=1, version=1):
+    schema = TemplateEngine.generate_json_schema({"client_name", "qty", "unit_price"})
+    return SimpleNamespace(id=template_id, version=version, schema_json=schema)
+
+def test_full_and_partial_validation():
+    service = DocumentValidationService(cache_size=10)
+    template = _template()
+
+    assert service.validate(template, {"client_name": "ACME", "qty": 2, "unit_price": 9.5}) == []
+    # Drafts may be incomplete but not wrongly typed
+    assert service.validate(template, {"qty": 2}, partial=True) == []
+    assert service.validate(template, {"qty": "two"}, partial=True)
+    assert service.validate(template, {"qty": 2})
+
+def test_validators_are_cached_per_template_version():
+    service = DocumentValidationService(cache_size=2)
+    v1 = _template(version=1)
+    service.validate(v1, {})
+    compiled = service._cache[(1, 1, False)]
+    service.validate(v1, {"qty": 1})
+    assert service._cache[(1, 1, False)] is compiled
+
+    service.validate(_template(version=2), {})
+    service.validate(_template(template_id=2), {})
+    assert (1, 1, False) not in service._cache
+
+def _docx(*paragraphs) -> bytes:
+    import io
+    from docx import Document
+
+    doc = Document()
+    for text in paragraphs:
+        doc.add_paragraph(text)
+    out = io.BytesIO()
+    doc.save(out)
+    return out.getvalue()
+
+LOOP_TEMPLATE = _docx(
+    "Facture {{ doc_number }} du {{ date }} pour {{ client.name }}",
+    "{% for item in items %}{{ item.label }} x {{ item.qty }}{% endfor %}",
+    "{% if discount %}Remise{% endif %} Total {{ total_amount|round(2) }}",
+)
+
+def test_schema_of_a_loop_template():
+    shapes = TemplateEngine.extract_variable_shapes(LOOP_TEMPLATE)
+    schema = TemplateEngine.generate_json_schema(set(shapes), shapes)
+
+    assert set(schema["properties"]) == {"client", "items", "discount", "total_amount"}
+    assert schema["properties"]["items"]["type"] == "array"
+    assert schema["properties"]["client"]["type"] == "object"
+    # Only filtered or tested: untyped; tested only: optional
+    assert "type" not in schema["properties"]["total_amount"]
+    assert "type" not in schema["properties"]["discount"]
+    assert sorted(schema["required"]) == ["client", "items", "total_amount"]
+
+def test_loop_template_data_is_valid():
+    shapes = TemplateEngine.extract_variable_shapes(LOOP_TEMPLATE)
+    template = SimpleNamespace(id=3, version=1, schema_json=TemplateEngine.generate_json_schema(set(shapes), shapes))
+    service = DocumentValidationService(cache_size=10)
+    data = {"client": {"name": "ACME"}, "items": [{"label": "Conseil", "qty": 2}], "total_amount": 1200.5}
+
+    assert service.validate(template, data) == []
+    assert service.validate(template, {**data, "items": "Conseil"})
+    assert service.validate(template, {"items": []}, partial=True) == []
+
+def test_stored_schemas_do_not_require_injected_variables():
+    schema = {
+        "type": "object",
+        "properties": {"doc_number": {"type": "string"}, "date": {"type": "string"}, "client_name": {"type": "string"}},
+        "required": ["doc_number", "date", "client_name"],
+    }
+    template = SimpleNamespace(id=4, version=1, schema_json=schema)
+    assert DocumentValidationService(cache_size=10).validate(template, {"client_name": "ACME"}) == []
@@ -0,0 +1,57 @@
+import pytest
+import jsonpatch
+from app.services.versioning import VersionHistoryService
+
+def _history(versions, interval=3):
+    """Stores a list of snapshots the way generation does, without a database."""
+    service = VersionHistoryService(snapshot_interval=interval, cache_size=100)
+    rows = []
+    previous = None
+    for number, data in enumerate(versions, start=1):
+        if service.is_snapshot_version(number) or previous is None:
+            rows.append((number, data, None))
+        else:
+            rows.append((number, None, jsonpatch.make_patch(previous, data).patch))
+        previous = data
+    return service, rows
+
+def test_reconstructs_every_version_from_deltas():
+    versions = [
+        {"client": "ACME", "lines": [{"label": f"Item {i}", "qty": i} for i in range(n)]}
+        for n in range(1, 8)
+    ]
+    service, rows = _history(versions)
+
+    assert [r[1] is not None for r in rows] == [True, False, False, True, False, False, True]
+    # Cold cache: the result must come from the patches alone
+    service._cache.clear()
+    snapshots = service.reconstruct(42, rows)
+    assert [snapshots[n] for n in range(1, 8)] == versions
+
+def test_reconstruct_requires_a_base_snapshot():
+    service, rows = _history([{"a": 1}, {"a": 2}])
+    with pytest.raises(ValueError):
+        service.reconstruct(1, rows[1:])
+
+def test_lru_evicts_oldest_entries():
+    service = VersionHistoryService(snapshot_interval=10, cache_size=2)
+    service._cache_put((1, 1), {"v": 1})
+    service._cache_put((1, 2), {"v": 2})
+    service._cache_get((1, 1))
+    service._cache_put((1, 3), {"v": 3})
+    assert list(service._cache) == [(1, 1), (1, 3)]
+
+@pytest.mark.asyncio
+async def test_new_versions_are_cached_once_committed():
+    service = VersionHistoryService(snapshot_interval=3, cache_size=10)
+    v1 = {"client": "ACME", "lines": [{"label": f"Item {i}"} for i in range(20)]}
+    v2 = {**v1, "client": "Dupont"}
+    service.remember(1, 1, v1)
+    # The generation of version 2 then rolls back: nothing is left in cache
+    storage = await service.build_storage(None, 1, 2, v2)
+    assert storage["snapshot_data"] is None
+    assert jsonpatch.apply_patch(v1, storage["snapshot_delta"]) == v2
+    assert service._cache_get((1, 2)) is None
+
+    service.remember(1, 2, v2)
+    assert service._cache_get((1, 2)) == v2